@@ -0,0 +1,153 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+from typing import NamedTuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+import config
+from cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+AGENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agents")
+CONFIG_PLACEHOLDER = "__WEBSHIELD_CONFIG__"
+
+AGENT_FILES = {
+    "sql": "webshield-sql-agent.js",
+    "xss": "webshield-xss-agent.js",
+    "dom": "dom-defacement-agent.js",
+}
+
+# shared event queue (batched beacons), prepended to the agents that use it
+AGENT_PRELUDES = {
+    "xss": "webshield-queue.js",
+    "dom": "webshield-queue.js",
+}
+
+
+class AgentBundle(NamedTuple):
+    body: bytes
+    gzip: bytes
+    br: bytes | None
+    etag: str
+
+
+def minify_js(source: str) -> str:
+    # Conservative: drop indentation, blank lines and whole-line comments but
+    # keep line breaks, so ASI and regex literals behave exactly as before.
+    out = []
+    for line in source.splitlines():
+        line = line.strip()
+        if not line or line.startswith("//"):
+            continue
+        out.append(line)
+    return "\n".join(out) + "\n"
+
+
+def _load_templates() -> dict[str, tuple[str, str]]:
+    templates = {}
+    for name, filename in AGENT_FILES.items():
+        source = ""
+        if name in AGENT_PRELUDES:
+            with open(os.path.join(AGENT_DIR, AGENT_PRELUDES[name]), encoding="utf-8") as f:
+                source = f.read() + "\n"
+        with open(os.path.join(AGENT_DIR, filename), encoding="utf-8") as f:
+            source += f.read()
+        head, sep, tail = minify_js(source).partition(CONFIG_PLACEHOLDER)
+        if not sep:
+            raise RuntimeError(f"{filename} has no {CONFIG_PLACEHOLDER} placeholder")
+        templates[name] = (head, tail)
+    return templates
+
+
+# compiled once per process; only the JSON config differs between sites
+_templates = _load_templates()
+
+_bundles = TTLCache(
+    maxsize=config.AGENT_BUNDLE_CACHE_SIZE,
+    ttl=24 * 3600,
+    name="agent-bundles",
+)
+
+
+def _config_json(cfg: dict) -> str:
+    # "<" is escaped so a value can never close the surrounding <script>
+    return json.dumps(cfg, separators=(",", ":"), sort_keys=True).replace("<", "\\u003c")
+
+
+def _build(body: bytes) -> AgentBundle:
+    return AgentBundle(
+        body=body,
+        gzip=gzip.compress(body, compresslevel=9, mtime=0),
+        br=brotli.compress(body, quality=11) if brotli is not None else None,
+        etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+    )
+
+
+def get_bundle(name: str, cfg: dict) -> AgentBundle:
+    cfg_json = _config_json(cfg)
+    key = (name, cfg_json)
+    bundle = _bundles.get(key)
+    if bundle is None:
+        head, tail = _templates[name]
+        bundle = _build((head + cfg_json + tail).encode("utf-8"))
+        _bundles.set(key, bundle)
+    return bundle
+
+
+async def get_bundle_async(name: str, cfg: dict) -> AgentBundle:
+    # a cache miss compresses the bundle (brotli 11 takes a while): keep it
+    # off the event loop
+    bundle = _bundles.get((name, _config_json(cfg)))
+    if bundle is None:
+        bundle = await asyncio.to_thread(get_bundle, name, cfg)
+    return bundle
+
+
+def static_bundle(source: str) -> AgentBundle:
+    bundle = _bundles.get(source)
+    if bundle is None:
+        bundle = _build(source.encode("utf-8"))
+        _bundles.set(source, bundle)
+    return bundle
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (t.strip().removeprefix("W/") for t in header.split(","))
+
+
+def bundle_response(request: Request, bundle: AgentBundle, max_age: int | None = None) -> Response:
+    max_age = config.AGENT_MAX_AGE_SEC if max_age is None else max_age
+
+    accept = request.headers.get("accept-encoding", "")
+    if bundle.br is not None and "br" in accept:
+        body, encoding = bundle.br, "br"
+    elif "gzip" in accept:
+        body, encoding = bundle.gzip, "gzip"
+    else:
+        body, encoding = bundle.body, None
+
+    # strong validators must differ per representation
+    etag = bundle.etag if encoding is None else bundle.etag[:-1] + "-" + encoding + '"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}" if max_age > 0 else "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/javascript", headers=headers)
@@ -0,0 +1,80 @@
+(function () {
+  const CFG = __WEBSHIELD_CONFIG__;
+  const DEBUG = CFG.debug;
+  const WID = CFG.wid;
+  const API_BASE = CFG.apiBase;
+
+  if (DEBUG) console.log("[WebShield] DOM agent starting", { WID, API_BASE });
+
+  // Config
+  const ALLOWED_TAGS = ["DIV","SPAN","P","A","INPUT","TEXTAREA","BUTTON","UL","OL","LI","IMG","SECTION","NAV","HEADER","FOOTER","MAIN"];
+  const SUSPICIOUS_TAGS = ["SCRIPT","IFRAME","EMBED","OBJECT","LINK","STYLE"];
+
+  function isElement(node) { return node && node.nodeType === 1; }
+  function isSuspiciousNode(node) {
+    if (!isElement(node)) return false;
+    const tag = node.tagName?.toUpperCase();
+    return !!tag && SUSPICIOUS_TAGS.includes(tag);
+  }
+  function isRemovalOfNonAllowed(node) {
+    if (!isElement(node)) return false;
+    const tag = node.tagName?.toUpperCase();
+    return !!tag && !ALLOWED_TAGS.includes(tag);
+  }
+
+  const queue = window.__webshieldQueue(API_BASE, WID);
+
+  function reportDomTamper(kind, tag, snippet) {
+    queue.push({ type: "dom", kind, tag, snippet });
+    if (DEBUG) console.log("[WebShield] DOM report queued");
+  }
+
+  function handleDetection(kind, tag, snippet) {
+    reportDomTamper(kind, tag, snippet);
+    if (!DEBUG) {
+      queue.flush(true);
+      alert("Suspicious DOM tampering detected! Redirecting to home…");
+      setTimeout(() => window.location.replace("/"), 100);
+    } else {
+      console.warn("[WebShield] (debug) DOM tamper detected, no redirect.");
+    }
+  }
+
+  function handleMutation(mutation) {
+    if (mutation.type !== "childList") return;
+
+    // Added nodes: suspicious?
+    for (const node of mutation.addedNodes) {
+      if (isSuspiciousNode(node)) {
+        const tag = node.tagName?.toUpperCase() || "";
+        const snippet = isElement(node) ? (node.outerHTML || "").slice(0, 200) : "";
+        handleDetection("added-suspicious", tag, snippet);
+        return true;
+      }
+    }
+
+    // Removed nodes: non-allowed?
+    for (const node of mutation.removedNodes) {
+      if (isRemovalOfNonAllowed(node)) {
+        const tag = node.tagName?.toUpperCase() || "";
+        handleDetection("removed-nonallowed", tag, "");
+        return true;
+      }
+    }
+    return false;
+  }
+
+  window.addEventListener("load", function () {
+    try {
+      const observer = new MutationObserver(function (mutations) {
+        for (const m of mutations) {
+          if (handleMutation(m)) break;
+        }
+      });
+      observer.observe(document.body, { childList: true, subtree: true });
+      console.log("WebShield DOM Agent activated");
+    } catch (e) {
+      console.error("[WebShield] DOM observer error:", e);
+    }
+  });
+})();
@@ -0,0 +1,60 @@
+(function () {
+  // Shared by the XSS and DOM agents (prepended to both bundles): buffers
+  // their reports and sends them to /api/events/batch together, gzipped,
+  // via sendBeacon. Flushes on a short timer, when the buffer is full and
+  // when the page is hidden or unloaded, so a redirect never loses events.
+  if (window.__webshieldQueue) return;
+
+  const MAX_EVENTS = 50;
+  const FLUSH_MS = 2000;
+  const queues = {};
+
+  function gzip(text) {
+    if (typeof CompressionStream === "undefined") return Promise.resolve(text);
+    const stream = new Blob([text]).stream().pipeThrough(new CompressionStream("gzip"));
+    return new Response(stream).arrayBuffer();
+  }
+
+  function create(apiBase, wid) {
+    const url = apiBase + "/api/events/batch";
+    let events = [];
+    let timer = null;
+
+    function send(data) {
+      // text/plain keeps the cross-origin beacon free of a CORS preflight
+      const blob = new Blob([data], { type: "text/plain" });
+      if (navigator.sendBeacon && navigator.sendBeacon(url, blob)) return;
+      fetch(url, { method: "POST", body: blob, mode: "cors", credentials: "omit", keepalive: true })
+        .catch(err => console.error("[WebShield] event batch failed:", err));
+    }
+
+    function flush(sync) {
+      clearTimeout(timer);
+      timer = null;
+      if (!events.length) return;
+      const text = JSON.stringify({ website_id: wid, page_url: window.location.href, events });
+      events = [];
+      // page going away: no time for async compression
+      if (sync) send(text);
+      else gzip(text).then(send, () => send(text));
+    }
+
+    function push(event) {
+      event.occurred_at = new Date().toISOString();
+      events.push(event);
+      if (events.length >= MAX_EVENTS) flush(false);
+      else if (!timer) timer = setTimeout(() => flush(false), FLUSH_MS);
+    }
+
+    window.addEventListener("pagehide", () => flush(true));
+    document.addEventListener("visibilitychange", () => {
+      if (document.visibilityState === "hidden") flush(true);
+    });
+    return { push, flush };
+  }
+
+  window.__webshieldQueue = function (apiBase, wid) {
+    const key = apiBase + "|" + wid;
+    return queues[key] || (queues[key] = create(apiBase, wid));
+  };
+})();
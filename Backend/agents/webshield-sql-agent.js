@@ -0,0 +1,85 @@
+(function () {
+  const CFG = __WEBSHIELD_CONFIG__;
+  const WEBSITE_ID = CFG.wid;
+  const API_URL = CFG.apiBase + "/api/events/batch";
+
+  // All values in one request, scored server-side in one batch; the
+  // callback gets one prediction per value, in order.
+  function sendSQLQueries(values, callback) {
+    fetch(API_URL, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        website_id: WEBSITE_ID,
+        page_url: window.location.href,
+        events: values.map(query => ({ type: "sqli", query }))
+      }),
+    })
+    .then(res => res.json())
+    .then(data => {
+      const results = (data.results || []).map(r => r || {});
+      console.log("Sending SQL queries:", values);
+      console.log("Predictions:", results);
+      if (results.some(r => r.prediction === "malicious")) {
+        alert("SQL Injection attempt detected!");
+      }
+      callback(null, results);
+    })
+    .catch(err => {
+      console.error("Error:", err);
+      callback(err, null);
+    });
+  }
+
+  document.addEventListener("DOMContentLoaded", function () {
+    const inputs = document.getElementsByTagName("input");
+    const submitButton = document.querySelector("button[type='submit'], input[type='submit']");
+
+    if (submitButton) {
+      submitButton.addEventListener("click", function (e) {
+        e.preventDefault(); 
+
+        const valuesToCheck = [];
+        for (let i = 0; i < inputs.length; i++) {
+          const val = inputs[i].value.trim();
+          
+          if (val.endsWith("@gmail.com") || val.endsWith("@yahoo.com") || val.endsWith("@hotmail.com")) {
+            console.warn("Skipping email input:", val);
+            continue;  
+          }
+          if (val !== "") {
+            valuesToCheck.push(val);
+          }
+        }
+
+        if (valuesToCheck.length === 0) {
+          e.target.form.submit();
+          return;
+        }
+
+        sendSQLQueries(valuesToCheck, function(err, results) {
+          const maliciousDetected = !!err || results.some(r => r.prediction === "malicious");
+          if (!maliciousDetected) {
+            console.log("All inputs are clean. Submitting form...");
+            e.target.form.submit();
+          } else {
+            console.warn("Malicious input detected. Form blocked.");
+          }
+        });
+      });
+    }
+  });
+
+  const queryString = window.location.search;
+  if (queryString) {
+    const DqueryString = decodeURIComponent(queryString.substring(1));
+    sendSQLQueries([DqueryString], function(err, results) {
+      if (!err && results[0] && results[0].prediction === "malicious") {
+          alert("Malicious query detected in URL. Redirecting to home page.");
+          window.location.href = "/";
+        }
+    });
+  }
+
+  console.log("WebShield SQLI Agent active for Website ID:", WEBSITE_ID);
+})();
@@ -0,0 +1,76 @@
+(function() {
+  const CFG = __WEBSHIELD_CONFIG__;
+  const DEBUG = CFG.debug;
+  const WID = CFG.wid;
+  const API_BASE = CFG.apiBase;
+
+  if (DEBUG) console.log("[WebShield] XSS agent starting", { WID, API_BASE });
+
+  const suspiciousPatterns = [
+    /<script.*?>.*?<\/script>/i,
+    /%3C\s*script.*?%3E.*?%3C\s*\/\s*script\s*%3E/i,
+    /javascript:/i,
+    /onerror\s*=\s*/i,
+    /onload\s*=\s*/i,
+    /<.*?on\w+\s*=\s*['"].*?['"].*?>/i,
+    /document\.cookie/i,
+    /<iframe/i,
+    /<img.*?src=.*?>/i
+  ];
+  function isMalicious(v) { return suspiciousPatterns.some(re => re.test(v)); }
+
+  const queue = window.__webshieldQueue(API_BASE, WID);
+
+  function reportXSS(vector, payload) {
+    queue.push({ type: "xss", vector, payload: String(payload).slice(0, 500) });
+    if (DEBUG) console.log("[WebShield] XSS report queued");
+  }
+
+  function handleDetection(vector, value) {
+    reportXSS(vector, value);
+    if (!DEBUG) {
+      queue.flush(true);
+      alert("Script Injection Detected! Redirecting to home…");
+    
+      setTimeout(() => window.location.replace("/"), 100);
+    } else {
+      console.warn("[WebShield] (debug) Detected XSS, no redirect.");
+    }
+  }
+
+  function checkInputs() {
+    const inputs = document.querySelectorAll("input[type='text'], textarea");
+    for (const input of inputs) {
+      const v = (input.value || "").trim();
+      if (v && isMalicious(v)) {
+        handleDetection("input", v);
+        return true;
+      }
+    }
+    return false;
+  }
+
+  function checkURLParams() {
+    const params = new URLSearchParams(window.location.search);
+    for (const [k, raw] of params.entries()) {
+      let v = raw; try { v = decodeURIComponent(raw); } catch (_ ) {}
+      if (v && isMalicious(v)) {
+        handleDetection("url", v);
+        return true;
+      }
+    }
+    return false;
+  }
+
+  document.addEventListener("DOMContentLoaded", function () {
+    if (checkInputs()) return;
+    if (checkURLParams()) return;
+
+    // Intercept form submit so we can stop it on detection
+    for (const form of document.querySelectorAll("form")) {
+      form.addEventListener("submit", function (e) {
+        if (checkInputs()) e.preventDefault();
+      });
+    }
+  });
+})();
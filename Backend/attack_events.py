@@ -0,0 +1,176 @@
+import base64
+from datetime import datetime
+from typing import Iterable, Sequence
+
+from sqlalchemy import Float, String, and_, cast, func, literal, null, or_, select, true, union_all
+
+import models
+
+# type -> (model, timestamp column, ip column, query column, prediction column, score column)
+EVENT_SOURCES = {
+    "xss": (models.XSSLog, "created_at", "ip_address", None, None, None),
+    "defacement": (models.DefacementLog, "timestamp", None, None, "prediction", None),
+    "dom": (models.DomManipulationLog, "created_at", "ip_address", None, None, None),
+    "sql_injection": (models.SQLLog, "created_at", None, "query", "prediction", "score"),
+}
+EVENT_TYPES = tuple(EVENT_SOURCES)
+
+# Rows a log table holds that are not attack events: the defacement scheduler
+# logs every check, but only "defaced" ones belong in the timeline (and are
+# served by the partial ix_defacement_logs_website_timestamp_defaced index).
+EVENT_FILTERS = {
+    "defacement": lambda model: model.prediction == "defaced",
+}
+# the same rule for rows that have not been written yet (live feed)
+EVENT_ROW_FILTERS = {
+    "defacement": lambda row: row.get("prediction") == "defaced",
+}
+
+
+def encode_cursor(occurred_at: datetime, type_: str, id_: int) -> str:
+    raw = f"{occurred_at.isoformat()}|{type_}|{id_}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str, int]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    ts, type_, id_ = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+    if type_ not in EVENT_SOURCES:
+        raise ValueError("unknown event type in cursor")
+    return datetime.fromisoformat(ts), type_, int(id_)
+
+
+def _column(model, name, type_):
+    if name is None:
+        return cast(null(), type_)
+    return getattr(model, name)
+
+
+def _branch(
+    type_: str,
+    website_ids: Sequence[int] | None,
+    start: datetime | None,
+    end: datetime | None,
+    after: tuple[datetime, str, int] | None,
+    limit: int | None,
+    website_col=None,
+):
+    model, ts_name, ip_name, query_name, pred_name, score_name = EVENT_SOURCES[type_]
+    ts = getattr(model, ts_name)
+
+    stmt = select(
+        model.id.label("id"),
+        literal(type_, String).label("type"),
+        model.website_id.label("website_id"),
+        ts.label("occurred_at"),
+        _column(model, ip_name, String).label("ip_address"),
+        _column(model, query_name, String).label("query"),
+        _column(model, pred_name, String).label("prediction"),
+        _column(model, score_name, Float).label("score"),
+    )
+
+    if type_ in EVENT_FILTERS:
+        stmt = stmt.where(EVENT_FILTERS[type_](model))
+    if website_ids is not None:
+        stmt = stmt.where(
+            model.website_id == website_ids[0] if len(website_ids) == 1
+            else model.website_id.in_(website_ids)
+        )
+    if website_col is not None:
+        # correlated to an outer site list (LATERAL)
+        stmt = stmt.where(model.website_id == website_col)
+    if start is not None:
+        stmt = stmt.where(ts >= start)
+    if end is not None:
+        stmt = stmt.where(ts < end)
+
+    if after is not None:
+        # rows strictly after the cursor in (occurred_at, type, id) DESC order
+        c_ts, c_type, c_id = after
+        if type_ < c_type:
+            stmt = stmt.where(ts <= c_ts)
+        elif type_ == c_type:
+            stmt = stmt.where(or_(ts < c_ts, and_(ts == c_ts, model.id < c_id)))
+        else:
+            stmt = stmt.where(ts < c_ts)
+
+    if limit is not None:
+        # each branch can be served by its (website_id, ts) index and stop early
+        stmt = stmt.order_by(ts.desc(), model.id.desc()).limit(limit)
+    return stmt
+
+
+def type_events_query(
+    type_: str,
+    website_ids: Sequence[int],
+    start: datetime | None = None,
+    end: datetime | None = None,
+):
+    # One event type, oldest first, unlimited. For full-range scans (export),
+    # where ordering across tables would make Postgres sort the whole range
+    # before returning the first row.
+    model, ts_name, *_ = EVENT_SOURCES[type_]
+    ts = getattr(model, ts_name)
+    return _branch(type_, list(website_ids), start, end, None, None).order_by(ts, model.id)
+
+
+def attack_events_query(
+    website_ids: Sequence[int] | None = None,
+    *,
+    types: Iterable[str] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    cursor: str | None = None,
+    limit: int | None = 500,
+):
+    # One UNION ALL over every log table, newest first. Pass the cursor of
+    # the last row to get the next page.
+    types = [t for t in EVENT_TYPES if types is None or t in set(types)]
+    if not types:
+        raise ValueError("no event types selected")
+    after = decode_cursor(cursor) if cursor else None
+    ids = list(website_ids) if website_ids is not None else None
+
+    branches = [_branch(t, ids, start, end, after, limit) for t in types]
+    events = (
+        union_all(*(b.subquery().select() for b in branches)) if len(branches) > 1
+        else branches[0]
+    ).subquery("events")
+
+    stmt = select(events).order_by(
+        events.c.occurred_at.desc(), events.c.type.desc(), events.c.id.desc()
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def next_cursor(rows: Sequence, limit: int) -> str | None:
+    if len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    return encode_cursor(last["occurred_at"], last["type"], last["id"])
+
+
+def latest_events_per_site_query(sites, *, per_site: int = 500, start: datetime | None = None):
+    # Newest `per_site` events for every site id in `sites` (a subquery or
+    # CTE with an `id` column) in one statement: each table is read through
+    # a LATERAL index scan per site, then the per-type candidates are cut
+    # down to per_site rows per site. Cost grows with sites * per_site, not
+    # with table size.
+    parts = []
+    for type_ in EVENT_TYPES:
+        branch = _branch(type_, None, start, None, None, per_site, website_col=sites.c.id).lateral(f"{type_}_events")
+        parts.append(select(branch).select_from(sites.join(branch, true())))
+    events = union_all(*parts).subquery("events")
+
+    rank = func.row_number().over(
+        partition_by=events.c.website_id,
+        order_by=(events.c.occurred_at.desc(), events.c.type.desc(), events.c.id.desc()),
+    ).label("rank")
+    ranked = select(events, rank).subquery("ranked")
+    return (
+        select(*(c for c in ranked.c if c.name != "rank"))
+        .where(ranked.c.rank <= per_site)
+        .order_by(ranked.c.website_id, ranked.c.occurred_at.desc(), ranked.c.type.desc(), ranked.c.id.desc())
+    )
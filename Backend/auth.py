@@ -1,15 +1,79 @@
+import time
+from typing import NamedTuple
+
 from fastapi import Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from db import get_db
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from cache import TTLCache
+from db import get_async_db
 from models import User
 
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
+
+class CurrentUser(NamedTuple):
+    # what routes read off the authenticated user; never a live ORM object,
+    # so a cached value can't lazy-load or leak between sessions
+    id: int
+    email: str | None
+    name: str | None
+    plan: str | None
+
+
+# The session cookie is signed (SessionMiddleware), so its user_id claim is
+# trusted as-is; the cache only saves re-reading the user row on every
+# dashboard request. Entries are dropped on logout and whenever a User row
+# is updated or deleted in this process; the short TTL bounds staleness for
+# changes made by other workers.
+user_cache = TTLCache(
+    maxsize=config.USER_CACHE_SIZE,
+    ttl=config.USER_CACHE_TTL_SEC,
+    name="users",
+)
+_db_lookups = 0
+_db_lookup_ms = 0.0
+
+
+def invalidate_user(user_id: int | None):
+    if user_id:
+        user_cache.delete(int(user_id))
+
+
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_async_db)) -> CurrentUser:
+    global _db_lookups, _db_lookup_ms
     user_id = request.session.get("user_id")
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    
-    user = db.query(User).filter(User.id == user_id).first()
+
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    t0 = time.perf_counter()
+    user = await db.get(User, user_id)
+    _db_lookups += 1
+    _db_lookup_ms += (time.perf_counter() - t0) * 1000
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    
-    return user
+
+    current = CurrentUser(id=user.id, email=user.email, name=user.name, plan=user.plan)
+    user_cache.set(user.id, current)
+    return current
+
+
+def user_cache_stats() -> dict:
+    stats = user_cache.stats()
+    avg_ms = _db_lookup_ms / _db_lookups if _db_lookups else 0.0
+    stats.update(
+        db_lookups=_db_lookups,
+        avg_db_lookup_ms=round(avg_ms, 3),
+        # every hit is one user lookup we did not send to the database
+        est_time_saved_ms=round(stats["hits"] * avg_ms, 1),
+    )
+    return stats
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    invalidate_user(target.id)
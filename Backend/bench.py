@@ -0,0 +1,206 @@
+# bench.py
+# Micro-benchmarks for the backend hot paths.
+#   python bench.py tokenizer [--n 10000] [--batch 64]
+#   python bench.py defacement [--batch-sizes 1,4,8,16,32] [--images DIR]
+#   python bench.py backends --model sqli [--backends keras,onnx,tflite] [--int8] [--batch 1]
+import argparse
+import json
+import os
+import random
+import resource
+import string
+import subprocess
+import sys
+import time
+import tracemalloc
+
+
+def sample_queries(n: int, seed: int = 0) -> list[str]:
+    rnd = random.Random(seed)
+    attacks = [
+        "admin' OR '1'='1",
+        "1; DROP TABLE users --",
+        "' UNION SELECT username, password FROM users --",
+        "1' AND SLEEP(5) --",
+    ]
+    out = []
+    for _ in range(n):
+        r = rnd.random()
+        if r < 0.2:
+            out.append(rnd.choice(attacks))
+        elif r < 0.6:
+            out.append("".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(3, 12))) + "@example.com")
+        else:
+            out.append(" ".join(
+                "".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(2, 8)))
+                for _ in range(rnd.randint(1, 6))
+            ))
+    return out
+
+
+def bench_tokenizer(args):
+    from sqli_tokenizer import get_tokenizer
+
+    tok = get_tokenizer()
+    queries = sample_queries(args.n)
+    batches = [queries[i:i + args.batch] for i in range(0, len(queries), args.batch)]
+
+    # warm-up, then measure steady state over several rounds
+    for b in batches:
+        tok.encode_batch(b)
+
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        for b in batches:
+            tok.encode_batch(b)
+    elapsed = time.perf_counter() - t0
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = args.n * args.rounds
+    print(f"tokenizer: vocab={len(tok.word_index)} queries={total} batch={args.batch}")
+    print(f"  per-query encode: {elapsed / total * 1e6:.2f} us  ({total / elapsed:,.0f} q/s)")
+    print(f"  retained after run: {(current - base) / 1024:.1f} KiB  peak: {(peak - base) / 1024:.1f} KiB")
+
+
+def load_images(directory: str | None, n: int) -> list[bytes]:
+    import io
+    import os
+    from PIL import Image
+
+    if directory:
+        files = sorted(
+            os.path.join(directory, f) for f in os.listdir(directory)
+            if f.lower().endswith((".jpg", ".jpeg", ".png"))
+        )
+        blobs = []
+        for path in files[:n]:
+            with open(path, "rb") as fh:
+                blobs.append(fh.read())
+        return blobs
+
+    # synthetic 1280x800 "screenshots" so decode/resize cost is realistic
+    rnd = random.Random(0)
+    blobs = []
+    for _ in range(n):
+        img = Image.new("RGB", (1280, 800), tuple(rnd.randrange(256) for _ in range(3)))
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=80)
+        blobs.append(buf.getvalue())
+    return blobs
+
+
+def bench_defacement(args):
+    from defacement_loop import classify_images
+
+    sizes = [int(s) for s in args.batch_sizes.split(",")]
+    images = load_images(args.images, max(sizes) * args.rounds)
+    if not images:
+        raise SystemExit("no images found")
+
+    classify_images(images[:max(sizes)])  # warm-up / graph build
+    print(f"defacement: {len(images)} images")
+    for size in sizes:
+        batches = [images[i:i + size] for i in range(0, len(images), size)]
+        t0 = time.perf_counter()
+        done = 0
+        for b in batches:
+            classify_images(b)
+            done += len(b)
+        elapsed = time.perf_counter() - t0
+        print(f"  batch={size:<4d} {done / elapsed:8.1f} img/s  {elapsed / len(batches) * 1000:8.1f} ms/batch")
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as fh:
+        return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def bench_backend_one(args):
+    # Runs in its own process (see bench_backends) so RSS reflects only
+    # this runtime and model.
+    from convert_models import keras_path, sample_inputs
+    from model_backends import load_backend
+
+    x = sample_inputs(args.model, max(args.batch, 64))
+    batch = x[:args.batch]
+    rss_before = _rss_mb()
+    t0 = time.perf_counter()
+    backend = load_backend(args.backend, keras_path(args.model), args.int8)
+    load_ms = (time.perf_counter() - t0) * 1000
+    for _ in range(10):
+        backend.predict(batch)
+
+    times = []
+    for _ in range(args.n):
+        t0 = time.perf_counter()
+        backend.predict(batch)
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    print(json.dumps({
+        "backend": args.backend + (" int8" if args.int8 and args.backend != "keras" else ""),
+        "load_ms": load_ms,
+        "p50_ms": times[len(times) // 2],
+        "p99_ms": times[min(len(times) - 1, int(len(times) * 0.99))],
+        "rss_mb": _rss_mb(),
+        "model_rss_mb": _rss_mb() - rss_before,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def bench_backends(args):
+    print(f"{args.model}: batch={args.batch} calls={args.n} (one process per backend)")
+    print(f"  {'backend':14s} {'load ms':>9s} {'p50 ms':>9s} {'p99 ms':>9s} {'RSS MB':>8s} {'peak MB':>8s}")
+    for backend in args.backends.split(","):
+        cmd = [sys.executable, __file__, "backend-one", "--model", args.model, "--backend", backend,
+               "--batch", str(args.batch), "--n", str(args.n)] + (["--int8"] if args.int8 else [])
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            err = (proc.stderr.strip().splitlines() or ["failed"])[-1]
+            print(f"  {backend:14s} error: {err}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"  {r['backend']:14s} {r['load_ms']:9.0f} {r['p50_ms']:9.2f} {r['p99_ms']:9.2f} "
+              f"{r['rss_mb']:8.0f} {r['peak_rss_mb']:8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebShieldAI backend benchmarks")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("tokenizer", help="SQLi tokenizer encode cost and memory")
+    p.add_argument("--n", type=int, default=10000)
+    p.add_argument("--batch", type=int, default=64)
+    p.add_argument("--rounds", type=int, default=5)
+    p.set_defaults(func=bench_tokenizer)
+
+    p = sub.add_parser("defacement", help="defacement CNN throughput per batch size")
+    p.add_argument("--batch-sizes", default="1,4,8,16,32")
+    p.add_argument("--images", help="directory of screenshots (default: synthetic)")
+    p.add_argument("--rounds", type=int, default=4)
+    p.set_defaults(func=bench_defacement)
+
+    p = sub.add_parser("backends", help="inference latency and memory per backend")
+    p.add_argument("--model", choices=["sqli", "defacement"], default="sqli")
+    p.add_argument("--backends", default="keras,onnx,tflite")
+    p.add_argument("--int8", action="store_true", help="use the int8 exports (onnx/tflite)")
+    p.add_argument("--batch", type=int, default=1)
+    p.add_argument("--n", type=int, default=1000)
+    p.set_defaults(func=bench_backends)
+
+    p = sub.add_parser("backend-one", help=argparse.SUPPRESS)
+    p.add_argument("--model", required=True)
+    p.add_argument("--backend", required=True)
+    p.add_argument("--int8", action="store_true")
+    p.add_argument("--batch", type=int, default=1)
+    p.add_argument("--n", type=int, default=1000)
+    p.set_defaults(func=bench_backend_one)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,3 +7,133 @@ SMTP_USERNAME = os.getenv("SMTP_USERNAME", "tanvir.chowdhury.us@gmail.com")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "jyot hetw szhl lruy")
 FROM_EMAIL = os.getenv("FROM_EMAIL", "alerts@webshieldai.com")
 FROM_NAME = os.getenv("FROM_NAME", "Web Shield AI Alerts")
+# set SMTP_USE_SSL=0 and SMTP_USERNAME="" to point alerts at a local test server (aiosmtpd)
+SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "1") == "1"
+
+# Alert dispatch
+ALERT_COALESCE_WINDOW_SEC = float(os.getenv("ALERT_COALESCE_WINDOW_SEC", "300"))
+ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", "10000"))
+ALERT_SMTP_IDLE_SEC = float(os.getenv("ALERT_SMTP_IDLE_SEC", "60"))
+
+# SQLi micro-batching
+SQLI_MAX_BATCH_SIZE = int(os.getenv("SQLI_MAX_BATCH_SIZE", "64"))
+SQLI_MAX_WAIT_MS = float(os.getenv("SQLI_MAX_WAIT_MS", "5"))
+SQLI_CACHE_SIZE = int(os.getenv("SQLI_CACHE_SIZE", "50000"))
+SQLI_CACHE_TTL_SEC = float(os.getenv("SQLI_CACHE_TTL_SEC", "3600"))
+# lexical pre-filter answering clearly benign inputs without the model (sqli_prefilter.py)
+SQLI_PREFILTER = os.getenv("SQLI_PREFILTER", "1") == "1"
+SQLI_PREFILTER_MAX_LEN = int(os.getenv("SQLI_PREFILTER_MAX_LEN", "256"))
+
+# Inference runtime per model (model_backends.py): keras, onnx or tflite.
+# onnx/tflite serve the files written by convert_models.py next to the .h5;
+# *_QUANTIZED picks the int8 export.
+SQLI_BACKEND = os.getenv("SQLI_BACKEND", "keras")
+SQLI_QUANTIZED = os.getenv("SQLI_QUANTIZED", "0") == "1"
+DEFACEMENT_BACKEND = os.getenv("DEFACEMENT_BACKEND", "keras")
+DEFACEMENT_QUANTIZED = os.getenv("DEFACEMENT_QUANTIZED", "0") == "1"
+# intra-op threads for onnx/tflite; 0 = runtime default
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0"))
+
+# Agent event batches (/api/events/batch)
+EVENT_BATCH_MAX_EVENTS = int(os.getenv("EVENT_BATCH_MAX_EVENTS", "100"))
+EVENT_BATCH_MAX_BYTES = int(os.getenv("EVENT_BATCH_MAX_BYTES", str(64 * 1024)))
+# after decompression; guards against gzip bombs
+EVENT_BATCH_MAX_DECODED_BYTES = int(os.getenv("EVENT_BATCH_MAX_DECODED_BYTES", str(1024 * 1024)))
+
+# Attack-log ingestion
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "50000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+LOG_FLUSH_INTERVAL_MS = float(os.getenv("LOG_FLUSH_INTERVAL_MS", "200"))
+
+# Website metadata cache for agent endpoints
+SITE_CACHE_SIZE = int(os.getenv("SITE_CACHE_SIZE", "100000"))
+SITE_CACHE_TTL_SEC = float(os.getenv("SITE_CACHE_TTL_SEC", "60"))
+SITE_CACHE_MISS_TTL_SEC = float(os.getenv("SITE_CACHE_MISS_TTL_SEC", "10"))
+
+# Agent script delivery
+AGENT_MAX_AGE_SEC = int(os.getenv("AGENT_MAX_AGE_SEC", "300"))
+AGENT_BUNDLE_CACHE_SIZE = int(os.getenv("AGENT_BUNDLE_CACHE_SIZE", "20000"))
+# origin the agents report back to; never taken from the request's Host header
+PUBLIC_API_BASE = os.getenv("PUBLIC_API_BASE", "http://127.0.0.1:8000").rstrip("/")
+
+# Uptime monitor
+UPTIME_MAX_CONCURRENCY = int(os.getenv("UPTIME_MAX_CONCURRENCY", "200"))
+UPTIME_PER_HOST_CONCURRENCY = int(os.getenv("UPTIME_PER_HOST_CONCURRENCY", "2"))
+UPTIME_JITTER = float(os.getenv("UPTIME_JITTER", "0.1"))
+UPTIME_REFRESH_SEC = float(os.getenv("UPTIME_REFRESH_SEC", "60"))
+# per-plan check intervals, e.g. "free=300,pro=60"; unlisted plans use the default
+UPTIME_PLAN_INTERVALS = {
+    plan.strip(): float(sec)
+    for plan, _, sec in (item.partition("=") for item in os.getenv("UPTIME_PLAN_INTERVALS", "").split(","))
+    if plan.strip() and sec
+}
+# raw checks older than this are dropped; hourly rollups keep the history
+UPTIME_RAW_RETENTION_DAYS = int(os.getenv("UPTIME_RAW_RETENTION_DAYS", "7"))
+
+# Defacement monitor
+DEFACEMENT_INTERVAL_SEC = float(os.getenv("DEFACEMENT_INTERVAL_SEC", "60"))
+DEFACEMENT_MAX_IN_FLIGHT = int(os.getenv("DEFACEMENT_MAX_IN_FLIGHT", "16"))
+DEFACEMENT_FETCH_WORKERS = int(os.getenv("DEFACEMENT_FETCH_WORKERS", "8"))
+# threads decoding/resizing screenshots into the classifier batch
+DEFACEMENT_DECODE_WORKERS = int(os.getenv("DEFACEMENT_DECODE_WORKERS", "4"))
+DEFACEMENT_MAX_BATCH_SIZE = int(os.getenv("DEFACEMENT_MAX_BATCH_SIZE", "16"))
+DEFACEMENT_MAX_WAIT_MS = float(os.getenv("DEFACEMENT_MAX_WAIT_MS", "50"))
+# clean/defaced check results are high-volume; keep them for at most this many days
+DEFACEMENT_RETENTION_DAYS = int(os.getenv("DEFACEMENT_RETENTION_DAYS", "1"))
+DEFACEMENT_PLAN_INTERVALS = {
+    plan.strip(): float(sec)
+    for plan, _, sec in (item.partition("=") for item in os.getenv("DEFACEMENT_PLAN_INTERVALS", "").split(","))
+    if plan.strip() and sec
+}
+
+# Log retention (daily partitions, see partitions.py)
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "30"))
+# per-plan retention, e.g. "free=7,pro=90"; unlisted plans use LOG_RETENTION_DAYS
+LOG_PLAN_RETENTION_DAYS = {
+    plan.strip(): int(days)
+    for plan, _, days in (item.partition("=") for item in os.getenv("LOG_PLAN_RETENTION_DAYS", "").split(","))
+    if plan.strip() and days
+}
+LOG_PARTITION_PREMAKE_DAYS = int(os.getenv("LOG_PARTITION_PREMAKE_DAYS", "7"))
+LOG_MAINTENANCE_INTERVAL_SEC = float(os.getenv("LOG_MAINTENANCE_INTERVAL_SEC", "3600"))
+
+# Schema migrations (db.py). Migrating is a deploy step (`python db.py`);
+# AUTO_MIGRATE=1 also migrates on API start, except MANUAL_REVISIONS.
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "0") == "1"
+
+# Sessions and the authenticated-user cache (auth.py)
+SESSION_SECRET = os.getenv("SESSION_SECRET", "9f2b3a6e5c7c4965b5c3d11ecac7d6f1bd8446e23c4db487915b6a04e7db47bc")
+SESSION_MAX_AGE_SEC = int(os.getenv("SESSION_MAX_AGE_SEC", str(14 * 24 * 3600)))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SEC = float(os.getenv("USER_CACHE_TTL_SEC", "30"))
+
+# Dashboard snapshot cache (dashboard.py)
+DASHBOARD_CACHE_SIZE = int(os.getenv("DASHBOARD_CACHE_SIZE", "5000"))
+DASHBOARD_CACHE_TTL_SEC = float(os.getenv("DASHBOARD_CACHE_TTL_SEC", "10"))
+
+# Live attack feed (live_feed.py): events buffered per dashboard connection
+# before a slow client is told to resync instead
+LIVE_FEED_QUEUE_SIZE = int(os.getenv("LIVE_FEED_QUEUE_SIZE", "256"))
+LIVE_FEED_HEARTBEAT_SEC = float(os.getenv("LIVE_FEED_HEARTBEAT_SEC", "15"))
+
+# Load and warm every model in the background at startup (model_registry.py).
+# Off: each model loads on its first request and /readyz reports ready at once.
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+
+# Bulk export (export.py): rows fetched per server-side cursor round trip,
+# and encoded/sent as one chunk
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+
+# Password hashing (passwords.py); existing hashes are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# queued + running hash calls before logins are rejected with 503
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "32"))
+
+# Async DB pool (request path, see db.py)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# how long a request waits for a free connection before erroring out
+DB_POOL_TIMEOUT_SEC = float(os.getenv("DB_POOL_TIMEOUT_SEC", "5"))
+DB_POOL_RECYCLE_SEC = int(os.getenv("DB_POOL_RECYCLE_SEC", "1800"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
@@ -0,0 +1,160 @@
+# convert_models.py
+# Exports the Keras models to ONNX / TFLite for the lightweight inference
+# backends (model_backends.py) and checks the exports against Keras.
+#
+#   python convert_models.py sqli --to onnx --check
+#   python convert_models.py defacement --to tflite --int8 --check --images screenshots/
+#   python convert_models.py parity sqli --backend onnx --int8
+#
+# Writes next to the .h5 (ml/sqli_classifier_model.onnx, ...int8.tflite),
+# which is where SQLI_BACKEND / DEFACEMENT_BACKEND look. --int8 quantizes
+# weights (ONNX: dynamic int8; TFLite: int8 with activations calibrated on
+# sample inputs, float fallback for unsupported ops). Needs TensorFlow plus
+# tf2onnx and onnxruntime for ONNX; the API servers themselves only need
+# the runtime they serve from.
+import argparse
+import sys
+
+import numpy as np
+
+from model_backends import KerasBackend, load_backend, model_path
+
+SQLI_THRESHOLD = 0.8  # ml_model.predict_batch
+
+
+def _sqli_samples(n: int, seed: int = 0) -> np.ndarray:
+    from bench import sample_queries
+    from sqli_tokenizer import get_tokenizer
+    return get_tokenizer().encode_batch(sample_queries(n, seed))
+
+
+def _defacement_samples(n: int, seed: int = 0, images: str | None = None) -> np.ndarray:
+    from defacement_loop import img_height, img_width, preprocess
+    if images:
+        from bench import load_images
+        batch, ok = preprocess(load_images(images, n))
+        return batch[np.asarray(ok, dtype=bool)]
+    # noise rather than flat colours, so every filter sees some activation
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, 255, size=(n, img_height, img_width, 3)).astype(np.float32)
+
+
+def _sqli_labels(out: np.ndarray) -> np.ndarray:
+    return out[:, 0] >= SQLI_THRESHOLD
+
+
+def _defacement_labels(out: np.ndarray) -> np.ndarray:
+    return out.argmax(axis=-1)
+
+
+# name -> (keras path, sample inputs, labels from raw model output)
+def _models():
+    import defacement_loop
+    import ml_model
+    return {
+        "sqli": (ml_model.MODEL_PATH, _sqli_samples, _sqli_labels),
+        "defacement": (defacement_loop.MODEL_PATH, _defacement_samples, _defacement_labels),
+    }
+
+
+def keras_path(name: str) -> str:
+    return _models()[name][0]
+
+
+def sample_inputs(name: str, n: int, images: str | None = None) -> np.ndarray:
+    _, sample_fn, _ = _models()[name]
+    return sample_fn(n, images=images) if name == "defacement" else sample_fn(n)
+
+
+def to_onnx(keras_path: str, out_path: str, int8: bool):
+    import tensorflow as tf
+    import tf2onnx
+
+    model = KerasBackend(keras_path).model
+    spec = [tf.TensorSpec((None, *model.input_shape[1:]), tf.as_dtype(model.inputs[0].dtype), name="input")]
+    if not int8:
+        tf2onnx.convert.from_keras(model, input_signature=spec, opset=17, output_path=out_path)
+        return
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    fp32_path = model_path(keras_path, "onnx")
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=17, output_path=fp32_path)
+    quantize_dynamic(fp32_path, out_path, weight_type=QuantType.QInt8)
+
+
+def to_tflite(keras_path: str, out_path: str, int8: bool, calibration: np.ndarray | None = None):
+    import tensorflow as tf
+
+    model = KerasBackend(keras_path).model
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if int8:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if calibration is not None and len(calibration):
+            dtype = tf.as_dtype(model.inputs[0].dtype).as_numpy_dtype
+            converter.representative_dataset = lambda: ([row[None].astype(dtype)] for row in calibration)
+    with open(out_path, "wb") as fh:
+        fh.write(converter.convert())
+
+
+def parity(name: str, backend: str, int8: bool, n: int = 256, images: str | None = None,
+           atol: float | None = None, min_agreement: float = 0.99) -> bool:
+    # Same inputs through Keras and the export: compare raw outputs and the
+    # labels the app derives from them.
+    source, _, labels = _models()[name]
+    x = sample_inputs(name, n, images)
+    expected = KerasBackend(source).predict(x)
+    got = load_backend(backend, source, int8).predict(x)
+
+    if atol is None:
+        atol = 0.05 if int8 else 1e-4
+    max_diff = float(np.abs(expected - got).max()) if len(x) else 0.0
+    agreement = float((labels(expected) == labels(got)).mean()) if len(x) else 1.0
+    ok = max_diff <= atol and agreement >= min_agreement
+    print(f"{name} {backend}{' int8' if int8 else ''}: {len(x)} inputs  "
+          f"max |diff|={max_diff:.2e} (tol {atol:g})  label agreement={agreement:.2%} "
+          f"(min {min_agreement:.0%})  {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export WebShieldAI models to ONNX / TFLite")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    for name in ("sqli", "defacement"):
+        p = sub.add_parser(name, help=f"convert the {name} model")
+        p.add_argument("--to", choices=["onnx", "tflite"], required=True)
+        p.add_argument("--int8", action="store_true", help="quantize weights to int8")
+        p.add_argument("--check", action="store_true", help="run the parity check afterwards")
+        p.add_argument("--samples", type=int, default=256, help="calibration / parity inputs")
+        p.add_argument("--images", help="screenshot directory for defacement calibration and parity")
+        p.set_defaults(model=name)
+
+    p = sub.add_parser("parity", help="compare an existing export with the Keras model")
+    p.add_argument("model", choices=["sqli", "defacement"])
+    p.add_argument("--backend", choices=["onnx", "tflite"], required=True)
+    p.add_argument("--int8", action="store_true")
+    p.add_argument("--samples", type=int, default=256)
+    p.add_argument("--images")
+    p.add_argument("--atol", type=float, help="max abs output difference (default 1e-4, 0.05 for int8)")
+    p.add_argument("--min-agreement", type=float, default=0.99)
+
+    args = parser.parse_args()
+    if args.cmd == "parity":
+        ok = parity(args.model, args.backend, args.int8, args.samples, args.images,
+                    args.atol, args.min_agreement)
+        sys.exit(0 if ok else 1)
+
+    source = keras_path(args.model)
+    out_path = model_path(source, args.to, args.int8)
+    if args.to == "onnx":
+        to_onnx(source, out_path, args.int8)
+    else:
+        calibration = sample_inputs(args.model, args.samples, args.images) if args.int8 else None
+        to_tflite(source, out_path, args.int8, calibration)
+    print(f"wrote {out_path}")
+
+    if args.check and not parity(args.model, args.to, args.int8, args.samples, args.images):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# counters.py
+# Incrementally maintained per-website threat counters.
+#
+#   python counters.py check [--website-id N]     compare counters with raw logs
+#   python counters.py rebuild [--website-id N]   recompute counters from raw logs
+import argparse
+import sys
+from collections import Counter
+from datetime import datetime
+from typing import Sequence
+
+from sqlalchemy import cast, delete, func, select, Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+import models
+
+# log model -> counter type (the types the blocked/total counts report)
+COUNTED_MODELS = {
+    models.XSSLog: "xss",
+    models.DomManipulationLog: "dom",
+    models.SQLLog: "sql_injection",
+}
+COUNTER_TYPES = tuple(COUNTED_MODELS.values())
+
+
+def bump(db: Session, increments: Counter):
+    # increments: (website_id, type, day) -> n. Runs inside the caller's
+    # transaction so counters commit (or roll back) with the log rows.
+    if not increments:
+        return
+    # fixed key order keeps concurrent writers from deadlocking on row locks
+    rows = [
+        {"website_id": wid, "type": type_, "day": day, "count": n}
+        for (wid, type_, day), n in sorted(increments.items())
+    ]
+    for i in range(0, len(rows), 1000):
+        stmt = pg_insert(models.ThreatCounter).values(rows[i:i + 1000])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["website_id", "type", "day"],
+            set_={"count": models.ThreatCounter.count + stmt.excluded.count},
+        )
+        db.execute(stmt)
+
+
+def increments_for_rows(model, rows: list[dict]) -> Counter:
+    type_ = COUNTED_MODELS.get(model)
+    out = Counter()
+    if type_ is None:
+        return out
+    for row in rows:
+        if row.get("website_id") is None:
+            continue
+        ts = row.get("created_at") or datetime.now()
+        out[(row["website_id"], type_, ts.date() if isinstance(ts, datetime) else ts)] += 1
+    return out
+
+
+def counts_for_website(db: Session, website_id: int) -> dict[str, int]:
+    rows = db.execute(
+        select(models.ThreatCounter.type, func.sum(models.ThreatCounter.count))
+        .where(models.ThreatCounter.website_id == website_id)
+        .group_by(models.ThreatCounter.type)
+    ).all()
+    found = {t: int(n) for t, n in rows}
+    return {t: found.get(t, 0) for t in COUNTER_TYPES}
+
+
+def counts_by_website(db: Session, website_ids: Sequence[int]) -> dict[int, dict[str, int]]:
+    out = {wid: {t: 0 for t in COUNTER_TYPES} for wid in website_ids}
+    if not website_ids:
+        return out
+    rows = db.execute(
+        select(models.ThreatCounter.website_id, models.ThreatCounter.type, func.sum(models.ThreatCounter.count))
+        .where(models.ThreatCounter.website_id.in_(website_ids))
+        .group_by(models.ThreatCounter.website_id, models.ThreatCounter.type)
+    ).all()
+    for wid, t, n in rows:
+        if t in out[wid]:
+            out[wid][t] = int(n)
+    return out
+
+
+def total_for_user(db: Session, user_id: int) -> int:
+    return int(db.execute(
+        select(func.coalesce(func.sum(models.ThreatCounter.count), 0))
+        .join(models.Website, models.Website.id == models.ThreatCounter.website_id)
+        .where(models.Website.user_id == user_id)
+    ).scalar())
+
+
+def _raw_counts(db: Session, website_id: int | None) -> dict[tuple, int]:
+    out = {}
+    for model, type_ in COUNTED_MODELS.items():
+        day = cast(model.created_at, Date)
+        stmt = (
+            select(model.website_id, day, func.count())
+            .where(model.website_id.isnot(None))
+            .group_by(model.website_id, day)
+        )
+        if website_id is not None:
+            stmt = stmt.where(model.website_id == website_id)
+        for wid, d, n in db.execute(stmt):
+            out[(wid, type_, d)] = n
+    return out
+
+
+def _stored_counts(db: Session, website_id: int | None) -> dict[tuple, int]:
+    stmt = select(models.ThreatCounter)
+    if website_id is not None:
+        stmt = stmt.where(models.ThreatCounter.website_id == website_id)
+    return {(c.website_id, c.type, c.day): c.count for c in db.execute(stmt).scalars()}
+
+
+def check(db: Session, website_id: int | None = None) -> list[tuple]:
+    raw, stored = _raw_counts(db, website_id), _stored_counts(db, website_id)
+    return [
+        (key, raw.get(key, 0), stored.get(key, 0))
+        for key in sorted(raw.keys() | stored.keys())
+        if raw.get(key, 0) != stored.get(key, 0)
+    ]
+
+
+def rebuild(db: Session, website_id: int | None = None) -> int:
+    stmt = delete(models.ThreatCounter)
+    if website_id is not None:
+        stmt = stmt.where(models.ThreatCounter.website_id == website_id)
+    db.execute(stmt)
+    raw = _raw_counts(db, website_id)
+    bump(db, Counter(raw))
+    db.commit()
+    return len(raw)
+
+
+def main():
+    from db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="threat counter consistency tool")
+    parser.add_argument("action", choices=["check", "rebuild"])
+    parser.add_argument("--website-id", type=int)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.action == "rebuild":
+            print(f"rebuilt {rebuild(db, args.website_id)} counter rows")
+            return
+        mismatches = check(db, args.website_id)
+        for (wid, type_, day), raw, stored in mismatches:
+            print(f"website={wid} type={type_} day={day}: logs={raw} counter={stored}")
+        print(f"{len(mismatches)} mismatched counter rows")
+        sys.exit(1 if mismatches else 0)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import config
+import counters
+import models
+import uptime_rollups
+from attack_events import latest_events_per_site_query
+from cache import TTLCache
+
+WEBSITE_FIELDS = (
+    "id", "name", "url", "user_id",
+    "defacement_enabled", "sqli_enabled", "dom_enabled", "xss_enabled",
+)
+
+# user_id -> {(days, per_site): (etag, body)}; dropped whenever one of the
+# user's sites changes, otherwise lives for DASHBOARD_CACHE_TTL_SEC
+dashboard_cache = TTLCache(
+    maxsize=config.DASHBOARD_CACHE_SIZE,
+    ttl=config.DASHBOARD_CACHE_TTL_SEC,
+    name="dashboard",
+)
+
+
+def build_snapshot(db: Session, user_id: int, days: int = 7, per_site: int = 500) -> dict:
+    # Everything the dashboard page shows, in four queries however many
+    # sites the user has: sites, counters, uptime rollups, latest events.
+    sites = db.execute(
+        select(models.Website).where(models.Website.user_id == user_id).order_by(models.Website.id)
+    ).scalars().all()
+    ids = [s.id for s in sites]
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+
+    if ids:
+        counts = counters.counts_by_website(db, ids)
+        uptime, overall = uptime_rollups.window_stats_by_site(db, ids, start)
+        owned = select(models.Website.id).where(models.Website.user_id == user_id).cte("owned")
+        events: dict[int, list] = {wid: [] for wid in ids}
+        for row in db.execute(latest_events_per_site_query(owned, per_site=per_site)).mappings():
+            events[row["website_id"]].append(dict(row))
+    else:
+        counts, uptime, events = {}, {}, {}
+        overall = uptime_rollups.window_stats(db, [], start, percentiles=False)
+
+    websites = []
+    for site in sites:
+        blocked = dict(counts[site.id])
+        blocked["total"] = sum(blocked.values())
+        websites.append({
+            **{f: getattr(site, f) for f in WEBSITE_FIELDS},
+            "blocked": blocked,
+            "uptime": uptime[site.id],
+            "attacks": events[site.id],
+        })
+
+    return {
+        "days": days,
+        "total_blocked": sum(w["blocked"]["total"] for w in websites),
+        "uptime": {"uptime_pct": overall["uptime_pct"], "avg_ms": overall["avg_ms"]},
+        "websites": websites,
+    }
+
+
+def render(snapshot: dict) -> tuple[str, bytes]:
+    body = json.dumps(jsonable_encoder(snapshot), separators=(",", ":")).encode()
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    return etag, body
+
+
+def cached_snapshot(user_id: int, days: int, per_site: int) -> tuple[str, bytes] | None:
+    entries = dashboard_cache.get(user_id)
+    return entries.get((days, per_site)) if entries else None
+
+
+def store_snapshot(user_id: int, days: int, per_site: int, entry: tuple[str, bytes]):
+    entries = dict(dashboard_cache.get(user_id) or {})
+    entries[(days, per_site)] = entry
+    dashboard_cache.set(user_id, entries)
+
+
+def invalidate_dashboard(user_id: int | None):
+    if user_id:
+        dashboard_cache.delete(int(user_id))
@@ -1,30 +1,255 @@
-from threading import Thread
-from models import Website
+import asyncio
+import heapq
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import config
+from models import Website, User, DefacementLog
 from db import SessionLocal
-from defacement_loop import run_defacement_monitor
+from ingest import log_writer
+from inference import MicroBatcher
+from notifications import dispatch_alert
+from site_cache import get_site, invalidate_site
 
-running_monitors = {}
 
-async def toggle_defacement(website_id: int, enable: bool, current_user):
+def _classify(images):
+    # imported lazily so importing this module does not load the CNN
+    from defacement_loop import classify_images
+    return classify_images(images)
+
+def _fetch(url):
+    # raw bytes; decoding happens in the classifier's batch
+    from defacement_loop import fetch_screenshot_bytes
+    return fetch_screenshot_bytes(url, timeout=25)
+
+
+class DefacementScheduler:
+    # Replaces one sleeping thread per site with a heap of due checks.
+    # Screenshots are fetched on a fixed-size pool, classification goes
+    # through a single batching worker, and disabling a site cancels its
+    # pending and in-flight checks. Thread count does not depend on the
+    # number of monitored sites.
+
+    def __init__(self, default_interval: float = 60.0, max_in_flight: int = 16,
+                 fetch_workers: int = 8, jitter: float = 0.1):
+        self.default_interval = default_interval
+        self.max_in_flight = max_in_flight
+        self.jitter = jitter
+        self._fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="defacement-fetch")
+        self.classifier = MicroBatcher(
+            _classify,
+            max_batch_size=config.DEFACEMENT_MAX_BATCH_SIZE,
+            max_wait_ms=config.DEFACEMENT_MAX_WAIT_MS,
+            name="defacement-inference",
+        )
+        self._sites: dict[int, tuple[str, float]] = {}  # id -> (url, interval)
+        self._heap: list[tuple[float, int]] = []
+        self._due: dict[int, float] = {}
+        self._inflight: dict[int, asyncio.Task] = {}
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.checks = 0
+        self.defaced = 0
+        self.errors = 0
+
+    def interval_for(self, plan: str | None) -> float:
+        return float(config.DEFACEMENT_PLAN_INTERVALS.get(plan or "", self.default_interval))
+
+    def _schedule(self, wid: int, due: float):
+        self._due[wid] = due
+        heapq.heappush(self._heap, (due, wid))
+        self._wakeup.set()
+
+    def enable(self, website_id: int, url: str, interval: float | None = None):
+        interval = interval or self.default_interval
+        self._sites[website_id] = (url, interval)
+        if website_id not in self._due:
+            # first check soon, but spread out so a batch of enables doesn't spike
+            self._schedule(website_id, time.monotonic() + random.uniform(0, min(5.0, interval)))
+        self.start()
+
+    def disable(self, website_id: int):
+        self._sites.pop(website_id, None)
+        self._due.pop(website_id, None)
+        task = self._inflight.pop(website_id, None)
+        if task is not None:
+            task.cancel()
+
+    def is_enabled(self, website_id: int) -> bool:
+        return website_id in self._sites
+
+    def _load_enabled(self) -> list[tuple[int, str, float]]:
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(Website.id, Website.url, User.plan)
+                .outerjoin(User, User.id == Website.user_id)
+                .filter(Website.defacement_enabled == True)
+                .all()
+            )
+        finally:
+            db.close()
+        return [(wid, url, self.interval_for(plan)) for wid, url, plan in rows if url]
+
+    async def resume(self):
+        # re-register sites that had monitoring enabled before a restart
+        for wid, url, interval in await asyncio.to_thread(self._load_enabled):
+            self.enable(wid, url, interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self.classifier.start()
+            self._task = asyncio.create_task(self._dispatch())
+
+    async def stop(self):
+        for task in (self._task, *self._inflight.values()):
+            if task is not None:
+                task.cancel()
+        self._task = None
+        self._inflight.clear()
+        await self.classifier.stop()
+        self._fetch_pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _dispatch(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            due, wid = self._heap[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            if self._due.get(wid) != due or wid not in self._sites:
+                continue
+            if wid in self._inflight:
+                # previous check still running; look again next interval
+                url, interval = self._sites[wid]
+                self._schedule(wid, due + interval)
+                continue
+
+            url, interval = self._sites[wid]
+            self._schedule(wid, max(due, time.monotonic() - interval) + interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+            await self._slots.acquire()
+            if wid not in self._sites:
+                self._slots.release()
+                continue
+            task = asyncio.create_task(self._check(wid, url))
+            self._inflight[wid] = task
+            task.add_done_callback(lambda t, wid=wid: self._done(wid, t))
+
+    def _done(self, wid: int, task: asyncio.Task):
+        self._slots.release()
+        if self._inflight.get(wid) is task:
+            del self._inflight[wid]
+
+    async def _check(self, website_id: int, url: str):
+        loop = asyncio.get_running_loop()
+        timestamp = datetime.now()
+        print(f"Checking website: {url}")
+        try:
+            img_bytes = await loop.run_in_executor(self._fetch_pool, _fetch, url)
+        except (RuntimeError, OSError) as e:
+            self.errors += 1
+            print(f"Error during defacement check (fetch/decode): {e}")
+            return
+        except Exception as e:
+            self.errors += 1
+            print(f"Error during defacement check (outer): {e}")
+            return
+
+        try:
+            result = await self.classifier.predict(img_bytes)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error during defacement check (classify): {e}")
+            return
+        if result is None:
+            self.errors += 1
+            print(f"Error during defacement check (fetch/decode): undecodable screenshot for {url}")
+            return
+        if website_id not in self._sites:
+            return  # disabled while we were fetching/classifying
+
+        self.checks += 1
+        log_writer.submit(
+            DefacementLog,
+            website_id=website_id,
+            prediction=result.label,
+            timestamp=timestamp,
+        )
+        print(f"Logged defacement check: {result.label} ({result.confidence:.3f}) at {timestamp}")
+
+        if result.defaced:
+            self.defaced += 1
+            site = await asyncio.to_thread(_site_info, website_id)
+            if site and site.owner_email:
+                dispatch_alert(
+                    to_email=site.owner_email, website_id=website_id,
+                    website_name=site.name, website_url=url,
+                    log_type="defacement", occurred_at=datetime.utcnow(),
+                    prediction="defaced", score=round(result.confidence, 4),
+                )
+            elif site:
+                print(f"Owner email not configured for alerts (website_id={website_id}).")
+
+    def stats(self) -> dict:
+        return {
+            "sites": len(self._sites),
+            "in_flight": len(self._inflight),
+            "max_in_flight": self.max_in_flight,
+            "checks": self.checks,
+            "defaced": self.defaced,
+            "errors": self.errors,
+            "classifier": self.classifier.stats(),
+        }
+
+
+def _site_info(website_id: int):
     db = SessionLocal()
-    website = db.query(Website).filter(Website.id == website_id).first()
-    
-    if not website:
+    try:
+        return get_site(db, website_id)
+    finally:
         db.close()
+
+
+defacement_scheduler = DefacementScheduler(
+    default_interval=config.DEFACEMENT_INTERVAL_SEC,
+    max_in_flight=config.DEFACEMENT_MAX_IN_FLIGHT,
+    fetch_workers=config.DEFACEMENT_FETCH_WORKERS,
+)
+
+async def toggle_defacement(db: AsyncSession, website_id: int, enable: bool, current_user):
+    row = (await db.execute(
+        select(Website, User.plan).outerjoin(User, User.id == Website.user_id).where(Website.id == website_id)
+    )).first()
+
+    if not row:
         return {"error": "Website not found"}
 
+    website, plan = row
     website.defacement_enabled = enable
-    db.commit()
+    await db.commit()
+    invalidate_site(website_id)
 
     if enable:
-        if website_id not in running_monitors:
+        if not defacement_scheduler.is_enabled(website_id):
             print("Starting defacement monitor for website:", website_id)
-            thread = Thread(target=run_defacement_monitor, args=(website_id, website.url, current_user), daemon=True)
-            running_monitors[website_id] = thread
-            thread.start()
+            defacement_scheduler.enable(website_id, website.url, defacement_scheduler.interval_for(plan))
     else:
-        if website_id in running_monitors:
-            del running_monitors[website_id]
+        defacement_scheduler.disable(website_id)
 
-    db.close()
-    return {"status": "success", "enabled": enable}
\ No newline at end of file
+    return {"status": "success", "enabled": enable}
@@ -1,20 +1,27 @@
 
-import os
-import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from typing import NamedTuple, Sequence
 from PIL import Image, UnidentifiedImageError
-from sqlalchemy.orm import Session
-from db import SessionLocal
-from models import DefacementLog, Website
-from datetime import datetime, timedelta
 import numpy as np
-import tensorflow as tf
-from tensorflow import keras
+
+import config
+from model_backends import load_backend
+from model_registry import registry
 
 img_height = 250
 img_width = 250
-model = keras.models.load_model("ml/defacement_model.h5", compile=False)
+MODEL_PATH = "ml/defacement_model.h5"
+
+def _load_defacement():
+    return load_backend(config.DEFACEMENT_BACKEND, MODEL_PATH, config.DEFACEMENT_QUANTIZED, config.INFERENCE_THREADS)
+
+def _warm_defacement(loaded):
+    loaded.predict(np.zeros((1, img_height, img_width, 3), dtype=np.float32))
+
+registry.register("defacement", _load_defacement, _warm_defacement)
+
 class_names = ["clean", "defaced"]
 
 UA = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
@@ -47,78 +54,78 @@ def fetch_screenshot_bytes(website_url: str, *, timeout=20) -> bytes:
         raise RuntimeError(f"Expected image/* but got {ctype!r}; body preview: {preview!r}")
     return resp.content
 
+def fetch_screenshot(website_url: str, *, timeout=25) -> Image.Image:
+    img = Image.open(BytesIO(fetch_screenshot_bytes(website_url, timeout=timeout)))
+    img.load()
+    return img
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    z = logits - logits.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+class DefacementResult(NamedTuple):
+    label: str          # "clean" or "defaced"
+    confidence: float   # softmax probability of `label`
+    scores: dict[str, float]
+
+    @property
+    def defaced(self) -> bool:
+        return self.label == "defaced"
+
+
+_decode_pool = ThreadPoolExecutor(
+    max_workers=config.DEFACEMENT_DECODE_WORKERS,
+    thread_name_prefix="defacement-decode",
+)
+
+def _fill(batch: np.ndarray, i: int, image: Image.Image | bytes) -> bool:
+    try:
+        img = Image.open(BytesIO(image)) if isinstance(image, (bytes, bytearray)) else image
+        img = img.convert("RGB").resize((img_width, img_height))
+        batch[i] = np.asarray(img, dtype=np.float32)
+        return True
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        print(f"Error decoding screenshot {i}: {e}")
+        return False
+
+def preprocess(images: Sequence[Image.Image | bytes]) -> tuple[np.ndarray, list[bool]]:
+    # model input batch, plus which inputs decoded
+    n = len(images)
+    batch = np.zeros((n, img_height, img_width, 3), dtype=np.float32)
+    ok = list(_decode_pool.map(lambda i: _fill(batch, i, images[i]), range(n)))
+    return batch, ok
+
+def classify_images(images: Sequence[Image.Image | bytes]) -> list[DefacementResult | None]:
+    # Decode/resize in parallel straight into one preallocated float32
+    # batch, then a single forward pass. Undecodable inputs map to None.
+    n = len(images)
+    if n == 0:
+        return []
+    batch, ok = preprocess(images)
+    if not any(ok):
+        return [None] * n
+
+    preds = registry.get("defacement").predict(batch)
+    probs = softmax(preds)
+    results = []
+    for good, p in zip(ok, probs):
+        if not good:
+            results.append(None)
+            continue
+        idx = int(np.argmax(p))
+        results.append(DefacementResult(
+            label=class_names[idx],
+            confidence=float(p[idx]),
+            scores={name: float(v) for name, v in zip(class_names, p)},
+        ))
+    return results
+
 def classify_pil(img: Image.Image) -> int:
     # 1 = defaced, 0 = clean
-    img = img.convert("RGB").resize((img_width, img_height))
-    arr = keras.preprocessing.image.img_to_array(img)
-    arr = tf.expand_dims(arr, 0)
-    preds = model.predict(arr, verbose=0)
-    score = tf.nn.softmax(preds[-1])
-    return int(class_names[int(np.argmax(score))] == "defaced")
-
-def run_defacement_monitor(website_id, website_url, current_user):
-    while True:
-        db: Session = SessionLocal()
-        try:
-            site = db.query(Website).filter(Website.id == website_id).first()
-            if not site or not site.defacement_enabled:
-                break
-
-            website_name = site.name
-            owner_email = getattr(site.user, "email", None) if hasattr(site, "user") else None
-            if not owner_email:
-                print(f"Owner email not configured for alerts (website_id={website_id}).")
-                owner_email = None
-
-            print(f"Checking website: {website_url}")
-            timestamp = datetime.now()
-
-            try:
-                img_bytes = fetch_screenshot_bytes(website_url, timeout=25)
-                img = Image.open(BytesIO(img_bytes))
-                img.load() 
-            except (RuntimeError, UnidentifiedImageError) as e:
-                print(f"Error during defacement check (fetch/decode): {e}")
-                time.sleep(60)
-                continue
-
-            result = classify_pil(img)  # 1 = defaced, 0 = clean
-
-        
-            log = DefacementLog(
-                website_id=website_id,
-                prediction="defaced" if result else "clean",
-                timestamp=timestamp
-            )
-            db.add(log)
-
-            cutoff_time = timestamp - timedelta(minutes=60)
-            db.query(DefacementLog).filter(
-                DefacementLog.website_id == website_id,
-                DefacementLog.timestamp < cutoff_time
-            ).delete()
-
-            db.commit()
-            print(f"Logged defacement check: {result} at {timestamp}")
-
-    
-            if result == 1 and owner_email:
-                try:
-                    from notifications import send_email_now, build_threat_email_html
-                    html = build_threat_email_html(
-                        website_name=website_name,
-                        website_url=website_url,
-                        log_type="defacement",
-                        occurred_at=datetime.utcnow(),
-                    )
-                    send_email_now(owner_email, f"[Web Shield AI] DEFACEMENT detected on {website_name}", html)
-                except Exception as e:
-                    print("Email send error:", e)
-
-        except Exception as e:
-            print(f"Error during defacement check (outer): {e}")
-        finally:
-            db.close()
-
-        time.sleep(60)
-
+    result = classify_images([img])[0]
+    if result is None:
+        raise ValueError("could not decode image for defacement classification")
+    return int(result.defaced)
@@ -0,0 +1,143 @@
+# eval_cascade.py
+# Checks that the SQLi pre-filter (sqli_prefilter.py) never screens out an
+# attack, i.e. that the cascade's recall equals the model's.
+#
+#   python eval_cascade.py                      # sqli.txt + built-in corpus, no model needed
+#   python eval_cascade.py --model              # also run the model on every sample
+#   python eval_cascade.py --dataset labeled.tsv   # extra "label<TAB>text" lines (1 = SQLi)
+#
+# The cascade only changes the answer for inputs the pre-filter screens
+# out, so recall is unchanged exactly when no SQLi sample is screened out
+# (and, with --model, when no input the model flags is). Exits 1 otherwise.
+import argparse
+import os
+import sys
+import time
+from urllib.parse import parse_qsl
+
+from bench import sample_queries
+from sqli_prefilter import Prefilter, fingerprint
+
+SQLI_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sqli.txt")
+
+ATTACKS = [
+    "admin' OR '1'='1",
+    "admin'--",
+    "' OR 1=1 --",
+    "1; DROP TABLE users --",
+    "' UNION SELECT username, password FROM users --",
+    "1' AND SLEEP(5) --",
+    "1 OR 1",
+    "1 or 1 = 1",
+    "1 union select null, version()",
+    "1 AND 1=2 UNION ALL SELECT table_name FROM information_schema.tables",
+    "1) or pg_sleep(10)--",
+    "'; EXEC xp_cmdshell('dir') --",
+    "1/**/UNION/**/SELECT/**/1,2",
+    "%27%20OR%20%271%27%3D%271",
+    "admin\" or \"a\"=\"a",
+    "1 and benchmark(5000000,md5(1))",
+    "-1 union select 1,concat(user(),0x3a,database())",
+    "x' AND extractvalue(1,concat(0x7e,version()))--",
+    "1 waitfor delay '0:0:5'",
+    "ORDER BY 10",
+]
+
+BENIGN = [
+    "alice@example.com", "bob.smith+news@mail.co.uk", "12345", "2025-01-01",
+    "hello world", "John Doe", "search term", "42.5", "New York", "ab_cd-ef",
+    "What time is it?", "order 66",
+]
+
+
+def load_sqli_txt(path: str = SQLI_FILE) -> list[tuple[int, str]]:
+    # "SQLI: a=..&b=.." lines are attacks: the whole string and each field
+    # value, as the agent may send either. Other tagged lines (XSS, DOM) are
+    # not SQLi and are kept as negatives.
+    samples = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            tag, sep, text = line.strip().partition(":")
+            if not sep or not text.strip() or tag.strip().upper() not in ("SQLI", "XSS"):
+                continue
+            label = int(tag.strip().upper() == "SQLI")
+            text = text.strip()
+            samples.append((label, text))
+            for _, value in parse_qsl(text.lstrip("?"), keep_blank_values=False):
+                samples.append((label if label == 0 else _field_label(value), value))
+    return samples
+
+
+def _field_label(value: str) -> int:
+    # in "username=admin' OR '1'='1&password=123" only the username is the attack
+    return int(any(c in value for c in "'\";=") or "--" in value)
+
+
+def load_dataset(path: str) -> list[tuple[int, str]]:
+    samples = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            label, sep, text = line.rstrip("\n").partition("\t")
+            if sep and label.strip() in ("0", "1"):
+                samples.append((int(label), text))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLi cascade recall check")
+    parser.add_argument("--dataset", action="append", default=[], help="label<TAB>text file (repeatable)")
+    parser.add_argument("--model", action="store_true", help="also compare against the model's own predictions")
+    parser.add_argument("--benign", type=int, default=5000, help="generated benign inputs for the screen rate")
+    args = parser.parse_args()
+
+    samples = load_sqli_txt() + [(1, a) for a in ATTACKS] + [(0, b) for b in BENIGN]
+    for path in args.dataset:
+        samples += load_dataset(path)
+    # generated traffic; its few attack strings are already in ATTACKS
+    samples += [(0, q) for q in sample_queries(args.benign, seed=1) if q not in ATTACKS]
+
+    pf = Prefilter(enabled=True)
+    t0 = time.perf_counter()
+    reasons = [pf.reason(text) for _, text in samples]
+    per_check_us = (time.perf_counter() - t0) / len(samples) * 1e6
+
+    attacks = [(text, r) for (label, text), r in zip(samples, reasons) if label == 1]
+    negatives = [r for (label, _), r in zip(samples, reasons) if label == 0]
+    missed = [text for text, r in attacks if r is None]
+    screened = sum(r is None for r in negatives)
+
+    print(f"samples: {len(samples)} ({len(attacks)} SQLi, {len(negatives)} other)  "
+          f"pre-filter {per_check_us:.2f} us/check")
+    print(f"stage 1 screened out {screened}/{len(negatives)} non-SQLi inputs "
+          f"({screened / max(1, len(negatives)):.1%} skip the model)")
+    by_reason: dict[str, int] = {}
+    for r in reasons:
+        by_reason[r or "screened"] = by_reason.get(r or "screened", 0) + 1
+    print("  decisions: " + ", ".join(f"{k}={v}" for k, v in sorted(by_reason.items())))
+    print(f"SQLi samples screened out: {len(missed)}")
+    for text in missed:
+        print(f"  MISSED {text!r}  fingerprint={fingerprint(text)!r}")
+    ok = not missed
+
+    if args.model:
+        import ml_model
+        texts = [text for _, text in samples]
+        results = ml_model.predict_batch(texts)
+        flagged = [label == "malicious" for label, _ in results]
+        cascade = [f and r is not None for f, r in zip(flagged, reasons)]
+        n_attacks = max(1, len(attacks))
+        model_recall = sum(f for (label, _), f in zip(samples, flagged) if label == 1) / n_attacks
+        cascade_recall = sum(c for (label, _), c in zip(samples, cascade) if label == 1) / n_attacks
+        lost = [t for t, f, r in zip(texts, flagged, reasons) if f and r is None]
+        print(f"model recall {model_recall:.2%}  cascade recall {cascade_recall:.2%}  "
+              f"model detections dropped by stage 1: {len(lost)}")
+        for text in lost:
+            print(f"  DROPPED {text!r}")
+        ok = ok and not lost and cascade_recall == model_recall
+
+    print("OK: recall unchanged" if ok else "FAIL: the pre-filter would hide attacks")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
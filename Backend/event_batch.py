@@ -0,0 +1,45 @@
+import zlib
+
+from fastapi import Request
+
+import config
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class BatchTooLarge(ValueError):
+    pass
+
+
+async def read_body(request: Request, limit: int = config.EVENT_BATCH_MAX_BYTES) -> bytes:
+    # stop reading as soon as the limit is passed instead of buffering it all
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > limit:
+        raise BatchTooLarge()
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise BatchTooLarge()
+    return bytes(body)
+
+
+def decode_body(body: bytes, content_encoding: str | None = None,
+                limit: int = config.EVENT_BATCH_MAX_DECODED_BYTES) -> bytes:
+    # The agents gzip batches with CompressionStream and post them with
+    # sendBeacon as text/plain (no preflight), which cannot carry a
+    # Content-Encoding header, so the gzip magic bytes count as well.
+    encoding = (content_encoding or "").strip().lower()
+    if encoding == "gzip" or body[:2] == GZIP_MAGIC:
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif encoding == "deflate":
+        inflater = zlib.decompressobj()
+    else:
+        return body
+    try:
+        out = inflater.decompress(body, limit + 1)
+    except zlib.error as e:
+        raise ValueError(f"bad compressed body: {e}")
+    if len(out) > limit or inflater.unconsumed_tail:
+        raise BatchTooLarge()
+    return out
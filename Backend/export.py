@@ -0,0 +1,206 @@
+# export.py
+# Bulk export of attack events for one or more websites.
+#
+#   python export.py --website 3 --start 2025-01-01 --format csv -o site3.csv
+#   python export.py --user 1 --format parquet -o all.parquet
+#
+# Each event type is read through a server-side cursor (yield_per) and
+# encoded one batch at a time, so memory stays flat however long the range
+# is. The same generator backs GET /me/attack-logs/export, where every batch
+# goes out as one chunk of a chunked response.
+# Rows come grouped by type, oldest first within a type.
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+from typing import Iterable, Iterator, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import config
+import models
+from attack_events import EVENT_TYPES, type_events_query
+from db import SessionLocal
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional, only needed for format=parquet
+    pa = pq = None
+
+COLUMNS = ("id", "type", "website_id", "occurred_at", "ip_address", "query", "prediction", "score")
+
+# format -> (media type, file extension)
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+def iter_batches(
+    db: Session,
+    website_ids: Sequence[int],
+    types: Iterable[str] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    batch_size: int = config.EXPORT_BATCH_ROWS,
+) -> Iterator[list]:
+    if not website_ids:
+        return
+    for type_ in [t for t in EVENT_TYPES if types is None or t in set(types)]:
+        stmt = type_events_query(type_, website_ids, start, end).execution_options(yield_per=batch_size)
+        yield from db.execute(stmt).mappings().partitions()
+
+
+def _plain(row) -> dict:
+    out = dict(row)
+    if out["occurred_at"] is not None:
+        out["occurred_at"] = out["occurred_at"].isoformat()
+    return out
+
+
+def _ndjson(batches) -> Iterator[bytes]:
+    for rows in batches:
+        yield "".join(json.dumps(_plain(r), separators=(",", ":")) + "\n" for r in rows).encode()
+
+
+def _csv_cell(value):
+    # logged queries are attacker-controlled: keep spreadsheets from
+    # evaluating them as formulas when the file is opened
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@", "\t", "\r"):
+        return "'" + value
+    return value
+
+
+def _csv(batches) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    for rows in batches:
+        for r in rows:
+            row = _plain(r)
+            writer.writerow([_csv_cell(row[c]) for c in COLUMNS])
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()  # header only: no rows
+
+
+class _Drain:
+    # Write-only file for ParquetWriter that hands back what has been
+    # written so far. tell() keeps counting, since the footer records
+    # absolute offsets of every row group.
+    closed = False
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._pos = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+def _parquet_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("type", pa.string()),
+        ("website_id", pa.int64()),
+        ("occurred_at", pa.timestamp("us")),
+        ("ip_address", pa.string()),
+        ("query", pa.string()),
+        ("prediction", pa.string()),
+        ("score", pa.float64()),
+    ])
+
+
+def _parquet(batches) -> Iterator[bytes]:
+    # one row group per batch
+    if pq is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    schema = _parquet_schema()
+    sink = _Drain()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for rows in batches:
+            writer.write_table(pa.Table.from_pylist([dict(r) for r in rows], schema=schema))
+            yield sink.take()
+    yield sink.take()  # footer
+
+
+ENCODERS = {"ndjson": _ndjson, "csv": _csv, "parquet": _parquet}
+
+
+def stream_export(
+    website_ids: Sequence[int],
+    fmt: str = "ndjson",
+    types: Iterable[str] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> Iterator[bytes]:
+    # Own session for the life of the stream (the cursor keeps a transaction
+    # open); closed when the generator finishes or the client goes away.
+    db = SessionLocal()
+    try:
+        yield from ENCODERS[fmt](iter_batches(db, website_ids, types, start, end))
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export WebShieldAI attack events")
+    who = parser.add_mutually_exclusive_group(required=True)
+    who.add_argument("--website", type=int, action="append", help="website id (repeatable)")
+    who.add_argument("--user", type=int, help="every website of this user")
+    parser.add_argument("--type", action="append", choices=EVENT_TYPES, help="event type (repeatable, default all)")
+    parser.add_argument("--start", type=datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.fromisoformat)
+    parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+    parser.add_argument("-o", "--output", help="file to write (default stdout)")
+    args = parser.parse_args()
+
+    ids = args.website
+    if args.user is not None:
+        with SessionLocal() as db:
+            ids = db.execute(
+                select(models.Website.id).where(models.Website.user_id == args.user)
+            ).scalars().all()
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    written = 0
+    try:
+        for chunk in stream_export(ids, args.format, args.type, args.start, args.end):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            out.close()
+    print(f"exported {len(ids)} website(s), {written:,} bytes", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
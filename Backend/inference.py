@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Sequence
+
+import config
+from cache import TTLCache
+from sqli_prefilter import PREFILTER_RESULT, prefilter
+
+
+class MicroBatcher:
+    # Collects concurrent predict() calls into one batch and runs the
+    # (blocking) batch function on a dedicated worker thread, so the event
+    # loop never waits on the model.
+
+    def __init__(
+        self,
+        batch_fn: Callable[[Sequence[Any]], Sequence[Any]],
+        *,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        name: str = "inference",
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        # taken off the queue but not answered yet (being collected or run)
+        self._batch: list = []
+        self.batches = 0
+        self.items = 0
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.name)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        pending = self._batch
+        self._batch = []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, fut in pending:
+            if not fut.done():
+                fut.set_exception(RuntimeError(f"{self.name} batcher stopped"))
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def predict(self, item):
+        if self._task is None or self._task.done():
+            self.start()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, fut))
+        return await fut
+
+    async def predict_many(self, items: Sequence[Any]) -> list:
+        return list(await asyncio.gather(*(self.predict(i) for i in items)))
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = self._batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # take whatever is already waiting before sleeping on the deadline
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            live = [(item, fut) for item, fut in batch if not fut.done()]
+            if not live:
+                self._batch = []
+                continue
+
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self.batch_fn, [item for item, _ in live]
+                )
+            except Exception as e:
+                for _, fut in live:
+                    if not fut.done():
+                        fut.set_exception(e)
+                self._batch = []
+                continue
+
+            self.batches += 1
+            self.items += len(live)
+            for (_, fut), result in zip(live, results):
+                if not fut.done():
+                    fut.set_result(result)
+            self._batch = []
+
+
+sqli_cache = TTLCache(
+    maxsize=config.SQLI_CACHE_SIZE,
+    ttl=config.SQLI_CACHE_TTL_SEC,
+    name="sqli-predictions",
+)
+
+
+def _predict_sqli_batch(queries):
+    # imported lazily so importing this module does not pull in TensorFlow
+    import ml_model
+    if ml_model.maybe_reload():
+        sqli_cache.clear()
+    results = ml_model.predict_batch(queries)
+    # filled on the worker thread so a reload can never be followed by a
+    # stale result from the previous model landing in the cache
+    for query, result in zip(queries, results):
+        sqli_cache.set(query_cache_key(query), result)
+    return results
+
+
+sqli_batcher = MicroBatcher(
+    _predict_sqli_batch,
+    max_batch_size=config.SQLI_MAX_BATCH_SIZE,
+    max_wait_ms=config.SQLI_MAX_WAIT_MS,
+    name="sqli-inference",
+)
+
+
+def normalize_query(query: str | None) -> str:
+    return " ".join((query or "").lower().split())
+
+
+def query_cache_key(query: str | None) -> str:
+    return hashlib.blake2b(normalize_query(query).encode("utf-8"), digest_size=16).hexdigest()
+
+
+async def predict_sqli(query: str | None) -> tuple[str, float]:
+    # cascade: lexical pre-filter, then prediction cache, then the model
+    if prefilter.is_benign(query):
+        return PREFILTER_RESULT
+    cached = sqli_cache.get(query_cache_key(query))
+    if cached is not None:
+        return cached
+    return await sqli_batcher.predict(query)
+
+
+async def predict_sqli_many(queries: Sequence[str | None]) -> list[tuple[str, float]]:
+    # Distinct queries are enqueued together, so the misses of one request
+    # (e.g. every field of a form) share a single forward pass.
+    unique = list(dict.fromkeys(queries))
+    results = dict(zip(unique, await asyncio.gather(*(predict_sqli(q) for q in unique))))
+    return [results[q] for q in queries]
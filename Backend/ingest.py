@@ -0,0 +1,193 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+import config
+import counters
+import live_feed
+import uptime_rollups
+from db import SessionLocal
+
+_STOP = object()
+
+
+class LogWriter:
+    # Buffers attack-log rows in a bounded in-process queue and writes them
+    # in bulk (one multi-row INSERT per table) from a single background task.
+    # Endpoints only pay for a put_nowait().
+
+    def __init__(self, max_queue: int = 50000, batch_size: int = 500, flush_interval_ms: float = 200.0):
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self.accepted = 0
+        self.dropped = 0
+        self.high_water = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        # the last rows that could not be written, for inspection
+        self.dead_letters: deque = deque(maxlen=100)
+        self.last_flush_ms = 0.0
+        self.last_flush_rows = 0
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._closing = False
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        # stop accepting, then let the writer drain everything already queued
+        self._closing = True
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    def submit(self, model, **row) -> bool:
+        if self._closing:
+            self.dropped += 1
+            return False
+        if self._task is None or self._task.done():
+            self.start()
+        ts_col = _timestamp_column(model)
+        if ts_col is not None and ts_col not in row:
+            row[ts_col] = datetime.now()
+        try:
+            self._queue.put_nowait((model, row))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.accepted += 1
+        depth = self._queue.qsize()
+        if depth > self.high_water:
+            self.high_water = depth
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "high_water": self.high_water,
+            "accepted": self.accepted,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "last_failure": self.dead_letters[-1][2] if self.dead_letters else None,
+            "last_flush_rows": self.last_flush_rows,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+        }
+
+    async def _collect(self) -> tuple[list, bool]:
+        loop = asyncio.get_running_loop()
+        first = await self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if self._queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._queue.get_nowait()
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        while True:
+            batch, stopping = await self._collect()
+            if stopping:
+                # anything submitted before _closing was set is still queued
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not _STOP:
+                        batch.append(item)
+            if batch:
+                await asyncio.to_thread(self._flush, batch)
+            if stopping:
+                return
+
+    def _flush(self, batch: list):
+        t0 = time.perf_counter()
+        by_model = defaultdict(list)
+        for model, row in batch:
+            by_model[model].append(row)
+
+        db = SessionLocal()
+        try:
+            for model, rows in by_model.items():
+                # one transaction per table; a batch with bad rows is split until only they fail
+                self._write(db, model, rows)
+        finally:
+            db.close()
+
+        self.flushes += 1
+        self.last_flush_rows = len(batch)
+        self.last_flush_ms = (time.perf_counter() - t0) * 1000
+
+    def _write(self, db, model, rows: list[dict]):
+        try:
+            if live_feed.is_event_model(model):
+                ids = db.execute(
+                    insert(model).returning(model.id, sort_by_parameter_order=True), rows
+                ).scalars().all()
+                # delivered to dashboards only if this transaction commits
+                live_feed.notify(db, model, rows, ids)
+            else:
+                db.execute(insert(model), rows)
+            counters.bump(db, counters.increments_for_rows(model, rows))
+            if model.__tablename__ == "uptime_checks":
+                uptime_rollups.bump(db, rows)
+            db.commit()
+            self.flushed_rows += len(rows)
+        except (IntegrityError, DataError) as e:
+            db.rollback()
+            if len(rows) > 1:
+                # bisect down to the offending rows (e.g. a site deleted while
+                # another worker's site cache still accepted its events)
+                mid = len(rows) // 2
+                self._write(db, model, rows[:mid])
+                self._write(db, model, rows[mid:])
+                return
+            self.failed_rows += 1
+            self.dead_letters.append((model.__tablename__, rows[0], str(e)))
+            print(f"Log writer dropped a {model.__tablename__} row:", e)
+        except Exception as e:
+            # not the rows' fault (connection lost, ...): retrying halves would not help
+            db.rollback()
+            self.failed_rows += len(rows)
+            print(f"Log writer failed to insert {len(rows)} {model.__tablename__} rows:", e)
+
+
+def _timestamp_column(model) -> str | None:
+    # stamp rows when they are reported, not when the batch is flushed
+    for name in ("created_at", "timestamp"):
+        if name in model.__table__.c:
+            return name
+    return None
+
+
+log_writer = LogWriter(
+    max_queue=config.LOG_QUEUE_SIZE,
+    batch_size=config.LOG_BATCH_SIZE,
+    flush_interval_ms=config.LOG_FLUSH_INTERVAL_MS,
+)
@@ -0,0 +1,169 @@
+import asyncio
+import json
+from collections import defaultdict
+from typing import Iterable
+
+from sqlalchemy import func, select
+
+import config
+from attack_events import EVENT_ROW_FILTERS, EVENT_SOURCES
+
+# Attack events reach dashboards in three hops:
+#   1. the log writer commits a batch and, in the same transaction,
+#      pg_notify()s it on CHANNEL (so nothing is announced that was rolled back)
+#   2. every API worker LISTENs on CHANNEL and hands payloads to its hub
+#   3. the hub copies each event into the bounded queue of every subscriber
+#      watching that website; the SSE endpoint drains the queue
+CHANNEL = "webshield_events"
+MAX_PAYLOAD = 7900  # NOTIFY payloads are capped at 8000 bytes
+MAX_QUERY_CHARS = 512
+
+_MODEL_TYPES = {model: type_ for type_, (model, *_rest) in EVENT_SOURCES.items()}
+
+
+def _event(type_: str, row: dict, id_) -> dict:
+    _, ts_name, ip_name, query_name, pred_name, score_name = EVENT_SOURCES[type_]
+    ts = row.get(ts_name)
+    query = row.get(query_name) if query_name else None
+    return {
+        "id": id_,
+        "type": type_,
+        "website_id": row.get("website_id"),
+        "occurred_at": ts.isoformat() if ts is not None else None,
+        "ip_address": row.get(ip_name) if ip_name else None,
+        "query": query[:MAX_QUERY_CHARS] if isinstance(query, str) else None,
+        "prediction": row.get(pred_name) if pred_name else None,
+        "score": row.get(score_name) if score_name else None,
+    }
+
+
+def _chunks(events: list[dict]) -> Iterable[str]:
+    chunk, size = [], 2
+    for ev in events:
+        encoded = json.dumps(ev, separators=(",", ":"))
+        if chunk and size + len(encoded) + 1 > MAX_PAYLOAD:
+            yield "[" + ",".join(chunk) + "]"
+            chunk, size = [], 2
+        chunk.append(encoded)
+        size += len(encoded) + 1
+    if chunk:
+        yield "[" + ",".join(chunk) + "]"
+
+
+def is_event_model(model) -> bool:
+    return model in _MODEL_TYPES
+
+
+def notify(db, model, rows: list[dict], ids: list):
+    # Called by the log writer inside its insert transaction.
+    type_ = _MODEL_TYPES[model]
+    keep = EVENT_ROW_FILTERS.get(type_)
+    events = [_event(type_, row, id_) for row, id_ in zip(rows, ids) if keep is None or keep(row)]
+    for payload in _chunks(events):
+        db.execute(select(func.pg_notify(CHANNEL, payload)))
+
+
+class Subscriber:
+    def __init__(self, website_ids: Iterable[int], queue_size: int):
+        self.website_ids = frozenset(website_ids)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow client: rather than buffering without bound (or blocking
+            # everyone else), throw its backlog away and tell it to reload.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.dropped += 1
+            self.queue.put_nowait({"type": "resync"})
+
+
+class EventHub:
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._by_site: dict[int, set[Subscriber]] = defaultdict(set)
+        self._subscribers: set[Subscriber] = set()
+        self._listener: asyncio.Task | None = None
+        self.received = 0
+        self.delivered = 0
+        self.listen_errors = 0
+
+    def subscribe(self, website_ids: Iterable[int]) -> Subscriber:
+        sub = Subscriber(website_ids, self.queue_size)
+        self._subscribers.add(sub)
+        for wid in sub.website_ids:
+            self._by_site[wid].add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        self._subscribers.discard(sub)
+        for wid in sub.website_ids:
+            subs = self._by_site.get(wid)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._by_site[wid]
+
+    def publish(self, event: dict):
+        self.received += 1
+        for sub in self._by_site.get(event.get("website_id"), ()):
+            sub.offer(event)
+            self.delivered += 1
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            events = json.loads(payload)
+        except ValueError:
+            return
+        for event in events:
+            self.publish(event)
+
+    def start(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _listen(self):
+        # own connection, outside the request pool: it is held for the
+        # life of the process and only ever receives notifications
+        import asyncpg
+        from db import ASYNC_DATABASE_URL
+
+        dsn = ASYNC_DATABASE_URL.set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(dsn)
+                await conn.add_listener(CHANNEL, self._on_notify)
+                while not conn.is_closed():
+                    await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.listen_errors += 1
+                print("Live feed listener error:", e)
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(2)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "watched_sites": len(self._by_site),
+            "received": self.received,
+            "delivered": self.delivered,
+            "dropped": sum(s.dropped for s in self._subscribers),
+            "listen_errors": self.listen_errors,
+        }
+
+
+hub = EventHub(queue_size=config.LIVE_FEED_QUEUE_SIZE)
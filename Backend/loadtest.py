@@ -0,0 +1,135 @@
+# loadtest.py
+# Concurrent HTTP load against a running API, reporting latency percentiles.
+#
+#   python loadtest.py --base http://127.0.0.1:8000 --wid 1 --concurrency 1000 --requests 20000
+#   python loadtest.py --scenario dashboard --email a@b.c --password ... --wid 1
+#
+# Run it against the same build before and after a change (same DB, same
+# worker count) and compare the tables. "mixed" interleaves agent script
+# fetches, XSS/DOM beacons and a slow dashboard query, which is where a
+# blocked event loop shows up as beacon tail latency.
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+
+def _scenarios(wid: int) -> dict:
+    agent = [
+        ("GET", f"/cdn/webshield-xss-agent.js?wid={wid}", None),
+        ("GET", f"/cdn/dom-defacement-agent.js?wid={wid}", None),
+    ]
+    beacons = [
+        ("POST", "/api/xss-report", {"website_id": wid, "payload": "<script>alert(1)</script>"}),
+        ("POST", "/api/dom-report", {"website_id": wid, "kind": "inject"}),
+    ]
+    # one page view's worth of agent traffic in a single request
+    batch = [
+        ("POST", "/api/events/batch", {"website_id": wid, "events": [
+            {"type": "sqli", "query": "alice@example.com"},
+            {"type": "sqli", "query": "admin' OR '1'='1"},
+            {"type": "sqli", "query": "hello world"},
+            {"type": "xss", "vector": "url", "payload": "<script>alert(1)</script>"},
+            {"type": "dom", "kind": "added-suspicious", "tag": "SCRIPT"},
+        ]}),
+    ]
+    dashboard = [
+        ("GET", f"/websites/{wid}/attack-logs?limit=500", None),
+        ("GET", f"/websites/{wid}/blocked-count", None),
+        ("GET", "/me/attack-logs/total-count", None),
+        ("GET", f"/websites/{wid}/uptime?days=90", None),
+    ]
+    return {
+        "agent": agent,
+        "ingest": beacons,
+        "batch": batch,
+        "dashboard": dashboard,
+        "mixed": agent * 2 + beacons * 3 + dashboard,
+    }
+
+
+def _pct(values: list[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(args):
+    requests_ = _scenarios(args.wid)[args.scenario]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    latencies: dict[str, list[float]] = defaultdict(list)
+    statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    errors: dict[str, int] = defaultdict(int)
+    rnd = random.Random(0)
+
+    async with httpx.AsyncClient(base_url=args.base, limits=limits, timeout=args.timeout) as client:
+        if args.email:
+            r = await client.post("/login", json={"email": args.email, "password": args.password})
+            r.raise_for_status()
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for _ in range(args.requests):
+            queue.put_nowait(rnd.choice(requests_))
+
+        async def worker():
+            while True:
+                try:
+                    method, path, body = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                name = path.split("?")[0]
+                t0 = time.perf_counter()
+                try:
+                    r = await client.request(method, path, json=body)
+                    statuses[name][r.status_code] += 1
+                except httpx.HTTPError:
+                    errors[name] += 1
+                    continue
+                latencies[name].append((time.perf_counter() - t0) * 1000)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"{args.scenario}: {total} ok / {sum(errors.values())} errors in {elapsed:.1f}s "
+          f"({total / elapsed:,.0f} req/s) at concurrency {args.concurrency}")
+    print(f"  {'endpoint':42s} {'n':>6s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'max':>8s}  status")
+    summary = {}
+    for name, values in sorted(latencies.items()):
+        row = {
+            "n": len(values), "p50": _pct(values, 0.50), "p95": _pct(values, 0.95),
+            "p99": _pct(values, 0.99), "max": max(values), "mean": statistics.fmean(values),
+            "status": dict(statuses[name]), "errors": errors[name],
+        }
+        summary[name] = row
+        print(f"  {name:42s} {row['n']:6d} {row['p50']:8.1f} {row['p95']:8.1f} {row['p99']:8.1f} "
+              f"{row['max']:8.1f}  {dict(statuses[name])}" + (f" errors={errors[name]}" if errors[name] else ""))
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({"scenario": args.scenario, "concurrency": args.concurrency,
+                       "elapsed_sec": elapsed, "endpoints": summary}, fh, indent=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebShieldAI API load test")
+    parser.add_argument("--base", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenario", choices=["agent", "ingest", "batch", "dashboard", "mixed"], default="mixed")
+    parser.add_argument("--wid", type=int, required=True, help="website id the agent/beacon requests target")
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--email", help="log in first (needed for dashboard endpoints)")
+    parser.add_argument("--password")
+    parser.add_argument("--json", help="also write the summary to this file")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,48 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Query, BackgroundTasks
-from db import create_table, get_db
+from fastapi import FastAPI, Depends, HTTPException, status, Query
+from db import create_table, get_db, get_async_db
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 import models, schemas, services
-from sqlalchemy import Integer, String, func, case
-from defacement_control import toggle_defacement
+import counters
+from sqlalchemy import func, case, select
+from defacement_control import toggle_defacement, defacement_scheduler
 from fastapi import Request
 from models import SQLLog
-from ml_model import predict_query
-from fastapi.responses import Response
+from inference import sqli_batcher, sqli_cache, predict_sqli, predict_sqli_many
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-from auth import get_current_user
+from auth import get_current_user, invalidate_user, user_cache_stats
+from passwords import HasherBusy, password_hasher
 import requests
 from typing import List, Union, Optional, Dict
 from uptime import monitor_loop
+import uptime
+import uptime_rollups
+import partitions
+import config
 import asyncio
 from datetime import datetime, timedelta, timezone
-from notifications import send_email_now, build_threat_email_html
+from notifications import alert_dispatcher, dispatch_alert
+from ingest import log_writer
+from site_cache import get_site_async, invalidate_site, site_cache
+from agent_bundles import get_bundle_async, static_bundle, bundle_response, if_none_match
+from attack_events import attack_events_query, next_cursor, EVENT_TYPES
+import dashboard
+import live_feed
+import export
+import event_batch
+from model_registry import registry as model_registry
+from sqli_prefilter import prefilter
+import json
 import models, schemas
 from urllib.parse import urlparse
 from pydantic import BaseModel
 
 app = FastAPI(title="WebShieldAI API")
 
-create_table()
+if config.AUTO_MIGRATE:
+    create_table()
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,7 +51,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.add_middleware(SessionMiddleware, secret_key="9f2b3a6e5c7c4965b5c3d11ecac7d6f1bd8446e23c4db487915b6a04e7db47bc")
+app.add_middleware(SessionMiddleware, secret_key=config.SESSION_SECRET, max_age=config.SESSION_MAX_AGE_SEC)
 
 # 9f2b3a6e5c7c4965b5c3d11ecac7d6f1bd8446e23c4db487915b6a04e7db47bc
 
@@ -55,13 +74,24 @@ def get_site_primitives(db: Session, website_id: int, user_id: int):
     return site.name, site.url, site.user.email
 
 
+def hasher_busy() -> HTTPException:
+    # bcrypt pool is saturated; shed instead of queueing behind it
+    return HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many login attempts, retry shortly",
+                         headers={"Retry-After": "1"})
+
 @app.post("/users/", response_model=schemas.GetUser)
-async def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    return services.create_user(user, db)
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    try:
+        return await services.create_user(user, db)
+    except HasherBusy:
+        raise hasher_busy()
   
 @app.post("/login")
-async def login(user: schemas.UserLogin, request: Request, db: Session = Depends(get_db)):
-    db_user = services.authenticate_user(user.email, user.password, db)
+async def login(user: schemas.UserLogin, request: Request, db: AsyncSession = Depends(get_async_db)):
+    try:
+        db_user = await services.authenticate_user(user.email, user.password, db)
+    except HasherBusy:
+        raise hasher_busy()
     if not db_user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
@@ -71,12 +101,7 @@ async def login(user: schemas.UserLogin, request: Request, db: Session = Depends
 
 
 @app.get("/me")
-async def get_me(request: Request, db: Session = Depends(get_db)):
-    user_id = request.session.get("user_id")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-
-    user = db.query(models.User).get(user_id)
+async def get_me(user = Depends(get_current_user)):
     return {
         "id": user.id,
         "email": user.email,
@@ -87,6 +112,7 @@ async def get_me(request: Request, db: Session = Depends(get_db)):
 
 @app.post("/logout")
 async def logout(request: Request):
+    invalidate_user(request.session.get("user_id"))
     request.session.clear()
     return {"message": "Logged out successfully"}
 
@@ -96,23 +122,27 @@ async def logout(request: Request):
 #     return services.create_website(website, db)
   
 @app.post("/websites/", response_model=schemas.GetWebsite)
-async def add_website(website: schemas.WebsiteCreate, db: Session = Depends(get_db)):
-    return services.create_website(website, db)
+def add_website(website: schemas.WebsiteCreate, db: Session = Depends(get_db)):
+    new_website = services.create_website(website, db)
+    # drop any cached "not found" for the freshly assigned id
+    invalidate_site(new_website.id)
+    dashboard.invalidate_dashboard(new_website.user_id)
+    return new_website
 
 @app.get("/websites/", response_model=list[schemas.GetWebsite])
-def list_user_websites(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(models.Website).filter(models.Website.user_id == current_user.id).all()
+async def list_user_websites(current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    return (await db.scalars(select(models.Website).where(models.Website.user_id == current_user.id))).all()
 
 @app.get("/websites/me")
-def list_user_websites(
+async def list_user_websites(
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    return db.query(models.Website).filter(models.Website.user_id == current_user.id).all()
+    return (await db.scalars(select(models.Website).where(models.Website.user_id == current_user.id))).all()
 
 @app.get("/websites/{website_id}", response_model=schemas.GetWebsite)
-def get_website(website_id: int, db: Session = Depends(get_db)):
-    website = db.query(models.Website).filter(models.Website.id == website_id).first()
+async def get_website(website_id: int, db: AsyncSession = Depends(get_async_db)):
+    website = await db.get(models.Website, website_id)
     if not website:
         raise HTTPException(status_code=404, detail="Website not found")
     return website
@@ -126,75 +156,49 @@ def delete_website(website_id: int, db: Session = Depends(get_db), current_user:
 
     db.delete(website)
     db.commit()
+    invalidate_site(website_id)
+    dashboard.invalidate_dashboard(current_user.id)
     return {"detail": "Website deleted successfully"}
 
 def since_window(days: int):
     return datetime.now(timezone.utc) - timedelta(days=days)
 
+async def owned_site_id(db: AsyncSession, website_id: int, user_id: int) -> int | None:
+    return await db.scalar(
+        select(models.Website.id).where(models.Website.id == website_id, models.Website.user_id == user_id)
+    )
+
 @app.get("/websites/{website_id}/uptime")
-def site_uptime_metrics(website_id: int, days: int = Query(7, ge=1, le=90),
-                        db: Session = Depends(get_db),
-                        user = Depends(get_current_user)):
+async def site_uptime_metrics(website_id: int, days: int = Query(7, ge=1, le=90),
+                              db: AsyncSession = Depends(get_async_db),
+                              user = Depends(get_current_user)):
     # ensure ownership
-    site = db.query(models.Website).filter(models.Website.id==website_id,
-                                    models.Website.user_id==user.id).first()
-    if not site:
+    if not await owned_site_id(db, website_id, user.id):
         return {"uptime_pct": 0, "checks": 0}
 
-    start = since_window(days)
-    q = (db.query(
-            func.count().label("checks"),
-            func.sum(case((models.UptimeCheck.status_up==True, 1), else_=0)).label("up_checks"),
-            func.avg(models.UptimeCheck.response_ms).label("avg_ms"))
-         .filter(models.UptimeCheck.website_id==website_id,
-                 models.UptimeCheck.checked_at >= start))
-    row = q.one()
-    checks = row.checks or 0
-    up = row.up_checks or 0
-    avg_ms = int(row.avg_ms) if row.avg_ms is not None else None
-
-    # p50/p95 (simple approach)
-    latencies = (db.query(models.UptimeCheck.response_ms)
-                   .filter(models.UptimeCheck.website_id==website_id,
-                           models.UptimeCheck.checked_at >= start,
-                           models.UptimeCheck.response_ms.isnot(None))
-                   .order_by(models.UptimeCheck.response_ms)
-                   .all())
-    l = [r[0] for r in latencies]
-    p50 = l[len(l)//2] if l else None
-    p95 = l[int(len(l)*0.95)] if l else None
-
-    uptime_pct = round((up/checks)*100, 2) if checks else 0.0
-    return {"uptime_pct": uptime_pct, "checks": checks, "avg_ms": avg_ms, "p50_ms": p50, "p95_ms": p95}
+    stats = await db.run_sync(uptime_rollups.window_stats, [website_id], since_window(days))
+    return {k: stats[k] for k in ("uptime_pct", "checks", "avg_ms", "p50_ms", "p95_ms", "p99_ms")}
 
 @app.get("/summary/uptime")
-def global_uptime_summary(days: int = Query(7, ge=1, le=90),
-                          db: Session = Depends(get_db),
-                          user = Depends(get_current_user)):
+async def global_uptime_summary(days: int = Query(7, ge=1, le=90),
+                                db: AsyncSession = Depends(get_async_db),
+                                user = Depends(get_current_user)):
     start = since_window(days)
     # only user's websites
-    site_ids = [w.id for w in db.query(models.Website.id).filter(models.Website.user_id==user.id).all()]
+    site_ids = (await db.scalars(select(models.Website.id).where(models.Website.user_id==user.id))).all()
     if not site_ids:
         return {"uptime_pct": 0, "avg_ms": None}
 
-    q = (db.query(
-            func.count().label("checks"),
-            func.sum(case((models.UptimeCheck.status_up==True, 1), else_=0)).label("up_checks"),
-            func.avg(models.UptimeCheck.response_ms).label("avg_ms"))
-         .filter(models.UptimeCheck.website_id.in_(site_ids),
-                 models.UptimeCheck.checked_at >= start))
-    row = q.one()
-    checks = row.checks or 0
-    up = row.up_checks or 0
-    uptime_pct = round((up/checks)*100, 2) if checks else 0.0
-    avg_ms = int(row.avg_ms) if row.avg_ms is not None else None
-    return {"uptime_pct": uptime_pct, "avg_ms": avg_ms}
+    stats = await db.run_sync(uptime_rollups.window_stats, site_ids, start, percentiles=False)
+    return {"uptime_pct": stats["uptime_pct"], "avg_ms": stats["avg_ms"]}
 
 
 
 @app.post("/websites/{website_id}/toggle-defacement")
-async def toggle_defacement_route(website_id: int, enable: bool, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    return await toggle_defacement(website_id, enable, current_user)
+async def toggle_defacement_route(website_id: int, enable: bool, db: AsyncSession = Depends(get_async_db), current_user = Depends(get_current_user)):
+    result = await toggle_defacement(db, website_id, enable, current_user)
+    dashboard.invalidate_dashboard(current_user.id)
+    return result
   
 @app.post("/websites/{website_id}/update-protection")
 def update_protection(
@@ -216,198 +220,150 @@ def update_protection(
         raise HTTPException(status_code=400, detail="Invalid protection type")
 
     db.commit()
+    invalidate_site(website_id)
+    dashboard.invalidate_dashboard(website.user_id)
     return {"success": True}
 
-def website_id_filter(col, website_id: int):
-    if isinstance(col.type, Integer):
-        return col == website_id
-    if isinstance(col.type, String):
-        return col == str(website_id)
-    return col == website_id
-  
 @app.get("/websites/{website_id}/attack-logs", response_model=List[schemas.AttackLogOut])
-def get_attack_logs(
+async def get_attack_logs(
     website_id: int,
+    response: Response,
     limit: int = Query(500, ge=1, le=5000),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    type: Optional[List[str]] = Query(None, description="Filter by event type (repeatable)"),
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user),
 ):
-    site = (
-        db.query(models.Website)
-        .filter(
-            models.Website.id == website_id,
-            models.Website.user_id == current_user.id,  
-        )
-        .first()
-    )
-    if not site:
+    if not await owned_site_id(db, website_id, current_user.id):
         raise HTTPException(status_code=404, detail="Website not found")
 
-    xss_rows = (
-        db.query(models.XSSLog)
-        .filter(website_id_filter(models.XSSLog.website_id, website_id))
-        .order_by(models.XSSLog.created_at.desc())
-        .limit(limit)
-        .all()
-    )
-
-    deface_rows = (
-        db.query(models.DefacementLog)
-        .filter(website_id_filter(models.DefacementLog.website_id, website_id))
-        .order_by(models.DefacementLog.timestamp.desc())
-        .limit(limit)
-        .all()
-    )
-
-    dom_rows = (
-        db.query(models.DomManipulationLog)
-        .filter(website_id_filter(models.DomManipulationLog.website_id, website_id))
-        .order_by(models.DomManipulationLog.created_at.desc())
-        .limit(limit)
-        .all()
-    )
-
-    sql_rows = (
-        db.query(SQLLog)
-        .filter(website_id_filter(SQLLog.website_id, website_id))
-        .order_by(SQLLog.created_at.desc())
-        .limit(limit)
-        .all()
+    if type and not set(type) <= set(EVENT_TYPES):
+        raise HTTPException(status_code=400, detail=f"type must be one of {', '.join(EVENT_TYPES)}")
+    try:
+        stmt = attack_events_query([website_id], types=type, start=start, end=end, cursor=cursor, limit=limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    rows = (await db.execute(stmt)).mappings().all()
+    cursor_out = next_cursor(rows, limit)
+    if cursor_out:
+        response.headers["X-Next-Cursor"] = cursor_out
+    return rows
+
+@app.get("/me/attack-logs/export")
+async def export_attack_logs(
+    format: str = Query("ndjson", description="ndjson, csv or parquet"),
+    website_id: Optional[int] = Query(None, description="default: all of the user's websites"),
+    type: Optional[List[str]] = Query(None, description="Filter by event type (repeatable)"),
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    # Whole history, no row cap: streamed from a server-side cursor in
+    # chunks, so neither side ever holds the full export in memory.
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(export.FORMATS)}")
+    if format == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export is not available on this server")
+    if type and not set(type) <= set(EVENT_TYPES):
+        raise HTTPException(status_code=400, detail=f"type must be one of {', '.join(EVENT_TYPES)}")
+
+    if website_id is not None:
+        if not await owned_site_id(db, website_id, current_user.id):
+            raise HTTPException(status_code=404, detail="Website not found")
+        ids = [website_id]
+    else:
+        ids = (await db.scalars(select(models.Website.id).where(models.Website.user_id == current_user.id))).all()
+    await db.close()  # the export reads on its own session
+
+    media_type, ext = export.FORMATS[format]
+    filename = f"webshield-attacks-{website_id if website_id is not None else 'all'}.{ext}"
+    return StreamingResponse(
+        export.stream_export(ids, format, types=type, start=start, end=end),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Accel-Buffering": "no"},
     )
 
-    out: List[schemas.AttackLogOut] = []
-
-    for r in xss_rows:
-        out.append(
-            schemas.AttackLogOut(
-                id=r.id,
-                type="xss",
-                website_id=r.website_id,
-                occurred_at=r.created_at,
-                ip_address=getattr(r, "ip_address", None),
-            )
-        )
-
-    for r in deface_rows:
-        out.append(
-            schemas.AttackLogOut(
-                id=r.id,
-                type="defacement",
-                website_id=r.website_id,
-                occurred_at=r.timestamp,
-                prediction=getattr(r, "prediction", None),
-            )
-        )
-
-    for r in dom_rows:
-        out.append(
-            schemas.AttackLogOut(
-                id=r.id,
-                type="dom",
-                website_id=r.website_id,
-                occurred_at=r.created_at,
-                ip_address=getattr(r, "ip_address", None),
-            )
-        )
-
-    for r in sql_rows:
-        out.append(
-            schemas.AttackLogOut(
-                id=r.id,
-                type="sql_injection",
-                website_id=r.website_id,
-                occurred_at=r.created_at,
-                query=getattr(r, "query", None),
-                prediction=getattr(r, "prediction", None),
-                score=getattr(r, "score", None),
-            )
-        )
-
-    out.sort(key=lambda x: x.occurred_at, reverse=True)
-    return out[:limit]
+@app.get("/me/dashboard")
+async def get_dashboard(
+    request: Request,
+    days: int = Query(7, ge=1, le=90),
+    per_site: int = Query(500, ge=1, le=5000, description="latest attack events per website"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user),
+):
+    # one round trip for the whole dashboard page; replaces the per-site
+    # attack-logs / blocked-count / uptime calls
+    entry = dashboard.cached_snapshot(current_user.id, days, per_site)
+    if entry is None:
+        snapshot = await db.run_sync(dashboard.build_snapshot, current_user.id, days, per_site)
+        entry = await asyncio.to_thread(dashboard.render, snapshot)
+        dashboard.store_snapshot(current_user.id, days, per_site, entry)
+
+    etag, body = entry
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/me/events/stream")
+async def attack_event_stream(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user),
+):
+    # Server-Sent Events: one "attack" event per new log row on any of the
+    # user's sites, or "resync" if this client fell too far behind and
+    # should reload /me/dashboard. Sites added later need a reconnect.
+    site_ids = (await db.scalars(select(models.Website.id).where(models.Website.user_id == current_user.id))).all()
+    await db.close()  # don't hold a pooled connection for the life of the stream
+    sub = live_feed.hub.subscribe(site_ids)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), config.LIVE_FEED_HEARTBEAT_SEC)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                name = "resync" if event.get("type") == "resync" else "attack"
+                yield f"event: {name}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+        finally:
+            live_feed.hub.unsubscribe(sub)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/me/attack-logs/total-count", response_model=Dict[str, int])
-def get_total_logs_for_user(
-    db: Session = Depends(get_db),
+async def get_total_logs_for_user(
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
 ):
-
-    has_site = (
-        db.query(models.Website.id)
-        .filter(models.Website.user_id == current_user.id)
-        .first()
-    )
-    if not has_site:
-        return {"total": 0}
-
-    xss_count = (
-        db.query(func.count(models.XSSLog.id))
-        .join(models.Website, models.Website.id == models.XSSLog.website_id)
-        .filter(models.Website.user_id == current_user.id)
-        .scalar()
-        or 0
-    )
-
-    dom_count = (
-        db.query(func.count(models.DomManipulationLog.id))
-        .join(models.Website, models.Website.id == models.DomManipulationLog.website_id)
-        .filter(models.Website.user_id == current_user.id)
-        .scalar()
-        or 0
-    )
-
-    sql_count = (
-        db.query(func.count(models.SQLLog.id))
-        .join(models.Website, models.Website.id == models.SQLLog.website_id)
-        .filter(models.Website.user_id == current_user.id)
-        .scalar()
-        or 0
-    )
-
-    total = xss_count + dom_count + sql_count
-    return {"total": total}
+    return {"total": await db.run_sync(counters.total_for_user, current_user.id)}
 
 
 @app.get("/websites/{website_id}/blocked-count")
-def get_blocked_count_for_website(
+async def get_blocked_count_for_website(
     website_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user),
 ) -> Dict[str, int]:
     
 
-    site = (
-        db.query(models.Website)
-        .filter(
-            models.Website.id == website_id,
-            models.Website.user_id == current_user.id,   
-        )
-        .first()
-    )
-    if not site:
+    if not await owned_site_id(db, website_id, current_user.id):
         raise HTTPException(status_code=404, detail="Website not found")
 
-    xss_count = (
-        db.query(func.count(models.XSSLog.id))
-        .filter(models.XSSLog.website_id == website_id)
-        .scalar()
-        or 0
-    )
-
-    dom_count = (
-        db.query(func.count(models.DomManipulationLog.id))
-        .filter(models.DomManipulationLog.website_id == website_id)
-        .scalar()
-        or 0
-    )
-
-    sql_count = (
-        db.query(func.count(models.SQLLog.id))
-        .filter(models.SQLLog.website_id == website_id)
-        .scalar()
-        or 0
-    )
-
+    counts = await db.run_sync(counters.counts_for_website, website_id)
+    xss_count = counts["xss"]
+    dom_count = counts["dom"]
+    sql_count = counts["sql_injection"]
 
     total = xss_count + dom_count + sql_count
 
@@ -422,176 +378,145 @@ def get_blocked_count_for_website(
 async def _start_monitor():
     # fire-and-forget background loop
     asyncio.create_task(monitor_loop(interval_sec=60))
+    sqli_batcher.start()
+    alert_dispatcher.start()
+    log_writer.start()
+    live_feed.hub.start()
+    if config.MODEL_WARMUP:
+        model_registry.start_warmup()
+    asyncio.create_task(defacement_scheduler.resume())
+    asyncio.create_task(partitions.maintenance_loop(config.LOG_MAINTENANCE_INTERVAL_SEC))
+
+
+@app.on_event("shutdown")
+async def _stop_workers():
+    await defacement_scheduler.stop()
+    await log_writer.stop()
+    await live_feed.hub.stop()
+    await sqli_batcher.stop()
+    await asyncio.to_thread(alert_dispatcher.stop)
+    password_hasher.shutdown()
+
+
+@app.get("/metrics")
+def get_metrics():
+    return {
+        "sqli": {
+            "cache": sqli_cache.stats(),
+            "batcher": sqli_batcher.stats(),
+            "prefilter": prefilter.stats(),
+        },
+        "alerts": alert_dispatcher.stats(),
+        "log_writer": log_writer.stats(),
+        "site_cache": site_cache.stats(),
+        "dashboard_cache": dashboard.dashboard_cache.stats(),
+        "live_feed": live_feed.hub.stats(),
+        "auth": user_cache_stats(),
+        "passwords": password_hasher.stats(),
+        "uptime": uptime.scheduler.stats() if uptime.scheduler else None,
+        "defacement": defacement_scheduler.stats(),
+        "log_partitions": partitions.last_run or None,
+        "models": model_registry.stats(),
+    }
+
+
+@app.get("/healthz")
+def healthz():
+    # liveness: the process is up and serving; says nothing about models
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    # readiness: every model loaded and warmed, so the first prediction
+    # does not pay for loading or graph compilation
+    ready = model_registry.ready() or not config.MODEL_WARMUP
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else model_registry.state,
+            **model_registry.stats(),
+            # reported, not gating: inserts fall back to the DEFAULT partitions
+            "log_partitions": partitions.health(),
+        },
+    )
 
 
 @app.post("/predict-sqli/")
-async def predict_sql_query(input: schemas.SQLQuery, db: Session = Depends(get_db)):
-    return services.process_sql_query(input, db)
+async def predict_sql_query(input: schemas.SQLQuery, db: AsyncSession = Depends(get_async_db)):
+    return await services.process_sql_query(input, db)
 
 
 @app.post("/collect-sqli")
-async def collect_sqli(request: Request, db: Session = Depends(get_db)):
+async def collect_sqli(request: Request, db: AsyncSession = Depends(get_async_db)):
     data = await request.json()
     website_id = data.get("website_id")
     query = data.get("query")
 
-    prediction, confidence = predict_query(query)
+    prediction, confidence = await predict_sqli(query)
 
-    log = SQLLog(
-        website_id=website_id,
-        query=query,
-        prediction=prediction,
-        score=confidence
-    )
-    db.add(log)
-    db.commit()
     # website_name, website_url, owner_email = get_site_primitives(db, website_id, current_user.id)
 
-    site = db.query(models.Website).filter(models.Website.id == website_id).first()
+    site = await get_site_async(db, website_id)
     if not site:
         raise HTTPException(404, detail="Website not found")
-    
-    user = db.query(models.User).filter(models.User.id == site.user_id).first()
-    if not user or not user.email:
+
+    if not log_writer.submit(
+        SQLLog,
+        website_id=site.id,
+        query=query,
+        prediction=prediction,
+        score=confidence,
+    ):
+        raise HTTPException(503, "Log queue full", headers={"Retry-After": "1"})
+
+    if not site.owner_email:
         raise HTTPException(404, detail="Owner email not found")
-    
-    website_name = site.name
-    website_url = site.url
-    owner_email = user.email
-
-    ts = datetime.utcnow()
-    subject = f"[Web Shield AI] SQL injection attempt on {website_name}"
-    html = build_threat_email_html(
-        website_name=website_name, website_url=website_url,
-        log_type="sql_injection", occurred_at=ts,
-        query=query, prediction=prediction, score=confidence
-    )
-    try:
-        send_email_now(owner_email, subject, html)
-    except Exception as e:
-        print("Email send error:", e)
-    
+
+    if prediction == "malicious":
+        dispatch_alert(
+            to_email=site.owner_email, website_id=site.id,
+            website_name=site.name, website_url=site.url,
+            log_type="sql_injection", occurred_at=datetime.utcnow(),
+            query=query, prediction=prediction, score=confidence,
+        )
 
     return {"status": "ok", "prediction": prediction, "confidence": confidence}
   
 
 
+def agent_wid(request: Request) -> int:
+    # public CDN routes: a malformed wid gets the no-op script, not a 500
+    try:
+        return int(request.query_params.get("wid") or 0)
+    except ValueError:
+        return 0
+
+
 @app.get("/cdn/webshield-sql-agent.js")
-def serve_agent(request: Request):
-    website_id = request.query_params.get("wid", "0")
-
-    js_code = f"""
-(function () {{
-  const WEBSITE_ID = {website_id};
-  const API_URL = "http://127.0.0.1:8000/collect-sqli";
-
-  function sendSQLQuery(value, callback) {{
-    fetch(API_URL, {{
-      method: "POST",
-      headers: {{ "Content-Type": "application/json" }},
-      body: JSON.stringify({{
-        website_id: WEBSITE_ID,
-        query: value
-      }}),
-    }})
-    .then(res => res.json())
-    .then(data => {{
-      console.log("Sending SQL query:", value);
-      console.log("Prediction:", data);
-      if (data.prediction === "malicious") {{
-        alert("SQL Injection attempt detected!");
-      }}
-      callback(null, data);  
-    }})
-    .catch(err => {{
-      console.error("Error:", err);
-      callback(err, null); 
-    }});
-  }}
-
-  document.addEventListener("DOMContentLoaded", function () {{
-    const inputs = document.getElementsByTagName("input");
-    const submitButton = document.querySelector("button[type='submit'], input[type='submit']");
-
-    if (submitButton) {{
-      submitButton.addEventListener("click", function (e) {{
-        e.preventDefault(); 
-
-        const valuesToCheck = [];
-        for (let i = 0; i < inputs.length; i++) {{
-          const val = inputs[i].value.trim();
-          
-          if (val.endsWith("@gmail.com") || val.endsWith("@yahoo.com") || val.endsWith("@hotmail.com")) {{
-            console.warn("Skipping email input:", val);
-            continue;  
-          }}
-          if (val !== "") {{
-            valuesToCheck.push(val);
-          }}
-        }}
-
-        if (valuesToCheck.length === 0) {{
-          e.target.form.submit();
-          return;
-        }}
-
-        let completed = 0;
-        let maliciousDetected = false;
-
-        function checkAndSubmit() {{
-          completed++;
-          if (completed === valuesToCheck.length) {{
-            if (!maliciousDetected) {{
-              console.log("All inputs are clean. Submitting form...");
-              e.target.form.submit();  
-            }} else {{
-              console.warn("Malicious input detected. Form blocked.");
-            }}
-          }}
-        }}
-
-        for (let i = 0; i < valuesToCheck.length; i++) {{
-          sendSQLQuery(valuesToCheck[i], function(err, data) {{
-            if (err || (data.prediction && data.prediction === "malicious")) {{
-              maliciousDetected = true;
-            }}
-            checkAndSubmit();
-          }});
-        }}
-      }});
-    }}
-  }});
-
-  const queryString = window.location.search;
-  DqueryString = decodeURIComponent(queryString.substring(1));
-  if (queryString) {{
-    sendSQLQuery(DqueryString, function(err, data) {{
-      if (!err && data.prediction === "malicious") {{
-          alert("Malicious query detected in URL. Redirecting to home page.");
-          window.location.href = "/";
-        }}
-    }});
-  }}
-
-  console.log("WebShield SQLI Agent active for Website ID:", WEBSITE_ID);
-}})();
-"""
-
-    return Response(content=js_code, media_type="application/javascript")
+async def serve_agent(request: Request, db: AsyncSession = Depends(get_async_db)):
+    website_id = agent_wid(request)
+
+    site = await get_site_async(db, website_id)
+    if not site:
+        return bundle_response(request, static_bundle('/* SQL agent: site missing */'), max_age=60)
+
+    bundle = await get_bundle_async("sql", {"wid": site.id, "apiBase": config.PUBLIC_API_BASE})
+    return bundle_response(request, bundle)
 
 @app.get("/check-cdn-code")
 async def check_cdn_code(
     wid: int,
     expected_script: str = Query(..., description="Script tag to verify"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        website = db.query(models.Website).filter(models.Website.id == wid).first()
+        website = await db.get(models.Website, wid)
         if not website:
             return {"success": False, "error": "Website not found"}
 
         url = website.url
-        response = requests.get(url, timeout=5)
+        response = await asyncio.to_thread(requests.get, url, timeout=5)
         html_content = response.text
 
         if expected_script in html_content:
@@ -632,106 +557,16 @@ def get_client_ip(request: Request) -> str:
 NOOP_JS = '/* WebShield XSS Agent: disabled or host mismatch. */\n'
 
 @app.get("/cdn/webshield-xss-agent.js")
-def serve_xss_agent(request: Request, db: Session = Depends(get_db)):
-    wid = int(request.query_params.get("wid") or 0)
+async def serve_xss_agent(request: Request, db: AsyncSession = Depends(get_async_db)):
+    wid = agent_wid(request)
     debug = request.query_params.get("debug") == "1"
 
-    site = db.query(models.Website).filter(models.Website.id == wid).first()
+    site = await get_site_async(db, wid)
     if not site or not site.xss_enabled:
-        return Response('/* XSS disabled or site missing */', media_type="application/javascript")
-
-    api_base = str(request.base_url).rstrip("/")  
-
-    js = f"""
-(function() {{
-  const DEBUG = {str(debug).lower()};
-  const WID = {wid};
-  const API_BASE = {api_base!r};
-
-  if (DEBUG) console.log("[WebShield] XSS agent starting", {{ WID, API_BASE }});
-
-  const suspiciousPatterns = [
-    /<script.*?>.*?<\\/script>/i,
-    /%3C\\s*script.*?%3E.*?%3C\\s*\\/\\s*script\\s*%3E/i,
-    /javascript:/i,
-    /onerror\\s*=\\s*/i,
-    /onload\\s*=\\s*/i,
-    /<.*?on\\w+\\s*=\\s*['"].*?['"].*?>/i,
-    /document\\.cookie/i,
-    /<iframe/i,
-    /<img.*?src=.*?>/i
-  ];
-  function isMalicious(v) {{ return suspiciousPatterns.some(re => re.test(v)); }}
-
-  function reportXSS(vector, payload) {{
-    fetch(API_BASE + "/api/xss-report", {{
-      method: "POST",
-      headers: {{ "Content-Type": "application/json" }},
-      body: JSON.stringify({{
-        website_id: WID,
-        vector, payload,
-        page_url: window.location.href,
-        occurred_at: new Date().toISOString()
-      }}),
-      mode: "cors",
-      credentials: "omit",
-      keepalive: true
-    }}).then(() => {{
-      if (DEBUG) console.log("[WebShield] XSS report sent");
-    }}).catch(e => {{
-      console.error("[WebShield] XSS report failed", e);
-    }});
-  }}
-
-  function handleDetection(vector, value) {{
-    reportXSS(vector, value);
-    if (!DEBUG) {{
-      alert("Script Injection Detected! Redirecting to home…");
-    
-      setTimeout(() => window.location.replace("/"), 100);
-    }} else {{
-      console.warn("[WebShield] (debug) Detected XSS, no redirect.");
-    }}
-  }}
-
-  function checkInputs() {{
-    const inputs = document.querySelectorAll("input[type='text'], textarea");
-    for (const input of inputs) {{
-      const v = (input.value || "").trim();
-      if (v && isMalicious(v)) {{
-        handleDetection("input", v);
-        return true;
-      }}
-    }}
-    return false;
-  }}
-
-  function checkURLParams() {{
-    const params = new URLSearchParams(window.location.search);
-    for (const [k, raw] of params.entries()) {{
-      let v = raw; try {{ v = decodeURIComponent(raw); }} catch (_ ) {{}}
-      if (v && isMalicious(v)) {{
-        handleDetection("url", v);
-        return true;
-      }}
-    }}
-    return false;
-  }}
-
-  document.addEventListener("DOMContentLoaded", function () {{
-    if (checkInputs()) return;
-    if (checkURLParams()) return;
-
-    // Intercept form submit so we can stop it on detection
-    for (const form of document.querySelectorAll("form")) {{
-      form.addEventListener("submit", function (e) {{
-        if (checkInputs()) e.preventDefault();
-      }});
-    }}
-  }});
-}})();
-"""
-    return Response(js, media_type="application/javascript", headers={"Cache-Control": "no-store"})
+        return bundle_response(request, static_bundle('/* XSS disabled or site missing */'), max_age=60)
+
+    bundle = await get_bundle_async("xss", {"wid": wid, "apiBase": config.PUBLIC_API_BASE, "debug": debug})
+    return bundle_response(request, bundle)
 
 
 
@@ -743,15 +578,14 @@ class XSSPayload(BaseModel):
 @app.post("/api/xss-report", response_model=None)
 async def xss_report(
     request: Request,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     data = await request.json()
     website_id = int(data.get("website_id") or 0)
     if not website_id:
         raise HTTPException(400, "website_id missing")
 
-    site = db.query(models.Website).filter(models.Website.id == website_id).first()
+    site = await get_site_async(db, website_id)
     if not site or not site.xss_enabled:
         raise HTTPException(403, "XSS disabled or site missing")
 
@@ -760,134 +594,37 @@ async def xss_report(
           or request.headers.get("X-Real-IP")
           or request.client.host)
 
-    db.add(models.XSSLog(website_id=website_id, ip_address=ip))
-    db.commit()
+    if not log_writer.submit(models.XSSLog, website_id=website_id, ip_address=ip):
+        raise HTTPException(503, "Log queue full", headers={"Retry-After": "1"})
 
-    user = db.query(models.User).filter(models.User.id == site.user_id).first()
-    if user and user.email:
-        subject = f"[WebShield AI] XSS attempt on {site.name}"
-        html = build_threat_email_html(
+    if site.owner_email:
+        dispatch_alert(
+            to_email=site.owner_email, website_id=site.id,
             website_name=site.name, website_url=site.url,
-            log_type="xss", occurred_at=datetime.utcnow(), ip_address=ip
+            log_type="xss", occurred_at=datetime.utcnow(), ip_address=ip,
         )
-        background_tasks.add_task(send_email_now, user.email, subject, html)
 
     return Response(status_code=204)
 
 
 
 @app.get("/cdn/dom-defacement-agent.js")
-def serve_dom_defacement_agent(request: Request, db: Session = Depends(get_db)):
-    wid = int(request.query_params.get("wid") or 0)
+async def serve_dom_defacement_agent(request: Request, db: AsyncSession = Depends(get_async_db)):
+    wid = agent_wid(request)
     debug = request.query_params.get("debug") == "1"
 
-    site = db.query(models.Website).filter(models.Website.id == wid).first()
+    site = await get_site_async(db, wid)
     if not site or not site.dom_enabled:
-        return Response('/* DOM agent disabled or site missing */', media_type="application/javascript")
-
-    api_base = str(request.base_url).rstrip("/")  # -> http://127.0.0.1:8000
-
-    js_code = f"""
-(function () {{
-  const DEBUG = {str(debug).lower()};
-  const WID = {wid};
-  const API_BASE = {api_base!r};
-
-  if (DEBUG) console.log("[WebShield] DOM agent starting", {{ WID, API_BASE }});
-
-  // Config
-  const ALLOWED_TAGS = ["DIV","SPAN","P","A","INPUT","TEXTAREA","BUTTON","UL","OL","LI","IMG","SECTION","NAV","HEADER","FOOTER","MAIN"];
-  const SUSPICIOUS_TAGS = ["SCRIPT","IFRAME","EMBED","OBJECT","LINK","STYLE"];
-
-  function isElement(node) {{ return node && node.nodeType === 1; }}
-  function isSuspiciousNode(node) {{
-    if (!isElement(node)) return false;
-    const tag = node.tagName?.toUpperCase();
-    return !!tag && SUSPICIOUS_TAGS.includes(tag);
-  }}
-  function isRemovalOfNonAllowed(node) {{
-    if (!isElement(node)) return false;
-    const tag = node.tagName?.toUpperCase();
-    return !!tag && !ALLOWED_TAGS.includes(tag);
-  }}
-
-  function reportDomTamper(kind, tag, snippet) {{
-    fetch(API_BASE + "/api/dom-report", {{
-      method: "POST",
-      headers: {{ "Content-Type": "application/json" }},
-      body: JSON.stringify({{
-        website_id: WID,
-        kind,          
-        tag,          
-        snippet,       
-        page_url: window.location.href,
-        occurred_at: new Date().toISOString()
-      }}),
-      mode: "cors",
-      credentials: "omit",
-      keepalive: true
-    }})
-    .then(() => DEBUG && console.log("[WebShield] DOM report sent"))
-    .catch(err => console.error("[WebShield] DOM report failed:", err));
-  }}
-
-  function handleDetection(kind, tag, snippet) {{
-    reportDomTamper(kind, tag, snippet);
-    if (!DEBUG) {{
-      alert("Suspicious DOM tampering detected! Redirecting to home…");
-      setTimeout(() => window.location.replace("/"), 100);
-    }} else {{
-      console.warn("[WebShield] (debug) DOM tamper detected, no redirect.");
-    }}
-  }}
-
-  function handleMutation(mutation) {{
-    if (mutation.type !== "childList") return;
-
-    // Added nodes: suspicious?
-    for (const node of mutation.addedNodes) {{
-      if (isSuspiciousNode(node)) {{
-        const tag = node.tagName?.toUpperCase() || "";
-        const snippet = isElement(node) ? (node.outerHTML || "").slice(0, 200) : "";
-        handleDetection("added-suspicious", tag, snippet);
-        return true;
-      }}
-    }}
-
-    // Removed nodes: non-allowed?
-    for (const node of mutation.removedNodes) {{
-      if (isRemovalOfNonAllowed(node)) {{
-        const tag = node.tagName?.toUpperCase() || "";
-        handleDetection("removed-nonallowed", tag, "");
-        return true;
-      }}
-    }}
-    return false;
-  }}
-
-  window.addEventListener("load", function () {{
-    try {{
-      const observer = new MutationObserver(function (mutations) {{
-        for (const m of mutations) {{
-          if (handleMutation(m)) break;
-        }}
-      }});
-      observer.observe(document.body, {{ childList: true, subtree: true }});
-      console.log("WebShield DOM Agent activated");
-    }} catch (e) {{
-      console.error("[WebShield] DOM observer error:", e);
-    }}
-  }});
-}})();
-"""
-    return Response(content=js_code, media_type="application/javascript", headers={"Cache-Control": "no-store"})
+        return bundle_response(request, static_bundle('/* DOM agent disabled or site missing */'), max_age=60)
+
+    bundle = await get_bundle_async("dom", {"wid": wid, "apiBase": config.PUBLIC_API_BASE, "debug": debug})
+    return bundle_response(request, bundle)
 
 
 @app.post("/api/dom-report", response_model=None)
 async def dom_report(
     request: Request,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     data = await request.json()
     website_id = int(data.get("website_id", 0) or 0)
@@ -901,32 +638,90 @@ async def dom_report(
     # page_url = data.get("page_url")
 
     # Lookup website & feature flag
-    site = db.query(models.Website).filter(models.Website.id == website_id).first()
+    site = await get_site_async(db, website_id)
     if not site or not site.dom_enabled:
         raise HTTPException(403, "DOM protection disabled or site missing")
 
     ip = get_client_ip(request)
 
-    new_log = models.DomManipulationLog(
-        website_id=website_id,
-        ip_address=ip
-    )
-    db.add(new_log)
-    db.commit()
+    if not log_writer.submit(models.DomManipulationLog, website_id=website_id, ip_address=ip):
+        raise HTTPException(503, "Log queue full", headers={"Retry-After": "1"})
 
-    user = db.query(models.User).filter(models.User.id == site.user_id).first()
-    if user and user.email:
-        subject = f"[WebShield AI] DOM tampering on {site.name}"
-        html = build_threat_email_html(
-            website_name=site.name,
-            website_url=site.url,
-            log_type="dom",
-            occurred_at=datetime.utcnow(),
-            ip_address=ip
+    if site.owner_email:
+        dispatch_alert(
+            to_email=site.owner_email, website_id=site.id,
+            website_name=site.name, website_url=site.url,
+            log_type="dom", occurred_at=datetime.utcnow(), ip_address=ip,
         )
-        background_tasks.add_task(send_email_now, user.email, subject, html)
 
     return Response(status_code=204)
 
 
+@app.post("/api/events/batch", response_model=None)
+async def events_batch(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Every agent's events for one page in one request (gzip optional):
+    # one site lookup, one scoring pass for all SQLi candidates, and at
+    # most one alert per event type. XSS/DOM reports arrive by sendBeacon
+    # and ignore the response; the SQL agent reads the per-event results.
+    try:
+        raw = event_batch.decode_body(await event_batch.read_body(request), request.headers.get("content-encoding"))
+        batch = schemas.EventBatch.model_validate_json(raw)
+    except event_batch.BatchTooLarge:
+        raise HTTPException(413, "Event batch too large")
+    except ValueError:
+        raise HTTPException(400, "Malformed event batch")
+    if len(batch.events) > config.EVENT_BATCH_MAX_EVENTS:
+        raise HTTPException(413, f"At most {config.EVENT_BATCH_MAX_EVENTS} events per batch")
+
+    site = await get_site_async(db, batch.website_id)
+    if not site:
+        raise HTTPException(404, "Website not found")
+
+    # same gates as the single-event endpoints
+    enabled = {"sqli": True, "xss": site.xss_enabled, "dom": site.dom_enabled}
+    ip = get_client_ip(request)
+
+    queries = [e.query for e in batch.events if e.type == "sqli" and enabled["sqli"] and (e.query or "").strip()]
+    verdicts = dict(zip(queries, await predict_sqli_many(queries)))
+
+    results, rows, detected = [], [], {}
+    for ev in batch.events:
+        result = None
+        if not enabled[ev.type]:
+            pass
+        elif ev.type == "sqli":
+            if ev.query in verdicts:
+                prediction, confidence = verdicts[ev.query]
+                result = {"prediction": prediction, "confidence": confidence}
+                rows.append((SQLLog, {"website_id": site.id, "query": ev.query,
+                                      "prediction": prediction, "score": confidence}))
+                if prediction == "malicious":
+                    detected.setdefault("sql_injection", {"query": ev.query, "prediction": prediction,
+                                                          "score": confidence})
+        elif ev.type == "xss":
+            rows.append((models.XSSLog, {"website_id": site.id, "ip_address": ip}))
+            detected.setdefault("xss", {"ip_address": ip})
+        else:
+            rows.append((models.DomManipulationLog, {"website_id": site.id, "ip_address": ip}))
+            detected.setdefault("dom", {"ip_address": ip})
+        results.append(result)
+
+    for model, row in rows:
+        if not log_writer.submit(model, **row):
+            raise HTTPException(503, "Log queue full", headers={"Retry-After": "1"})
+
+    if site.owner_email:
+        for log_type, extra in detected.items():
+            dispatch_alert(
+                to_email=site.owner_email, website_id=site.id,
+                website_name=site.name, website_url=site.url,
+                log_type=log_type, occurred_at=datetime.utcnow(), **extra,
+            )
+
+    return {"accepted": len(rows), "rejected": len(batch.events) - len(rows), "results": results}
+
+
 
@@ -0,0 +1,96 @@
+"""baseline schema (tables previously created by create_all)
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("email", sa.String),
+        sa.Column("name", sa.String),
+        sa.Column("plan", sa.String),
+        sa.Column("hashed_password", sa.String),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "websites",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("name", sa.String),
+        sa.Column("url", sa.String),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+        sa.Column("defacement_enabled", sa.Boolean),
+        sa.Column("sqli_enabled", sa.Boolean),
+        sa.Column("dom_enabled", sa.Boolean),
+        sa.Column("xss_enabled", sa.Boolean),
+    )
+    op.create_index("ix_websites_id", "websites", ["id"])
+
+    op.create_table(
+        "sql_logs",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("website_id", sa.Integer, sa.ForeignKey("websites.id")),
+        sa.Column("query", sa.Text),
+        sa.Column("prediction", sa.String),
+        sa.Column("score", sa.Float),
+        sa.Column("created_at", sa.DateTime),
+    )
+    op.create_index("ix_sql_logs_id", "sql_logs", ["id"])
+
+    op.create_table(
+        "defacement_logs",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("website_id", sa.Integer, sa.ForeignKey("websites.id")),
+        sa.Column("prediction", sa.String),
+        sa.Column("timestamp", sa.DateTime),
+    )
+    op.create_index("ix_defacement_logs_id", "defacement_logs", ["id"])
+
+    op.create_table(
+        "dom_logs",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("website_id", sa.Integer, sa.ForeignKey("websites.id")),
+        sa.Column("ip_address", sa.String),
+        sa.Column("created_at", sa.DateTime),
+    )
+    op.create_index("ix_dom_logs_id", "dom_logs", ["id"])
+
+    op.create_table(
+        "XSS_logs",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("website_id", sa.Integer, sa.ForeignKey("websites.id")),
+        sa.Column("ip_address", sa.String),
+        sa.Column("created_at", sa.DateTime),
+    )
+    op.create_index("ix_XSS_logs_id", "XSS_logs", ["id"])
+
+    op.create_table(
+        "uptime_checks",
+        sa.Column("id", sa.BigInteger, primary_key=True),
+        sa.Column("website_id", sa.Integer, sa.ForeignKey("websites.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("status_up", sa.Boolean, nullable=False),
+        sa.Column("status_code", sa.Integer),
+        sa.Column("response_ms", sa.Integer),
+        sa.Column("error", sa.Text),
+        sa.Column("checked_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_uptime_checks_id", "uptime_checks", ["id"])
+    op.create_index("ix_uptime_checks_website_id", "uptime_checks", ["website_id"])
+
+
+def downgrade():
+    for table in ("uptime_checks", "XSS_logs", "dom_logs", "defacement_logs", "sql_logs", "websites", "users"):
+        op.drop_table(table)
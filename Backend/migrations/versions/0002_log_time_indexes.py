@@ -0,0 +1,52 @@
+"""composite (website_id, time DESC) indexes on the log tables
+
+Revision ID: 0002_log_time_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002_log_time_indexes"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+# name, table, columns, partial-index predicate
+INDEXES = [
+    ("ix_sql_logs_website_created", "sql_logs",
+     ["website_id", sa.text("created_at DESC"), sa.text("id DESC")], None),
+    ("ix_sql_logs_website_created_malicious", "sql_logs",
+     ["website_id", sa.text("created_at DESC")], "prediction = 'malicious'"),
+    ("ix_dom_logs_website_created", "dom_logs",
+     ["website_id", sa.text("created_at DESC"), sa.text("id DESC")], None),
+    ("ix_XSS_logs_website_created", "XSS_logs",
+     ["website_id", sa.text("created_at DESC"), sa.text("id DESC")], None),
+    ("ix_defacement_logs_website_timestamp", "defacement_logs",
+     ["website_id", sa.text("timestamp DESC"), sa.text("id DESC")], None),
+    ("ix_defacement_logs_website_timestamp_defaced", "defacement_logs",
+     ["website_id", sa.text("timestamp DESC")], "prediction = 'defaced'"),
+    ("ix_defacement_logs_timestamp", "defacement_logs", ["timestamp"], None),
+    ("ix_uptime_checks_website_checked", "uptime_checks",
+     ["website_id", sa.text("checked_at DESC")], None),
+    ("ix_websites_user_id", "websites", ["user_id"], None),
+]
+
+
+def upgrade():
+    # CONCURRENTLY so existing deployments keep ingesting while indexes build
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
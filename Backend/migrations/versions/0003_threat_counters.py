@@ -0,0 +1,37 @@
+"""per-website, per-type, per-day threat counters
+
+Revision ID: 0003_threat_counters
+Revises: 0002_log_time_indexes
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003_threat_counters"
+down_revision = "0002_log_time_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "threat_counters",
+        sa.Column("website_id", sa.Integer, sa.ForeignKey("websites.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("type", sa.String, primary_key=True),
+        sa.Column("day", sa.Date, primary_key=True),
+        sa.Column("count", sa.BigInteger, nullable=False, server_default="0"),
+    )
+    # backfill from history; `python counters.py check` verifies afterwards
+    for type_, table in (("xss", '"XSS_logs"'), ("dom", "dom_logs"), ("sql_injection", "sql_logs")):
+        op.execute(f"""
+            INSERT INTO threat_counters (website_id, type, day, count)
+            SELECT website_id, '{type_}', CAST(created_at AS date), count(*)
+            FROM {table}
+            WHERE website_id IS NOT NULL
+            GROUP BY website_id, CAST(created_at AS date)
+        """)
+
+
+def downgrade():
+    op.drop_table("threat_counters")
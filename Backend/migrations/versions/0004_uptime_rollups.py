@@ -0,0 +1,72 @@
+"""hourly uptime rollups with latency histograms
+
+Revision ID: 0004_uptime_rollups
+Revises: 0003_threat_counters
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0004_uptime_rollups"
+down_revision = "0003_threat_counters"
+branch_labels = None
+depends_on = None
+
+# must match uptime_rollups.GROWTH / NUM_BUCKETS
+GROWTH = 1.1
+NUM_BUCKETS = 120
+
+
+def upgrade():
+    op.create_table(
+        "uptime_rollups",
+        sa.Column("website_id", sa.Integer, sa.ForeignKey("websites.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("hour", sa.DateTime(timezone=True), primary_key=True),
+        sa.Column("checks", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("up_checks", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("latency_checks", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("sum_ms", sa.BigInteger, nullable=False, server_default="0"),
+        sa.Column("min_ms", sa.Integer, nullable=True),
+        sa.Column("max_ms", sa.Integer, nullable=True),
+        sa.Column("latency_hist", postgresql.ARRAY(sa.Integer), nullable=False),
+    )
+    # backfill from the raw checks we still have
+    op.execute(f"""
+        WITH b AS (
+            SELECT website_id,
+                   date_trunc('hour', checked_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS hour,
+                   status_up, response_ms,
+                   CASE WHEN response_ms IS NULL THEN NULL
+                        WHEN response_ms <= 1 THEN 0
+                        ELSE LEAST({NUM_BUCKETS - 1}, floor(ln(response_ms) / ln({GROWTH}))::int)
+                   END AS bucket
+            FROM uptime_checks
+        ), agg AS (
+            SELECT website_id, hour, count(*) AS checks,
+                   count(*) FILTER (WHERE status_up) AS up_checks,
+                   count(response_ms) AS latency_checks,
+                   coalesce(sum(response_ms), 0) AS sum_ms,
+                   min(response_ms) AS min_ms, max(response_ms) AS max_ms
+            FROM b GROUP BY website_id, hour
+        ), h AS (
+            SELECT website_id, hour, bucket, count(*) AS n
+            FROM b WHERE bucket IS NOT NULL GROUP BY website_id, hour, bucket
+        )
+        INSERT INTO uptime_rollups
+            (website_id, hour, checks, up_checks, latency_checks, sum_ms, min_ms, max_ms, latency_hist)
+        SELECT agg.website_id, agg.hour, agg.checks, agg.up_checks, agg.latency_checks,
+               agg.sum_ms, agg.min_ms, agg.max_ms,
+               ARRAY(
+                   SELECT coalesce(h.n, 0)::int
+                   FROM generate_series(0, {NUM_BUCKETS - 1}) AS i
+                   LEFT JOIN h ON h.website_id = agg.website_id AND h.hour = agg.hour AND h.bucket = i
+                   ORDER BY i
+               )
+        FROM agg
+    """)
+
+
+def downgrade():
+    op.drop_table("uptime_rollups")
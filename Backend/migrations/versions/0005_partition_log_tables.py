@@ -0,0 +1,145 @@
+"""range-partition the log tables by day
+
+Revision ID: 0005_partition_log_tables
+Revises: 0004_uptime_rollups
+Create Date: 2026-10-18
+
+Each table is rebuilt as a partitioned parent. Existing rows go into one
+"archive" partition (everything before today), which the retention job
+drops as a whole once it falls out of every plan's window; daily
+partitions from today on are created here and then kept ahead by
+partitions.py. The copy holds an exclusive lock on each table, so run it
+in a maintenance window on large installs.
+"""
+from datetime import date, datetime, timedelta, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005_partition_log_tables"
+down_revision = "0004_uptime_rollups"
+branch_labels = None
+depends_on = None
+
+# table, partition column, timestamptz?, ON DELETE for the website FK
+TABLES = [
+    ("sql_logs", "created_at", False, None),
+    ("dom_logs", "created_at", False, None),
+    ("XSS_logs", "created_at", False, None),
+    ("defacement_logs", "timestamp", False, None),
+    ("uptime_checks", "checked_at", True, "CASCADE"),
+]
+
+# recreated on the parents; same definitions as 0002 (plus the id index
+# the models declare)
+INDEXES = {
+    "sql_logs": [
+        ("ix_sql_logs_id", "(id)", None),
+        ("ix_sql_logs_website_created", "(website_id, created_at DESC, id DESC)", None),
+        ("ix_sql_logs_website_created_malicious", "(website_id, created_at DESC)", "prediction = 'malicious'"),
+    ],
+    "dom_logs": [
+        ("ix_dom_logs_id", "(id)", None),
+        ("ix_dom_logs_website_created", "(website_id, created_at DESC, id DESC)", None),
+    ],
+    "XSS_logs": [
+        ('"ix_XSS_logs_id"', "(id)", None),
+        ('"ix_XSS_logs_website_created"', "(website_id, created_at DESC, id DESC)", None),
+    ],
+    "defacement_logs": [
+        ("ix_defacement_logs_id", "(id)", None),
+        ("ix_defacement_logs_website_timestamp", '(website_id, "timestamp" DESC, id DESC)', None),
+        ("ix_defacement_logs_website_timestamp_defaced", '(website_id, "timestamp" DESC)', "prediction = 'defaced'"),
+        ("ix_defacement_logs_timestamp", '("timestamp")', None),
+    ],
+    "uptime_checks": [
+        ("ix_uptime_checks_id", "(id)", None),
+        ("ix_uptime_checks_website_id", "(website_id)", None),
+        ("ix_uptime_checks_website_checked", "(website_id, checked_at DESC)", None),
+    ],
+}
+
+PREMAKE_DAYS = 7
+
+
+def _bound(day: date, tz: bool) -> str:
+    return f"'{day.isoformat()} 00:00:00+00'" if tz else f"'{day.isoformat()}'"
+
+
+def _partition_table(bind, table: str, column: str, tz: bool, on_delete: str | None):
+    old = f"{table}_old"
+    today = datetime.now(timezone.utc).date() if tz else date.today()
+    epoch = "'1970-01-01 00:00:00+00'" if tz else "'1970-01-01'"
+
+    op.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+    seq = bind.execute(sa.text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": f'"{old}"'}).scalar()
+
+    op.execute(f'UPDATE "{old}" SET "{column}" = {epoch} WHERE "{column}" IS NULL')
+    op.execute(
+        f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS) '
+        f'PARTITION BY RANGE ("{column}")'
+    )
+    op.execute(f'ALTER TABLE "{table}" ALTER COLUMN "{column}" SET NOT NULL')
+    op.execute(
+        f'ALTER TABLE "{table}" ALTER COLUMN "{column}" SET DEFAULT '
+        + ("now()" if tz else "LOCALTIMESTAMP")
+    )
+    if seq:
+        # the id default still points at the old sequence; keep it alive
+        op.execute(f'ALTER SEQUENCE {seq} OWNED BY "{table}".id')
+
+    op.execute(
+        f'CREATE TABLE "{table}_p_until_{today:%Y%m%d}" PARTITION OF "{table}" '
+        f"FOR VALUES FROM (MINVALUE) TO ({_bound(today, tz)})"
+    )
+    for i in range(PREMAKE_DAYS + 1):
+        day = today + timedelta(days=i)
+        op.execute(
+            f'CREATE TABLE "{table}_p{day:%Y%m%d}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ({_bound(day, tz)}) TO ({_bound(day + timedelta(days=1), tz)})"
+        )
+
+    op.execute(f'INSERT INTO "{table}" SELECT * FROM "{old}"')
+    op.execute(f'DROP TABLE "{old}"')
+
+    # the partition key has to be part of every unique constraint
+    op.execute(f'ALTER TABLE "{table}" ADD PRIMARY KEY (id, "{column}")')
+    op.execute(
+        f'ALTER TABLE "{table}" ADD FOREIGN KEY (website_id) REFERENCES websites (id)'
+        + (f" ON DELETE {on_delete}" if on_delete else "")
+    )
+    for name, columns, where in INDEXES[table]:
+        op.execute(
+            f'CREATE INDEX {name} ON "{table}" {columns}'
+            + (f" WHERE {where}" if where else "")
+        )
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table, column, tz, on_delete in TABLES:
+        _partition_table(bind, table, column, tz, on_delete)
+
+
+def downgrade():
+    bind = op.get_bind()
+    for table, column, tz, on_delete in reversed(TABLES):
+        old = f"{table}_partitioned"
+        seq = bind.execute(sa.text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": f'"{table}"'}).scalar()
+        op.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+        op.execute(f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS)')
+        if seq:
+            op.execute(f'ALTER SEQUENCE {seq} OWNED BY "{table}".id')
+        op.execute(f'INSERT INTO "{table}" SELECT * FROM "{old}"')
+        op.execute(f'DROP TABLE "{old}" CASCADE')
+        op.execute(f'ALTER TABLE "{table}" ADD PRIMARY KEY (id)')
+        op.execute(
+            f'ALTER TABLE "{table}" ADD FOREIGN KEY (website_id) REFERENCES websites (id)'
+            + (f" ON DELETE {on_delete}" if on_delete else "")
+        )
+        for name, columns, where in INDEXES[table]:
+            op.execute(
+                f'CREATE INDEX {name} ON "{table}" {columns}'
+                + (f" WHERE {where}" if where else "")
+            )
@@ -0,0 +1,30 @@
+"""DEFAULT partition for each partitioned log table
+
+Revision ID: 0006_log_default_partitions
+Revises: 0005_partition_log_tables
+Create Date: 2026-10-18
+
+Without one, an insert for a day partitions.py has not created yet fails,
+so a maintenance outage longer than LOG_PARTITION_PREMAKE_DAYS would make
+every log write fail. Rows that land here are moved into their daily
+partition when partitions.py creates it.
+"""
+from alembic import op
+
+
+revision = "0006_log_default_partitions"
+down_revision = "0005_partition_log_tables"
+branch_labels = None
+depends_on = None
+
+TABLES = ["sql_logs", "dom_logs", "XSS_logs", "defacement_logs", "uptime_checks"]
+
+
+def upgrade():
+    for table in TABLES:
+        op.execute(f'CREATE TABLE IF NOT EXISTS "{table}_p_default" PARTITION OF "{table}" DEFAULT')
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f'DROP TABLE IF EXISTS "{table}_p_default"')
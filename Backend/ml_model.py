@@ -1,30 +1,91 @@
-import tensorflow as tf
-from keras.models import load_model
-from tensorflow.keras.preprocessing.text import Tokenizer
-from keras.preprocessing.sequence import pad_sequences
-import joblib
+import os
+import time
 
-tokenizer = Tokenizer(num_words=1000, oov_token="<OOV>")
-max_length = 30
+import config
+from model_backends import load_backend, model_path
+from model_registry import registry
+from sqli_prefilter import PREFILTER_RESULT, prefilter
+from sqli_tokenizer import get_tokenizer, MAX_LENGTH
 
-model = load_model("ml/sqli_classifier_model.h5")
+tokenizer = get_tokenizer()
+max_length = MAX_LENGTH
+
+MODEL_PATH = "ml/sqli_classifier_model.h5"
+# file actually served: the .h5 itself, or its ONNX/TFLite export
+SERVING_PATH = model_path(MODEL_PATH, config.SQLI_BACKEND, config.SQLI_QUANTIZED)
+RELOAD_CHECK_SEC = 5.0
+
+model_mtime = None
+model_version = 0
+_last_reload_check = time.monotonic()
+
+def _load_sqli():
+    # the runtime (TensorFlow for keras) is imported here, on first load
+    global model_mtime, model_version
+    mtime = os.path.getmtime(SERVING_PATH)
+    loaded = load_backend(config.SQLI_BACKEND, MODEL_PATH, config.SQLI_QUANTIZED, config.INFERENCE_THREADS)
+    model_mtime = mtime
+    model_version += 1
+    return loaded
+
+def _warm_sqli(loaded):
+    loaded.predict(tokenizer.encode_batch(["select 1"]))
+
+registry.register("sqli", _load_sqli, _warm_sqli)
+
+def reload_model():
+    registry.reload("sqli")
+    print(f"Reloaded SQLi model from {SERVING_PATH} (version {model_version})")
+
+def maybe_reload() -> bool:
+    # Picks up a replaced model file without a restart. Returns True when
+    # the model was reloaded so callers can drop cached predictions.
+    global _last_reload_check
+    if not registry.loaded("sqli"):
+        return False
+    now = time.monotonic()
+    if now - _last_reload_check < RELOAD_CHECK_SEC:
+        return False
+    _last_reload_check = now
+    try:
+        mtime = os.path.getmtime(SERVING_PATH)
+    except OSError:
+        return False
+    if mtime == model_mtime:
+        return False
+    reload_model()
+    return True
 
 def prepare_query(query):
-    tokenizer.fit_on_texts([query])
-    sequences = tokenizer.texts_to_sequences([query])
-    padded = pad_sequences(sequences, maxlen=max_length, padding='post') #truncating='post'
-    return padded
+    return tokenizer.encode(query)
 
 def predict_query(query):
-    processed = prepare_query(query)
-    prediction = model.predict(processed)[0][0]
-    label = "malicious" if prediction >= 0.8 else "normal"
-    return label, float(prediction)
+    if prefilter.is_benign(query):
+        return PREFILTER_RESULT
+    return predict_batch([query])[0]
+
+def predict_batch(queries):
+    if not queries:
+        return []
+    processed = tokenizer.encode_batch(queries)
+    predictions = registry.get("sqli").predict(processed)[:, 0]
+    return [
+        ("malicious" if p >= 0.8 else "normal", float(p))
+        for p in predictions
+    ]
+
+def _load_dom():
+    import joblib
+    return joblib.load("ml/dom_model.pkl"), joblib.load("ml/dom_vectorizer.pkl")
+
+def _warm_dom(loaded):
+    dom_model, dom_vectorizer = loaded
+    dom_model.predict_proba(dom_vectorizer.transform(["<div></div>"]))
 
-dom_model = joblib.load("ml/dom_model.pkl")
-dom_vectorizer = joblib.load("ml/dom_vectorizer.pkl")
+registry.register("dom", _load_dom, _warm_dom)
 
 def predict_dom_mutation(log):
+    dom_model, dom_vectorizer = registry.get("dom")
     transformed = dom_vectorizer.transform([log])
     prediction = dom_model.predict(transformed)[0]
     confidence = dom_model.predict_proba(transformed).max()
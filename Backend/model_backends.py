@@ -0,0 +1,101 @@
+import os
+import threading
+
+import numpy as np
+
+# Runtimes a model can be served from. Each one takes a batch as a numpy
+# array and returns the model's output as a float32 array. Keras needs the
+# full TensorFlow runtime; ONNX Runtime and the standalone TFLite
+# interpreter run the exported graph without it (see convert_models.py),
+# at a fraction of the per-call overhead and resident memory.
+BACKENDS = ("keras", "onnx", "tflite")
+EXTENSIONS = {"keras": ".h5", "onnx": ".onnx", "tflite": ".tflite"}
+
+
+def model_path(keras_path: str, backend: str, quantized: bool = False) -> str:
+    # ml/foo.h5 -> ml/foo.onnx, ml/foo.int8.tflite, ...
+    if backend == "keras":
+        return keras_path
+    base, _ = os.path.splitext(keras_path)
+    return base + (".int8" if quantized else "") + EXTENSIONS[backend]
+
+
+class KerasBackend:
+    name = "keras"
+
+    def __init__(self, path: str):
+        from tensorflow import keras
+        self.path = path
+        self.model = keras.models.load_model(path, compile=False)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # direct call: model.predict() builds a tf.data pipeline per call,
+        # which dominates the cost for a handful of rows
+        return np.asarray(self.model(batch, training=False), dtype=np.float32)
+
+
+_ORT_TYPES = {"tensor(float)": np.float32, "tensor(int32)": np.int32, "tensor(int64)": np.int64}
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, path: str, threads: int = 0):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        self.input_dtype = _ORT_TYPES.get(inp.type, np.float32)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        out = self.session.run(None, {self.input_name: batch.astype(self.input_dtype, copy=False)})[0]
+        return np.asarray(out, dtype=np.float32)
+
+
+class TFLiteBackend:
+    name = "tflite"
+
+    def __init__(self, path: str, threads: int = 0):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:  # fall back to the interpreter bundled with TensorFlow
+            from tensorflow.lite import Interpreter
+        self.path = path
+        self.interpreter = Interpreter(model_path=path, num_threads=threads or None)
+        self.interpreter.allocate_tensors()
+        self._in = self.interpreter.get_input_details()[0]
+        self._out = self.interpreter.get_output_details()[0]
+        self._shape = tuple(self._in["shape"])
+        # one interpreter, not thread-safe: serialize callers
+        self._lock = threading.Lock()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if tuple(batch.shape) != self._shape:
+                self.interpreter.resize_tensor_input(self._in["index"], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._shape = tuple(batch.shape)
+            self.interpreter.set_tensor(self._in["index"], batch.astype(self._in["dtype"], copy=False))
+            self.interpreter.invoke()
+            out = self.interpreter.get_tensor(self._out["index"])
+        scale, zero = self._out.get("quantization", (0.0, 0))
+        if scale:
+            # fully-quantized output tensor
+            return (out.astype(np.float32) - zero) * scale
+        return out.astype(np.float32, copy=True)
+
+
+def load_backend(backend: str, keras_path: str, quantized: bool = False, threads: int = 0):
+    path = model_path(keras_path, backend, quantized)
+    if backend == "keras":
+        return KerasBackend(path)
+    if backend == "onnx":
+        return OnnxBackend(path, threads)
+    if backend == "tflite":
+        return TFLiteBackend(path, threads)
+    raise ValueError(f"unknown inference backend {backend!r}; expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,134 @@
+import asyncio
+import importlib
+import threading
+import time
+from typing import Any, Callable
+
+# Models are registered by the module that uses them (ml_model,
+# defacement_loop) and loaded on first get() or by the background warm-up,
+# never at import. The inference runtime and joblib are only imported inside
+# the loaders, so a worker serves non-ML routes right after start while the
+# models come up in a thread.
+MODEL_MODULES = ("ml_model", "defacement_loop")
+
+
+class _Entry:
+    def __init__(self, name: str, loader: Callable[[], Any], warmup: Callable[[Any], Any] | None):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.lock = threading.Lock()
+        self.value = None
+        self.loaded = False
+        self.warm = False
+        self.error: str | None = None
+        self.load_ms = 0.0
+        self.warmup_ms = 0.0
+        self.loads = 0
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._entries: dict[str, _Entry] = {}
+        self._task: asyncio.Task | None = None
+        self.state = "idle"  # idle -> warming -> ready | failed
+
+    def register(self, name: str, loader: Callable[[], Any], warmup: Callable[[Any], Any] | None = None):
+        if name not in self._entries:
+            self._entries[name] = _Entry(name, loader, warmup)
+
+    def loaded(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry.loaded
+
+    def _load(self, entry: _Entry):
+        t0 = time.perf_counter()
+        try:
+            entry.value = entry.loader()
+        except Exception as e:
+            entry.error = f"load: {e}"
+            raise
+        entry.load_ms = (time.perf_counter() - t0) * 1000
+        entry.loaded = True
+        entry.warm = False
+        entry.error = None
+        entry.loads += 1
+        print(f"Loaded model {entry.name} in {entry.load_ms:.0f} ms")
+
+    def get(self, name: str):
+        # Blocking; call from worker threads, not the event loop.
+        entry = self._entries[name]
+        if not entry.loaded:
+            with entry.lock:
+                if not entry.loaded:
+                    self._load(entry)
+        return entry.value
+
+    def reload(self, name: str):
+        entry = self._entries[name]
+        with entry.lock:
+            self._load(entry)
+            self._warm(entry)
+        return entry.value
+
+    def _warm(self, entry: _Entry):
+        # one dummy inference so graph tracing/compilation happens here
+        # rather than on the first real request
+        if entry.warmup is not None:
+            t0 = time.perf_counter()
+            try:
+                entry.warmup(entry.value)
+            except Exception as e:
+                entry.error = f"warmup: {e}"
+                raise
+            entry.warmup_ms = (time.perf_counter() - t0) * 1000
+        entry.warm = True
+
+    def warm_up(self):
+        # Blocking: import the model modules (which registers their models),
+        # then load and warm each one. Failures are recorded per model.
+        for module in MODEL_MODULES:
+            try:
+                importlib.import_module(module)
+            except Exception as e:
+                print(f"Model module {module} failed to import:", e)
+                self.state = "failed"
+                return
+        failed = False
+        for entry in list(self._entries.values()):
+            try:
+                self.get(entry.name)
+                with entry.lock:
+                    if not entry.warm:
+                        self._warm(entry)
+            except Exception as e:
+                failed = True
+                print(f"Model {entry.name} failed to warm up:", e)
+        self.state = "failed" if failed else "ready"
+
+    def start_warmup(self):
+        if self._task is None or self._task.done():
+            self.state = "warming"
+            self._task = asyncio.create_task(asyncio.to_thread(self.warm_up))
+
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "models": {
+                e.name: {
+                    "loaded": e.loaded,
+                    "warm": e.warm,
+                    "load_ms": round(e.load_ms, 1),
+                    "warmup_ms": round(e.warmup_ms, 1),
+                    "loads": e.loads,
+                    "error": e.error,
+                }
+                for e in self._entries.values()
+            },
+        }
+
+
+registry = ModelRegistry()
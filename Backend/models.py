@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, JSON, Boolean, BigInteger
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Date, Text, JSON, Boolean, BigInteger, Index
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from db import Base
@@ -18,7 +19,7 @@ class Website(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
     url = Column(String)
-    user_id = Column(Integer, ForeignKey('users.id'))
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
     owner = relationship("User", back_populates="websites")
     defacement_enabled = Column(Boolean, default=False)
     sqli_enabled = Column(Boolean, default=False)
@@ -31,55 +32,99 @@ class Website(Base):
 
 class SQLLog(Base):
     __tablename__ = 'sql_logs'
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     website_id = Column(Integer, ForeignKey('websites.id'))
     query = Column(Text)
     prediction = Column(String)
     score = Column(Float)
-    created_at = Column(DateTime, default=datetime.now)
+    created_at = Column(DateTime, default=datetime.now, primary_key=True)
     
     website = relationship("Website", back_populates="sql_logs")
     
     
 class DefacementLog(Base):
     __tablename__ = 'defacement_logs'
+    __table_args__ = {"postgresql_partition_by": "RANGE (timestamp)"}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     website_id = Column(Integer, ForeignKey('websites.id'))
     prediction = Column(String)
-    timestamp = Column(DateTime, default=datetime.now)
+    timestamp = Column(DateTime, default=datetime.now, primary_key=True)
 
     website = relationship("Website", back_populates="defacement_logs")
     
 class DomManipulationLog(Base):
     __tablename__ = "dom_logs"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     website_id = Column(Integer, ForeignKey('websites.id'))
     ip_address = Column(String)
-    created_at = Column(DateTime, default=datetime.now)
+    created_at = Column(DateTime, default=datetime.now, primary_key=True)
     
     website = relationship("Website", back_populates="dom_logs")
 
 
 class XSSLog(Base):
     __tablename__ = "XSS_logs"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     website_id = Column(Integer, ForeignKey('websites.id'))
     ip_address = Column(String)
-    created_at = Column(DateTime, default=datetime.now)
+    created_at = Column(DateTime, default=datetime.now, primary_key=True)
     
     website = relationship("Website", back_populates="XSS_logs")
     
 class UptimeCheck(Base):
     __tablename__ = "uptime_checks"
+    __table_args__ = {"postgresql_partition_by": "RANGE (checked_at)"}
 
-    id = Column(BigInteger, primary_key=True, index=True)
+    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
     website_id = Column(Integer, ForeignKey("websites.id", ondelete="CASCADE"), index=True, nullable=False)
     status_up = Column(Boolean, nullable=False)
     status_code = Column(Integer, nullable=True)
     response_ms = Column(Integer, nullable=True)
     error = Column(Text, nullable=True)
-    checked_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
\ No newline at end of file
+    checked_at = Column(DateTime(timezone=True), server_default=func.now(), primary_key=True)
+
+
+class ThreatCounter(Base):
+    __tablename__ = "threat_counters"
+
+    website_id = Column(Integer, ForeignKey("websites.id", ondelete="CASCADE"), primary_key=True)
+    type = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+
+class UptimeRollup(Base):
+    # hourly aggregate of uptime_checks; see uptime_rollups.py
+    __tablename__ = "uptime_rollups"
+
+    website_id = Column(Integer, ForeignKey("websites.id", ondelete="CASCADE"), primary_key=True)
+    hour = Column(DateTime(timezone=True), primary_key=True)
+    checks = Column(Integer, nullable=False, default=0)
+    up_checks = Column(Integer, nullable=False, default=0)
+    latency_checks = Column(Integer, nullable=False, default=0)
+    sum_ms = Column(BigInteger, nullable=False, default=0)
+    min_ms = Column(Integer, nullable=True)
+    max_ms = Column(Integer, nullable=True)
+    latency_hist = Column(ARRAY(Integer), nullable=False)
+
+
+# Log tables are range-partitioned by day (migration 0005, partitions.py), so
+# their primary keys include the partition column.
+# Time-series indexes; keep in sync with migrations/versions/0002_log_time_indexes.py
+Index("ix_sql_logs_website_created", SQLLog.website_id, SQLLog.created_at.desc(), SQLLog.id.desc())
+Index("ix_sql_logs_website_created_malicious", SQLLog.website_id, SQLLog.created_at.desc(),
+      postgresql_where=SQLLog.prediction == "malicious")
+Index("ix_dom_logs_website_created", DomManipulationLog.website_id, DomManipulationLog.created_at.desc(), DomManipulationLog.id.desc())
+Index("ix_XSS_logs_website_created", XSSLog.website_id, XSSLog.created_at.desc(), XSSLog.id.desc())
+Index("ix_defacement_logs_website_timestamp", DefacementLog.website_id, DefacementLog.timestamp.desc(), DefacementLog.id.desc())
+Index("ix_defacement_logs_website_timestamp_defaced", DefacementLog.website_id, DefacementLog.timestamp.desc(),
+      postgresql_where=DefacementLog.prediction == "defaced")
+Index("ix_defacement_logs_timestamp", DefacementLog.timestamp)
+Index("ix_uptime_checks_website_checked", UptimeCheck.website_id, UptimeCheck.checked_at.desc())
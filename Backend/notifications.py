@@ -1,7 +1,13 @@
 # notifications.py
+import queue
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.utils import formataddr
+from html import escape
+
+import config
 
 SMTP_HOST = "smtp.gmail.com"
 SMTP_PORT = 465
@@ -10,11 +16,22 @@ SMTP_PASSWORD = "jyothetwszhllruy"
 FROM_EMAIL = "alerts@webshieldai.com"
 FROM_NAME = "Web Shield AI"
 
-def send_email_now(to_email: str, subject: str, html: str) -> None:
+ALERT_SUBJECTS = {
+    "sql_injection": "[Web Shield AI] SQL injection attempt on {name}",
+    "xss": "[WebShield AI] XSS attempt on {name}",
+    "dom": "[WebShield AI] DOM tampering on {name}",
+    "defacement": "[Web Shield AI] DEFACEMENT detected on {name}",
+}
+
+def _build_message(to_email: str, subject: str, html: str) -> MIMEText:
     msg = MIMEText(html, "html")
     msg["Subject"] = subject
     msg["From"] = formataddr((FROM_NAME, FROM_EMAIL))
     msg["To"] = to_email
+    return msg
+
+def send_email_now(to_email: str, subject: str, html: str) -> None:
+    msg = _build_message(to_email, subject, html)
     with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=8) as s:
         s.login(SMTP_USERNAME, SMTP_PASSWORD)
         s.sendmail(FROM_EMAIL, [to_email], msg.as_string())
@@ -37,3 +54,248 @@ def build_threat_email_html(
       {ip}{qry}{pred}{scr}
       <p>Please review in your dashboard.</p>
     """
+
+def build_digest_email_html(
+    *, website_name: str, website_url: str, log_type: str, events: list[dict],
+    max_rows: int = 20,
+) -> str:
+    rows = "".join(
+        "<tr>"
+        f"<td>{e.get('occurred_at')}</td>"
+        f"<td>{escape(str(e.get('ip_address') or ''))}</td>"
+        f"<td>{escape(str(e.get('query') or ''))}</td>"
+        f"<td>{escape(str(e.get('prediction') or ''))}</td>"
+        "</tr>"
+        for e in events[:max_rows]
+    )
+    more = f"<p>…and {len(events) - max_rows} more.</p>" if len(events) > max_rows else ""
+    return f"""
+      <h2>{len(events)} threats detected on {website_name}</h2>
+      <p><b>Type:</b> {log_type}</p>
+      <p><b>Between:</b> {events[0].get('occurred_at')} and {events[-1].get('occurred_at')}</p>
+      <p><b>Site:</b> <a href="{website_url}">{website_url}</a></p>
+      <table border="1" cellpadding="4" cellspacing="0">
+        <tr><th>When</th><th>IP</th><th>Query</th><th>Prediction</th></tr>
+        {rows}
+      </table>
+      {more}
+      <p>Please review in your dashboard.</p>
+    """
+
+
+class SMTPPool:
+    # One persistent, lazily (re)connected SMTP session. Only the dispatcher
+    # thread uses it, so no locking is needed.
+
+    def __init__(self, host=None, port=None, username=None, password=None,
+                 use_ssl=None, timeout=8.0, idle_timeout=None):
+        self.host = host or config.SMTP_HOST
+        self.port = port or config.SMTP_PORT
+        self.username = config.SMTP_USERNAME if username is None else username
+        self.password = config.SMTP_PASSWORD if password is None else password
+        self.use_ssl = config.SMTP_USE_SSL if use_ssl is None else use_ssl
+        self.timeout = timeout
+        self.idle_timeout = config.ALERT_SMTP_IDLE_SEC if idle_timeout is None else idle_timeout
+        self._conn: smtplib.SMTP | None = None
+        self._last_used = 0.0
+        self.connects = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.username:
+            conn.login(self.username, self.password)
+        self.connects += 1
+        return conn
+
+    def send(self, to_email: str, subject: str, html: str):
+        msg = _build_message(to_email, subject, html).as_string()
+        for attempt in (1, 2):
+            if self._conn is None:
+                self._conn = self._connect()
+            try:
+                self._conn.sendmail(FROM_EMAIL, [to_email], msg)
+                self._last_used = time.monotonic()
+                return
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPSenderRefused, OSError):
+                # server dropped the idle session; reconnect once and retry
+                self.close()
+                if attempt == 2:
+                    raise
+
+    def close_if_idle(self):
+        if self._conn is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+
+    def close(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.quit()
+        except Exception:
+            pass
+        self._conn = None
+
+
+class AlertDispatcher:
+    # Queue of threat alerts drained by one background thread.
+    #
+    # The first alert for a (website, type) pair is mailed right away and
+    # opens a coalescing window; anything else for that pair arriving inside
+    # the window is sent as a single digest when the window closes.
+
+    def __init__(self, window_sec: float | None = None, max_queue: int | None = None, pool: SMTPPool | None = None):
+        self.window = config.ALERT_COALESCE_WINDOW_SEC if window_sec is None else window_sec
+        self._queue: queue.Queue = queue.Queue(maxsize=config.ALERT_QUEUE_SIZE if max_queue is None else max_queue)
+        self.pool = pool or SMTPPool()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        # (website_id, log_type) -> {"deadline", "alert", "events"}
+        self._windows: dict[tuple, dict] = {}
+        self.enqueued = 0
+        self.dropped = 0
+        self.sent = 0
+        self.digests = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def enqueue(
+        self, *, to_email: str | None, website_id: int, website_name: str,
+        website_url: str, log_type: str, occurred_at=None, **details,
+    ) -> bool:
+        if not to_email:
+            return False
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        alert = {
+            "to": to_email,
+            "website_id": website_id,
+            "website_name": website_name,
+            "website_url": website_url,
+            "log_type": log_type,
+            "event": {"occurred_at": occurred_at, **details},
+        }
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "open_windows": len(self._windows),
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "sent": self.sent,
+            "digests": self.digests,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "smtp_connects": self.pool.connects,
+        }
+
+    def _send(self, to_email: str, subject: str, html: str):
+        try:
+            self.pool.send(to_email, subject, html)
+            self.sent += 1
+        except Exception as e:
+            self.errors += 1
+            print("Email send error:", e)
+
+    def _send_single(self, alert: dict):
+        ev = alert["event"]
+        subject = ALERT_SUBJECTS.get(alert["log_type"], "[Web Shield AI] Threat on {name}").format(name=alert["website_name"])
+        html = build_threat_email_html(
+            website_name=alert["website_name"], website_url=alert["website_url"],
+            log_type=alert["log_type"], occurred_at=ev.get("occurred_at"),
+            ip_address=ev.get("ip_address"), query=ev.get("query"),
+            prediction=ev.get("prediction"), score=ev.get("score"),
+        )
+        self._send(alert["to"], subject, html)
+
+    def _send_digest(self, window: dict):
+        alert, events = window["alert"], window["events"]
+        subject = ALERT_SUBJECTS.get(alert["log_type"], "[Web Shield AI] Threat on {name}").format(name=alert["website_name"])
+        html = build_digest_email_html(
+            website_name=alert["website_name"], website_url=alert["website_url"],
+            log_type=alert["log_type"], events=events,
+        )
+        self.digests += 1
+        self._send(alert["to"], f"{subject} ({len(events)} events)", html)
+
+    def _handle(self, alert: dict, now: float):
+        key = (alert["website_id"], alert["log_type"])
+        window = self._windows.get(key)
+        if window is None:
+            self._send_single(alert)
+            if self.window > 0:
+                self._windows[key] = {"deadline": now + self.window, "alert": alert, "events": []}
+            return
+        window["alert"] = alert
+        window["events"].append(alert["event"])
+        self.coalesced += 1
+
+    def _flush_due(self, now: float, force: bool = False):
+        for key, window in list(self._windows.items()):
+            if not force and window["deadline"] > now:
+                continue
+            if window["events"]:
+                self._send_digest(window)
+                if not force:
+                    # keep coalescing while the burst continues
+                    window["events"] = []
+                    window["deadline"] = now + self.window
+                    continue
+            del self._windows[key]
+
+    def _run(self):
+        while True:
+            now = time.monotonic()
+            next_deadline = min((w["deadline"] for w in self._windows.values()), default=None)
+            timeout = 1.0 if next_deadline is None else max(0.0, min(1.0, next_deadline - now))
+            try:
+                alert = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                alert = False
+
+            now = time.monotonic()
+            if alert is None:
+                # drain on shutdown: send whatever is still queued or pending
+                while True:
+                    try:
+                        pending = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if pending is not None:
+                        self._handle(pending, now)
+                self._flush_due(now, force=True)
+                self.pool.close()
+                return
+            if alert:
+                self._handle(alert, now)
+            self._flush_due(now)
+            self.pool.close_if_idle()
+
+
+alert_dispatcher = AlertDispatcher()
+
+def dispatch_alert(**kwargs) -> bool:
+    return alert_dispatcher.enqueue(**kwargs)
@@ -0,0 +1,256 @@
+# partitions.py
+# Keeps the daily log partitions ahead of time and drops expired ones.
+#
+#   python partitions.py            # one maintenance pass
+#   python partitions.py --dry-run  # print what it would do
+#
+# Retention is per plan (config.LOG_PLAN_RETENTION_DAYS). Partitions hold
+# every site's rows for one day, so a partition is dropped once it is older
+# than the longest retention of any plan in use; rows of sites on shorter
+# plans are deleted from the cold partitions in between (never from the
+# partitions being written to). A cold partition no longer receives rows, so
+# each plan's purge runs on it once and is recorded in the partition's
+# comment; sites that move to a shorter plan later keep their older rows
+# until the partition is dropped.
+#
+# Each table also has a DEFAULT partition (migration 0006) that catches rows
+# for days not created yet, so a maintenance outage does not fail inserts;
+# the next pass moves those rows into their daily partitions. Failures and
+# rows left in DEFAULT are reported by /readyz and /metrics.
+import argparse
+import asyncio
+import json
+import re
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+import config
+from db import engine
+
+# table -> (partition column, timestamptz?, retention cap in days or None,
+#           retention follows the owner's plan?)
+PARTITIONED_TABLES = {
+    "sql_logs": ("created_at", False, None, True),
+    "dom_logs": ("created_at", False, None, True),
+    "XSS_logs": ("created_at", False, None, True),
+    "defacement_logs": ("timestamp", False, config.DEFACEMENT_RETENTION_DAYS, True),
+    "uptime_checks": ("checked_at", True, config.UPTIME_RAW_RETENTION_DAYS, False),
+}
+MAINTENANCE_LOCK_KEY = 0x5EB5_1E1E
+
+_DAILY = re.compile(r"_p(\d{8})$")
+_ARCHIVE = re.compile(r"_p_until_(\d{8})$")
+
+last_run: dict = {}
+
+
+def health() -> dict:
+    # for /readyz: whether maintenance keeps the daily partitions coming
+    return {
+        "failures": last_run.get("failures", 0),
+        "error": last_run.get("error"),
+        "default_rows": last_run.get("default_rows", {}),
+        "last_run": last_run.get("at"),
+    }
+
+
+def retention_for(plan: str | None) -> int:
+    return config.LOG_PLAN_RETENTION_DAYS.get(plan or "", config.LOG_RETENTION_DAYS)
+
+
+def _today(tz: bool) -> date:
+    return datetime.now(timezone.utc).date() if tz else date.today()
+
+
+def _bound(day: date, tz: bool) -> str:
+    return f"'{day.isoformat()} 00:00:00+00'" if tz else f"'{day.isoformat()}'"
+
+
+def _partitions(conn, table: str) -> list[tuple[str, date]]:
+    # (partition name, exclusive upper bound day)
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:t AS regclass)"
+    ), {"t": f'"{table}"'}).scalars().all()
+    out = []
+    for name in names:
+        m = _ARCHIVE.search(name)
+        if m:
+            out.append((name, datetime.strptime(m.group(1), "%Y%m%d").date()))
+            continue
+        m = _DAILY.search(name)
+        if m:
+            out.append((name, datetime.strptime(m.group(1), "%Y%m%d").date() + timedelta(days=1)))
+    return sorted(out, key=lambda p: p[1])
+
+
+def _purged_plans(conn, table: str) -> dict[str, set[str]]:
+    # partition name -> plans whose rows were already purged from it
+    rows = conn.execute(text(
+        "SELECT c.relname, obj_description(c.oid, 'pg_class') FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = CAST(:t AS regclass)"
+    ), {"t": f'"{table}"'}).all()
+    out = {}
+    for name, comment in rows:
+        try:
+            out[name] = set(json.loads(comment or "{}").get("purged", []))
+        except (ValueError, AttributeError):
+            out[name] = set()
+    return out
+
+
+def _plans_in_use(conn) -> dict[str, int]:
+    plans = conn.execute(text("SELECT DISTINCT coalesce(plan, '') FROM users")).scalars().all()
+    return {plan: retention_for(plan) for plan in plans}
+
+
+def maintain(dry_run: bool = False) -> dict:
+    result = {"created": [], "dropped": [], "purged_rows": 0, "counter_rows": 0, "moved_rows": 0, "default_rows": {}}
+
+    def run(conn, sql, params=None):
+        if dry_run:
+            print(sql, params or "")
+            return None
+        return conn.execute(text(sql), params or {})
+
+    with engine.connect() as conn:
+        # several API workers run this loop; one pass at a time is enough
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": MAINTENANCE_LOCK_KEY}).scalar():
+            result["skipped"] = True
+            return result
+        try:
+            # DDL on a busy parent must not queue up behind (and block) ingestion
+            conn.execute(text("SET lock_timeout = '5s'"))
+            plans = _plans_in_use(conn)
+            longest = max(plans.values(), default=config.LOG_RETENTION_DAYS)
+
+            for table, (col, tz, cap, per_plan) in PARTITIONED_TABLES.items():
+                today = _today(tz)
+                horizon = min(longest, cap) if cap is not None else longest
+                if not per_plan:
+                    horizon = cap if cap is not None else config.LOG_RETENTION_DAYS
+
+                existing = _partitions(conn, table)
+                have = {name for name, _ in existing}
+                default = f"{table}_p_default"
+                has_default = conn.execute(
+                    text("SELECT to_regclass(:t) IS NOT NULL"), {"t": f'"{default}"'}
+                ).scalar()
+                days = {today + timedelta(days=i) for i in range(config.LOG_PARTITION_PREMAKE_DAYS + 1)}
+                if has_default:
+                    # also the days that were missing while maintenance was not running
+                    day_expr = f"""("{col}" AT TIME ZONE 'UTC')::date""" if tz else f'"{col}"::date'
+                    days.update(conn.execute(text(f'SELECT DISTINCT {day_expr} FROM "{default}"')).scalars())
+                for day in sorted(days):
+                    name = f"{table}_p{day:%Y%m%d}"
+                    if name in have:
+                        continue
+                    bounds = f"FROM ({_bound(day, tz)}) TO ({_bound(day + timedelta(days=1), tz)})"
+                    in_range = f'"{col}" >= {_bound(day, tz)} AND "{col}" < {_bound(day + timedelta(days=1), tz)}'
+                    stranded = has_default and conn.execute(
+                        text(f'SELECT EXISTS (SELECT 1 FROM "{default}" WHERE {in_range})')
+                    ).scalar()
+                    if stranded:
+                        # rows written while this day was missing sit in the DEFAULT
+                        # partition, which blocks a plain PARTITION OF: move them over
+                        run(conn, f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS)')
+                        res = run(conn, (
+                            f'WITH moved AS (DELETE FROM "{default}" WHERE {in_range} RETURNING *) '
+                            f'INSERT INTO "{name}" SELECT * FROM moved'
+                        ))
+                        run(conn, f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" FOR VALUES {bounds}')
+                        result["moved_rows"] += res.rowcount if res is not None else 0
+                    else:
+                        run(conn, f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" FOR VALUES {bounds}')
+                    result["created"].append(name)
+
+                if has_default:
+                    # non-zero means partitions were missing when rows arrived
+                    left = conn.execute(text(f'SELECT count(*) FROM "{default}"')).scalar()
+                    if left:
+                        result["default_rows"][table] = left
+
+                # keep whole days: a partition goes once its newest possible row is expired
+                cutoff = today - timedelta(days=horizon)
+                for name, upper in existing:
+                    if upper <= cutoff:
+                        run(conn, f'DROP TABLE IF EXISTS "{name}"')
+                        result["dropped"].append(name)
+
+                if per_plan:
+                    kept = [(name, upper) for name, upper in existing if upper > cutoff and upper <= today]
+                    purged = _purged_plans(conn, table) if kept else {}
+                    for name, upper in kept:
+                        due = [
+                            plan for plan, days in plans.items()
+                            if upper <= today - timedelta(days=min(days, horizon))
+                            and plan not in purged.get(name, ())
+                        ]
+                        if not due:
+                            continue
+                        res = run(conn, (
+                            f'DELETE FROM "{name}" WHERE website_id IN ('
+                            "SELECT w.id FROM websites w JOIN users u ON u.id = w.user_id "
+                            "WHERE coalesce(u.plan, '') = ANY(:plans))"
+                        ), {"plans": due})
+                        result["purged_rows"] += res.rowcount if res is not None else 0
+                        done = sorted(purged.get(name, set()) | set(due))
+                        # COMMENT ON takes no bind parameters; plan names are quoted as literals
+                        comment = json.dumps({"purged": done}).replace("'", "''")
+                        run(conn, f"COMMENT ON TABLE \"{name}\" IS '{comment}'")
+                if not dry_run:
+                    conn.commit()
+
+            # counters follow the attack logs they count
+            today = date.today()
+            for plan, days in plans.items():
+                res = run(conn, (
+                    "DELETE FROM threat_counters tc USING websites w JOIN users u ON u.id = w.user_id "
+                    "WHERE tc.website_id = w.id AND coalesce(u.plan, '') = :plan AND tc.day < :cutoff"
+                ), {"plan": plan, "cutoff": today - timedelta(days=days)})
+                result["counter_rows"] += res.rowcount if res is not None else 0
+            if not dry_run:
+                conn.commit()
+        finally:
+            conn.rollback()
+            conn.execute(text("RESET lock_timeout"))
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": MAINTENANCE_LOCK_KEY})
+            conn.commit()
+    return result
+
+
+async def maintenance_loop(interval_sec: float):
+    while True:
+        t0 = time.perf_counter()
+        try:
+            result = await asyncio.to_thread(maintain)
+            last_run.update(result, at=datetime.utcnow().isoformat(), ms=round((time.perf_counter() - t0) * 1000, 1),
+                            error=None, failures=0)
+            if result["dropped"] or result["purged_rows"]:
+                print(f"Log retention: dropped {len(result['dropped'])} partitions, purged {result['purged_rows']} rows")
+            if result["default_rows"]:
+                print("Log rows in DEFAULT partitions (missing daily partitions):", result["default_rows"])
+        except Exception as e:
+            # consecutive failures; after LOG_PARTITION_PREMAKE_DAYS days of them
+            # new rows only land in the DEFAULT partitions
+            last_run.update(error=str(e), failed_at=datetime.utcnow().isoformat(),
+                            failures=last_run.get("failures", 0) + 1)
+            print("Log partition maintenance error:", e)
+        await asyncio.sleep(interval_sec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="create upcoming log partitions and apply retention")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    result = maintain(dry_run=args.dry_run)
+    print(f"created={len(result['created'])} dropped={len(result['dropped'])} "
+          f"purged_rows={result['purged_rows']} counter_rows={result['counter_rows']} "
+          f"moved_rows={result['moved_rows']} default_rows={result['default_rows']}"
+          + (" (skipped: another worker holds the lock)" if result.get("skipped") else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+import config
+
+# min == max == default: a stored hash with any other cost is flagged by
+# needs_update()/verify_and_update() and rewritten on the next good login,
+# so changing BCRYPT_ROUNDS migrates users up (or down) as they sign in.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=config.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=config.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=config.BCRYPT_ROUNDS,
+)
+
+
+class HasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    # Runs bcrypt on a small dedicated pool (the bcrypt C code releases the
+    # GIL, so threads run in parallel) and keeps it off the event loop.
+    # At most max_pending hash/verify calls may be queued or running; beyond
+    # that callers get HasherBusy immediately instead of waiting seconds
+    # behind a credential-stuffing burst.
+
+    def __init__(self, workers: int = 2, max_pending: int = 16):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self.completed = 0
+        self.shed = 0
+        self.rehashed = 0
+        self.busy_ms = 0.0
+
+    def _timed(self, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.busy_ms += (time.perf_counter() - t0) * 1000
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            self.shed += 1
+            raise HasherBusy()
+        self._pending += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._pool, self._timed, fn, *args)
+        finally:
+            self._pending -= 1
+        self.completed += 1
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str | None) -> tuple[bool, str | None]:
+        # (valid, new hash if the stored one uses outdated parameters)
+        if not hashed:
+            return False, None
+        valid, new_hash = await self._run(pwd_context.verify_and_update, password, hashed)
+        if valid and new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "rounds": config.BCRYPT_ROUNDS,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "shed": self.shed,
+            "rehashed": self.rehashed,
+            "avg_ms": round(self.busy_ms / self.completed, 1) if self.completed else 0.0,
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=config.BCRYPT_WORKERS,
+    max_pending=config.BCRYPT_MAX_PENDING,
+)
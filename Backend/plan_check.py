@@ -0,0 +1,134 @@
+# plan_check.py
+# Query-plan regression check for the dashboard log queries.
+#
+#   DATABASE_URL=postgresql://.../scratch python plan_check.py --rows 1000000 --yes
+#
+# Migrates the (scratch!) database, seeds --rows rows per log table spread
+# over --sites websites, then EXPLAINs the attack-log and count queries and
+# exits non-zero if any of them sequentially scans a log table.
+import argparse
+import json
+import sys
+
+from sqlalchemy import func, select, text
+
+import models
+from attack_events import attack_events_query
+from db import create_table, engine
+
+LOG_TABLES = {"sql_logs", "dom_logs", "XSS_logs", "defacement_logs", "uptime_checks", "threat_counters"}
+
+
+def seed(rows: int, sites: int):
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO users (email, name, plan, hashed_password)
+            SELECT 'plancheck' || g || '@example.com', 'plancheck', 'free', 'x'
+            FROM generate_series(1, :sites) g
+            ON CONFLICT (email) DO NOTHING
+        """), {"sites": sites})
+        conn.execute(text("""
+            INSERT INTO websites (name, url, user_id, sqli_enabled, xss_enabled, dom_enabled, defacement_enabled)
+            SELECT 'plancheck ' || u.id, 'https://plancheck' || u.id || '.example.com', u.id, true, true, true, false
+            FROM users u WHERE u.email LIKE 'plancheck%@example.com'
+        """))
+        site_ids = [r[0] for r in conn.execute(text(
+            "SELECT w.id FROM websites w JOIN users u ON u.id = w.user_id WHERE u.email LIKE 'plancheck%@example.com'"
+        ))]
+        params = {"rows": rows, "ids": site_ids}
+        pick = "(:ids)[1 + (g % cardinality(CAST(:ids AS int[])))]"
+        spread = "now() - (g * interval '1 second')"
+        conn.execute(text(f"""
+            INSERT INTO sql_logs (website_id, query, prediction, score, created_at)
+            SELECT {pick}, 'q' || g, CASE WHEN g % 50 = 0 THEN 'malicious' ELSE 'normal' END, random(), {spread}
+            FROM generate_series(1, :rows) g
+        """), params)
+        for table in ("dom_logs", "XSS_logs"):
+            conn.execute(text(f"""
+                INSERT INTO "{table}" (website_id, ip_address, created_at)
+                SELECT {pick}, '10.0.0.' || (g % 255), {spread}
+                FROM generate_series(1, :rows) g
+            """), params)
+        conn.execute(text(f"""
+            INSERT INTO defacement_logs (website_id, prediction, timestamp)
+            SELECT {pick}, CASE WHEN g % 100 = 0 THEN 'defaced' ELSE 'clean' END, {spread}
+            FROM generate_series(1, :rows) g
+        """), params)
+    from counters import rebuild
+    from db import SessionLocal
+    db = SessionLocal()
+    try:
+        rebuild(db)
+    finally:
+        db.close()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE"))
+    return site_ids
+
+
+def _seq_scans(plan: dict) -> list[str]:
+    found = []
+    # log tables are partitioned; scans show up against "<table>_p<day>"
+    relation = plan.get("Relation Name") or ""
+    if plan.get("Node Type") == "Seq Scan" and relation.split("_p")[0] in LOG_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def explain(conn, stmt) -> dict:
+    sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+    return conn.execute(text("EXPLAIN (FORMAT JSON) " + sql)).scalar()[0]["Plan"]
+
+
+def queries(website_id: int, user_id: int) -> dict:
+    counter = models.ThreatCounter
+    return {
+        "attack-logs": attack_events_query([website_id], limit=500),
+        "blocked-count": (
+            select(counter.type, func.sum(counter.count))
+            .where(counter.website_id == website_id)
+            .group_by(counter.type)
+        ),
+        "total-count": (
+            select(func.sum(counter.count))
+            .join(models.Website, models.Website.id == counter.website_id)
+            .where(models.Website.user_id == user_id)
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--sites", type=int, default=100)
+    parser.add_argument("--no-seed", action="store_true", help="reuse previously seeded data")
+    parser.add_argument("--yes", action="store_true", help="confirm DATABASE_URL is a scratch database")
+    args = parser.parse_args()
+    if not args.yes:
+        sys.exit("refusing to seed without --yes (point DATABASE_URL at a scratch database)")
+
+    create_table()
+    if not args.no_seed:
+        seed(args.rows, args.sites)
+
+    failed = False
+    with engine.connect() as conn:
+        website_id, user_id = conn.execute(text(
+            "SELECT w.id, w.user_id FROM websites w JOIN users u ON u.id = w.user_id "
+            "WHERE u.email LIKE 'plancheck%@example.com' ORDER BY w.id LIMIT 1"
+        )).one()
+        for name, stmt in queries(website_id, user_id).items():
+            plan = explain(conn, stmt)
+            scans = _seq_scans(plan)
+            status = "FAIL" if scans else "ok"
+            failed |= bool(scans)
+            print(f"{status:4s} {name:22s} cost={plan['Total Cost']:.0f}" + (f" seq scan on {', '.join(scans)}" if scans else ""))
+            if scans:
+                print(json.dumps(plan, indent=1))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
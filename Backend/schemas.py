@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, Union
+from typing import List, Literal, Optional, Union
 from datetime import datetime
 
 class UserLogin(BaseModel):
@@ -51,6 +51,20 @@ class SQLPrediction(BaseModel):
     confidence: float
     
 
+class BatchEvent(BaseModel):
+    type: Literal["sqli", "xss", "dom"]
+    query: Optional[str] = None    # sqli: input value to score
+    vector: Optional[str] = None   # xss: "input" or "url"
+    payload: Optional[str] = None  # xss
+    kind: Optional[str] = None     # dom: "added-suspicious" / "removed-nonallowed"
+    tag: Optional[str] = None      # dom
+    snippet: Optional[str] = None  # dom
+
+class EventBatch(BaseModel):
+    website_id: int
+    page_url: Optional[str] = None
+    events: List[BatchEvent]
+
 class DomLogCreate(BaseModel):
     website_id: int
     
@@ -1,17 +1,24 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import SQLLog, DomManipulationLog, User, Website
 from schemas import SQLQuery
-from ml_model import predict_query, predict_dom_mutation
+from ml_model import predict_dom_mutation
+from inference import predict_sqli
 import models,schemas
-from passlib.context import CryptContext
+import counters
+from datetime import datetime
+from sqlalchemy import select
+from passwords import pwd_context, password_hasher
 from fastapi import Depends, Request
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
-def create_user(user: schemas.UserCreate, db: Session):
-    hashed_pw = get_password_hash(user.password)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+async def create_user(user: schemas.UserCreate, db: AsyncSession):
+    hashed_pw = await password_hasher.hash(user.password)
     new_user = models.User(
         email=user.email,
         name=user.name,
@@ -19,19 +26,21 @@ def create_user(user: schemas.UserCreate, db: Session):
         plan=user.plan
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-def authenticate_user(email: str, password: str, db: Session):
-    user = db.query(models.User).filter(models.User.email == email).first()
+async def authenticate_user(email: str, password: str, db: AsyncSession):
+    user = await db.scalar(select(models.User).where(models.User.email == email))
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 def create_website(website: schemas.WebsiteCreate, db: Session):
@@ -41,21 +50,22 @@ def create_website(website: schemas.WebsiteCreate, db: Session):
     db.refresh(new_website)
     return new_website
 
-def process_sql_query(input: SQLQuery, db: Session):
+async def process_sql_query(input: SQLQuery, db: AsyncSession):
     if input.query is None or input.query.strip() == "":
         return {"prediction": 0, "confidence": 0}
-    label, score = predict_query(input.query)
+    label, score = await predict_sqli(input.query)
 
     log = SQLLog(
         website_id=input.website_id,
         query=input.query,
         prediction=label,
-        score=score
+        score=score,
+        created_at=datetime.now(),
     )
 
     db.add(log)
-    db.commit()
-    db.refresh(log)
+    await db.run_sync(counters.bump, counters.increments_for_rows(SQLLog, [{"website_id": log.website_id, "created_at": log.created_at}]))
+    await db.commit()
 
     return {"prediction": label, "confidence": score}
 
@@ -69,9 +79,11 @@ def log_dom_event(
 
     new_log = DomManipulationLog(
         website_id=log.website_id,
-        ip_address=client_ip
+        ip_address=client_ip,
+        created_at=datetime.now(),
     )
     db.add(new_log)
+    counters.bump(db, counters.increments_for_rows(DomManipulationLog, [{"website_id": new_log.website_id, "created_at": new_log.created_at}]))
     db.commit()
     db.refresh(new_log)
     return {"message": "Logged", "log_id": new_log.id}
\ No newline at end of file
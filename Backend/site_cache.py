@@ -0,0 +1,96 @@
+from typing import NamedTuple
+from urllib.parse import urlparse
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import config
+import models
+from cache import TTLCache
+
+
+class SiteInfo(NamedTuple):
+    id: int
+    name: str
+    url: str
+    host: str | None
+    user_id: int
+    owner_email: str | None
+    sqli_enabled: bool
+    xss_enabled: bool
+    dom_enabled: bool
+    defacement_enabled: bool
+
+
+_NOT_FOUND = object()
+
+site_cache = TTLCache(
+    maxsize=config.SITE_CACHE_SIZE,
+    ttl=config.SITE_CACHE_TTL_SEC,
+    name="websites",
+)
+
+
+def _site_query(website_id: int):
+    return (
+        select(models.Website, models.User.email)
+        .outerjoin(models.User, models.User.id == models.Website.user_id)
+        .where(models.Website.id == website_id)
+    )
+
+
+def _site_info(row) -> SiteInfo | None:
+    if row is None:
+        return None
+    site, owner_email = row
+    return SiteInfo(
+        id=site.id,
+        name=site.name,
+        url=site.url,
+        host=urlparse(site.url or "").hostname,
+        user_id=site.user_id,
+        owner_email=owner_email,
+        sqli_enabled=bool(site.sqli_enabled),
+        xss_enabled=bool(site.xss_enabled),
+        dom_enabled=bool(site.dom_enabled),
+        defacement_enabled=bool(site.defacement_enabled),
+    )
+
+
+def _site_id(website_id) -> int:
+    try:
+        return int(website_id or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _remember(website_id: int, info: SiteInfo | None) -> SiteInfo | None:
+    # unknown ids are cached briefly so a bogus wid cannot hammer the DB
+    site_cache.set(website_id, info, ttl=None if info else config.SITE_CACHE_MISS_TTL_SEC)
+    return info
+
+
+def get_site(db: Session, website_id: int | None) -> SiteInfo | None:
+    # Agent endpoints call this on every hit; only a miss touches the DB.
+    website_id = _site_id(website_id)
+    if not website_id:
+        return None
+    cached = site_cache.get(website_id, _NOT_FOUND)
+    if cached is not _NOT_FOUND:
+        return cached
+    return _remember(website_id, _site_info(db.execute(_site_query(website_id)).first()))
+
+
+async def get_site_async(db: AsyncSession, website_id: int | None) -> SiteInfo | None:
+    website_id = _site_id(website_id)
+    if not website_id:
+        return None
+    cached = site_cache.get(website_id, _NOT_FOUND)
+    if cached is not _NOT_FOUND:
+        return cached
+    return _remember(website_id, _site_info((await db.execute(_site_query(website_id))).first()))
+
+
+def invalidate_site(website_id: int):
+    site_cache.delete(int(website_id))
@@ -0,0 +1,101 @@
+import re
+
+import config
+
+# Stage 1 of the SQLi cascade. Decides only one thing: "this input cannot
+# carry SQL syntax", in which case it is answered as normal without the
+# tokenizer or the model. Everything else goes to the model unchanged, so
+# the cascade can only differ from the model alone on inputs it screens
+# out (see eval_cascade.py for the recall check).
+#
+# An input is screened out when all of these hold:
+#   - it is at most SQLI_PREFILTER_MAX_LEN characters
+#   - its character-class fingerprint only uses SAFE_CLASSES: ASCII
+#     letters, digits, spaces and punctuation that has no role in SQL
+#     (no quotes, ; = ( ) < > | & * % / \ # or backtick)
+#   - it has no comment marker and no SQL keyword or function name as a
+#     word, which is what quote-less numeric injection (1 or 1, 1 union
+#     select ...) needs
+
+PREFILTER_RESULT = ("normal", 0.0)
+
+SAFE_CLASSES = frozenset("a0 .,@_-:?+")
+
+SQL_KEYWORDS = frozenset("""
+    select union insert into update delete drop truncate alter create replace
+    from where having group order by limit offset join or and not xor like
+    rlike regexp between in is null exists case when then else end as all
+    any some distinct values set table database schema declare exec execute
+    grant revoke shutdown sleep benchmark waitfor delay pg_sleep load_file
+    outfile dumpfile information_schema sysobjects syscolumns xp_cmdshell
+    sp_executesql char nchar varchar cast convert concat concat_ws substring
+    substr mid ascii ord hex unhex chr version user current_user system_user
+    session_user extractvalue updatexml floor rand count if ifnull
+    true false procedure handler dbms_pipe utl_inaddr utl_http
+""".split())
+
+_WORD = re.compile(r"[a-z_][a-z0-9_]*")
+
+
+def fingerprint(text: str) -> str:
+    # ASCII letters -> a, digits -> 0, whitespace -> space, any other
+    # character stands for itself; runs of the same class collapse.
+    out = []
+    prev = None
+    for ch in text:
+        if "a" <= ch <= "z" or "A" <= ch <= "Z":
+            c = "a"
+        elif "0" <= ch <= "9":
+            c = "0"
+        elif ch.isspace():
+            c = " "
+        else:
+            c = ch
+        if c != prev:
+            out.append(c)
+            prev = c
+    return "".join(out)
+
+
+class Prefilter:
+    def __init__(self, enabled: bool = True, max_len: int = 256):
+        self.enabled = enabled
+        self.max_len = max_len
+        self.checked = 0
+        self.screened = 0
+        self.escalated = 0
+
+    def reason(self, query: str | None) -> str | None:
+        # None if the input is clearly benign, else why it needs the model
+        text = query or ""
+        if len(text) > self.max_len:
+            return "length"
+        if not SAFE_CLASSES.issuperset(fingerprint(text)):
+            return "characters"
+        if "--" in text:
+            return "comment"
+        if any(w in SQL_KEYWORDS for w in _WORD.findall(text.lower())):
+            return "keyword"
+        return None
+
+    def is_benign(self, query: str | None) -> bool:
+        if not self.enabled:
+            return False
+        self.checked += 1
+        if self.reason(query) is None:
+            self.screened += 1
+            return True
+        self.escalated += 1
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "checked": self.checked,
+            "screened": self.screened,
+            "escalated": self.escalated,
+            "screened_ratio": round(self.screened / self.checked, 4) if self.checked else 0.0,
+        }
+
+
+prefilter = Prefilter(enabled=config.SQLI_PREFILTER, max_len=config.SQLI_PREFILTER_MAX_LEN)
@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+from types import MappingProxyType
+from typing import Iterable, Mapping, Sequence
+
+import numpy as np
+
+NUM_WORDS = 1000
+MAX_LENGTH = 30
+OOV_INDEX = 1
+VOCAB_PATH = os.getenv("SQLI_VOCAB_PATH", "ml/sqli_tokenizer.json")
+
+# Same defaults as keras.preprocessing.text.Tokenizer, so a vocabulary
+# exported from the training notebook produces identical ids here.
+FILTERS = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+_TRANSLATE = str.maketrans({c: " " for c in FILTERS})
+
+# Fallback vocabulary used when no exported word index ships next to the
+# model. Order is fixed so ids are stable across processes and restarts.
+DEFAULT_VOCAB = (
+    "select", "from", "where", "or", "and", "union", "all", "insert", "into",
+    "values", "update", "set", "delete", "drop", "table", "database", "create",
+    "alter", "exec", "execute", "declare", "cast", "convert", "char", "nchar",
+    "varchar", "concat", "substring", "ascii", "count", "group", "by", "order",
+    "having", "limit", "offset", "like", "null", "not", "is", "in", "exists",
+    "between", "case", "when", "then", "else", "end", "sleep", "benchmark",
+    "waitfor", "delay", "load_file", "outfile", "dumpfile", "information_schema",
+    "tables", "columns", "schema", "version", "user", "current_user", "system_user",
+    "admin", "root", "password", "passwd", "username", "login", "xp_cmdshell",
+    "sp_executesql", "shutdown", "truncate", "grant", "revoke", "if", "true",
+    "false", "0", "1", "2", "x", "a", "id", "name", "email", "pg_sleep", "dbms_pipe",
+    "utl_inaddr", "extractvalue", "updatexml", "floor", "rand", "hex", "unhex",
+)
+
+
+def _split(text: str) -> list[str]:
+    return text.lower().translate(_TRANSLATE).split()
+
+
+class FrozenTokenizer:
+    # Immutable word -> id mapping plus a batch encoder. Nothing is mutated
+    # after construction, so one instance can be shared by every thread.
+
+    def __init__(self, word_index: Mapping[str, int], *, num_words: int = NUM_WORDS, max_length: int = MAX_LENGTH):
+        self.num_words = num_words
+        self.max_length = max_length
+        # ids outside the model's embedding fall back to OOV, as in Keras
+        self.word_index = MappingProxyType({
+            w: (i if i < num_words else OOV_INDEX) for w, i in word_index.items()
+        })
+
+    @classmethod
+    def from_words(cls, words: Iterable[str], **kwargs) -> "FrozenTokenizer":
+        # index 1 is reserved for the OOV token
+        return cls({w: i for i, w in enumerate(dict.fromkeys(words), start=2)}, **kwargs)
+
+    @classmethod
+    def from_json(cls, path: str, **kwargs) -> "FrozenTokenizer":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        # accept both Tokenizer.to_json() output and a plain {"word_index": {...}}
+        if "config" in data:
+            word_index = data["config"]["word_index"]
+            if isinstance(word_index, str):
+                word_index = json.loads(word_index)
+        else:
+            word_index = data["word_index"]
+        return cls({w: int(i) for w, i in word_index.items()}, **kwargs)
+
+    def to_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"word_index": dict(self.word_index)}, f, indent=0, sort_keys=True)
+
+    def encode(self, query: str) -> np.ndarray:
+        return self.encode_batch([query])
+
+    def encode_batch(self, queries: Sequence[str], out: np.ndarray | None = None) -> np.ndarray:
+        n = len(queries)
+        if out is None:
+            out = np.zeros((n, self.max_length), dtype=np.int32)
+        else:
+            out[:n] = 0
+        lookup = self.word_index.get
+        maxlen = self.max_length
+        for row, query in enumerate(queries):
+            tokens = _split(query or "")
+            # pad_sequences default truncating='pre': keep the trailing tokens
+            if len(tokens) > maxlen:
+                tokens = tokens[-maxlen:]
+            for col, tok in enumerate(tokens):
+                out[row, col] = lookup(tok, OOV_INDEX)
+        return out[:n]
+
+
+_tokenizer: FrozenTokenizer | None = None
+_lock = threading.Lock()
+
+
+def get_tokenizer() -> FrozenTokenizer:
+    global _tokenizer
+    if _tokenizer is None:
+        with _lock:
+            if _tokenizer is None:
+                if os.path.exists(VOCAB_PATH):
+                    _tokenizer = FrozenTokenizer.from_json(VOCAB_PATH)
+                else:
+                    print(f"SQLi vocabulary {VOCAB_PATH} not found, using built-in vocabulary.")
+                    _tokenizer = FrozenTokenizer.from_words(DEFAULT_VOCAB)
+    return _tokenizer
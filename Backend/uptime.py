@@ -1,9 +1,11 @@
-import asyncio, time, httpx
-from typing import Sequence
-from sqlalchemy.orm import Session
+import asyncio, heapq, random, time, httpx
+from datetime import datetime, timezone
+from urllib.parse import urlparse
 from sqlalchemy import select
+import config
 from db import SessionLocal
-from models import Website, UptimeCheck  
+from ingest import log_writer
+from models import Website, User, UptimeCheck
 
 TIMEOUT = httpx.Timeout(connect=5.0, read=10.0, write=5.0, pool=5.0)
 HEADERS = {"User-Agent": "WebShieldAI-Uptime/1.0"}
@@ -18,29 +20,175 @@ async def check_site(client: httpx.AsyncClient, url: str) -> tuple[bool,int|None
     except Exception as e:
         return False, None, None, type(e).__name__
 
-async def run_checks_once(websites: Sequence[Website]):
-    async with httpx.AsyncClient(timeout=TIMEOUT, headers=HEADERS, verify=True) as client:
-        results = await asyncio.gather(*(check_site(client, w.url) for w in websites), return_exceptions=False)
 
-    db: Session = SessionLocal()
-    try:
-        for w, (ok, status, ms, err) in zip(websites, results):
-            db.add(UptimeCheck(
-                website_id=w.id, status_up=ok, status_code=status,
-                response_ms=ms, error=err
-            ))
-        db.commit()
-    finally:
-        db.close()
+class UptimeScheduler:
+    # Keeps one pooled client for the life of the process and a heap of
+    # (due_at, website_id). Each site runs on its own jittered interval; a
+    # global and a per-host semaphore bound how many checks are in flight.
 
-async def monitor_loop(interval_sec: int = 60):
-    while True:
+    def __init__(
+        self,
+        default_interval: float = 60.0,
+        max_concurrency: int = 200,
+        per_host_concurrency: int = 2,
+        jitter: float = 0.1,
+        refresh_sec: float = 60.0,
+    ):
+        self.default_interval = default_interval
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.jitter = jitter
+        self.refresh_sec = refresh_sec
+        self._sites: dict[int, tuple[str, float]] = {}  # id -> (url, interval)
+        self._heap: list[tuple[float, int]] = []
+        self._due: dict[int, float] = {}  # live heap entry per site; others are stale
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._hosts: dict[str, list] = {}  # host -> [semaphore, users]
+        self._inflight: set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self.checks = 0
+        self.failures = 0
+
+    def interval_for(self, plan: str | None) -> float:
+        return float(config.UPTIME_PLAN_INTERVALS.get(plan or "", self.default_interval))
+
+    def _next_due(self, base: float, interval: float) -> float:
+        return base + interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _schedule(self, wid: int, due: float):
+        self._due[wid] = due
+        heapq.heappush(self._heap, (due, wid))
+
+    def _load_sites(self) -> dict[int, tuple[str, float]]:
         db = SessionLocal()
         try:
-            sites = db.execute(select(Website)).scalars().all()
+            rows = db.execute(
+                select(Website.id, Website.url, User.plan)
+                .outerjoin(User, User.id == Website.user_id)
+            ).all()
         finally:
             db.close()
+        return {wid: (url, self.interval_for(plan)) for wid, url, plan in rows if url}
 
-        if sites:
-            await run_checks_once(sites)
-        await asyncio.sleep(interval_sec)
\ No newline at end of file
+    async def refresh(self):
+        sites = await asyncio.to_thread(self._load_sites)
+        now = time.monotonic()
+        for wid in sites.keys() - self._due.keys():
+            # spread first checks over one interval so they never line up
+            self._schedule(wid, now + random.uniform(0, sites[wid][1]))
+        # removed sites are dropped lazily when their heap entry comes due
+        self._sites = sites
+        self._wakeup.set()
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_sec)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print("Uptime site refresh error:", e)
+
+    def _host_slot(self, host: str) -> asyncio.Semaphore:
+        slot = self._hosts.get(host)
+        if slot is None:
+            slot = self._hosts[host] = [asyncio.Semaphore(self.per_host_concurrency), 0]
+        slot[1] += 1
+        return slot[0]
+
+    def _release_host(self, host: str):
+        slot = self._hosts[host]
+        slot[1] -= 1
+        if slot[1] == 0:
+            del self._hosts[host]
+
+    async def _check(self, client: httpx.AsyncClient, wid: int, url: str):
+        host = urlparse(url).hostname or url
+        checked_at = datetime.now(timezone.utc)
+        try:
+            async with self._host_slot(host):
+                ok, status, ms, err = await check_site(client, url)
+        finally:
+            self._release_host(host)
+            self._slots.release()
+
+        self.checks += 1
+        if not ok:
+            self.failures += 1
+        log_writer.submit(
+            UptimeCheck, website_id=wid, status_up=ok, status_code=status,
+            response_ms=ms, error=err, checked_at=checked_at,
+        )
+
+    async def run(self):
+        limits = httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency,
+            keepalive_expiry=30.0,
+        )
+        async with httpx.AsyncClient(timeout=TIMEOUT, headers=HEADERS, verify=True, limits=limits) as client:
+            await self.refresh()
+            refresher = asyncio.create_task(self._refresh_loop())
+            try:
+                await self._dispatch(client)
+            finally:
+                refresher.cancel()
+                for t in list(self._inflight):
+                    t.cancel()
+
+    async def _dispatch(self, client: httpx.AsyncClient):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            due, wid = self._heap[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            if self._due.get(wid) != due:
+                continue
+            site = self._sites.get(wid)
+            if site is None:
+                del self._due[wid]
+                continue
+            url, interval = site
+            # never try to "catch up" more than one interval after a stall
+            self._schedule(wid, self._next_due(max(due, time.monotonic() - interval), interval))
+
+            # blocks here once max_concurrency checks are running
+            await self._slots.acquire()
+            task = asyncio.create_task(self._check(client, wid, url))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    def stats(self) -> dict:
+        return {
+            "sites": len(self._sites),
+            "scheduled": len(self._due),
+            "in_flight": len(self._inflight),
+            "hosts_in_flight": len(self._hosts),
+            "checks": self.checks,
+            "failures": self.failures,
+        }
+
+
+scheduler: UptimeScheduler | None = None
+
+async def monitor_loop(interval_sec: int = 60):
+    global scheduler
+    scheduler = UptimeScheduler(
+        default_interval=interval_sec,
+        max_concurrency=config.UPTIME_MAX_CONCURRENCY,
+        per_host_concurrency=config.UPTIME_PER_HOST_CONCURRENCY,
+        jitter=config.UPTIME_JITTER,
+        refresh_sec=config.UPTIME_REFRESH_SEC,
+    )
+    await scheduler.run()
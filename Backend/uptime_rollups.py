@@ -0,0 +1,169 @@
+import math
+from datetime import datetime, timezone
+from typing import Sequence
+
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+import models
+
+# Log-scale latency histogram: bucket i holds [GROWTH**i, GROWTH**(i+1)) ms,
+# so any percentile read back from it is within ~5% of the true value and
+# hourly histograms merge by element-wise addition.
+# Keep in sync with migrations/versions/0004_uptime_rollups.py.
+GROWTH = 1.1
+NUM_BUCKETS = 120  # up to ~94 s
+
+
+def bucket_index(ms: int) -> int:
+    if ms <= 1:
+        return 0
+    return min(NUM_BUCKETS - 1, int(math.log(ms) / math.log(GROWTH)))
+
+
+def bucket_value(i: int) -> float:
+    # geometric midpoint of the bucket
+    return GROWTH ** (i + 0.5)
+
+
+def hour_bucket(ts: datetime) -> datetime:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def increments_for_rows(rows: list[dict]) -> list[dict]:
+    acc: dict[tuple, dict] = {}
+    for row in rows:
+        key = (row["website_id"], hour_bucket(row.get("checked_at") or datetime.now(timezone.utc)))
+        r = acc.get(key)
+        if r is None:
+            r = acc[key] = {
+                "website_id": key[0], "hour": key[1], "checks": 0, "up_checks": 0,
+                "latency_checks": 0, "sum_ms": 0, "min_ms": None, "max_ms": None,
+                "latency_hist": [0] * NUM_BUCKETS,
+            }
+        r["checks"] += 1
+        r["up_checks"] += 1 if row.get("status_up") else 0
+        ms = row.get("response_ms")
+        if ms is not None:
+            r["latency_checks"] += 1
+            r["sum_ms"] += ms
+            r["min_ms"] = ms if r["min_ms"] is None else min(r["min_ms"], ms)
+            r["max_ms"] = ms if r["max_ms"] is None else max(r["max_ms"], ms)
+            r["latency_hist"][bucket_index(ms)] += 1
+    return [acc[k] for k in sorted(acc)]
+
+
+def bump(db: Session, rows: list[dict]):
+    # Adds a batch of raw checks to their hourly rollups inside the caller's
+    # transaction, so rollups and raw rows commit together.
+    increments = increments_for_rows(rows)
+    if not increments:
+        return
+    R = models.UptimeRollup
+    stmt = pg_insert(R).values(increments)
+    ex = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["website_id", "hour"],
+        set_={
+            "checks": R.checks + ex.checks,
+            "up_checks": R.up_checks + ex.up_checks,
+            "latency_checks": R.latency_checks + ex.latency_checks,
+            "sum_ms": R.sum_ms + ex.sum_ms,
+            "min_ms": func.least(R.min_ms, ex.min_ms),
+            "max_ms": func.greatest(R.max_ms, ex.max_ms),
+            "latency_hist": literal_column(
+                "ARRAY(SELECT a + b FROM unnest(uptime_rollups.latency_hist, excluded.latency_hist)"
+                " WITH ORDINALITY AS t(a, b, i) ORDER BY i)"
+            ),
+        },
+    )
+    db.execute(stmt)
+
+
+def _percentile(hist: list[int], total: int, q: float) -> int | None:
+    if total <= 0:
+        return None
+    rank = q * total
+    seen = 0
+    for i, n in enumerate(hist):
+        seen += n
+        if seen > rank:
+            return int(round(bucket_value(i)))
+    return int(round(bucket_value(len(hist) - 1)))
+
+
+class _Window:
+    # running merge of rollup rows
+    def __init__(self):
+        self.checks = self.up = self.lat_n = self.sum_ms = 0
+        self.min_ms = self.max_ms = None
+        self.hist = [0] * NUM_BUCKETS
+
+    def add(self, row, percentiles: bool):
+        self.checks += row.checks
+        self.up += row.up_checks
+        self.lat_n += row.latency_checks
+        self.sum_ms += row.sum_ms
+        if row.min_ms is not None:
+            self.min_ms = row.min_ms if self.min_ms is None else min(self.min_ms, row.min_ms)
+        if row.max_ms is not None:
+            self.max_ms = row.max_ms if self.max_ms is None else max(self.max_ms, row.max_ms)
+        if percentiles and row.latency_hist:
+            for i, n in enumerate(row.latency_hist):
+                if n:
+                    self.hist[i] += n
+
+    def result(self, percentiles: bool) -> dict:
+        out = {
+            "checks": self.checks,
+            "up_checks": self.up,
+            "uptime_pct": round((self.up / self.checks) * 100, 2) if self.checks else 0.0,
+            "avg_ms": int(self.sum_ms / self.lat_n) if self.lat_n else None,
+            "min_ms": self.min_ms,
+            "max_ms": self.max_ms,
+        }
+        if percentiles:
+            # clamp to the observed range so estimates never exceed real extremes
+            def clamp(v):
+                return v if v is None else max(self.min_ms, min(self.max_ms, v))
+            out["p50_ms"] = clamp(_percentile(self.hist, self.lat_n, 0.50))
+            out["p95_ms"] = clamp(_percentile(self.hist, self.lat_n, 0.95))
+            out["p99_ms"] = clamp(_percentile(self.hist, self.lat_n, 0.99))
+        return out
+
+
+def _rollup_rows(db: Session, website_ids: Sequence[int], start: datetime, percentiles: bool):
+    R = models.UptimeRollup
+    cols = [R.website_id, R.checks, R.up_checks, R.latency_checks, R.sum_ms, R.min_ms, R.max_ms]
+    if percentiles:
+        cols.append(R.latency_hist)
+    return db.execute(
+        select(*cols).where(R.website_id.in_(website_ids), R.hour >= hour_bucket(start))
+    ).all()
+
+
+def window_stats(db: Session, website_ids: Sequence[int], start: datetime, percentiles: bool = True) -> dict:
+    # Uptime and latency for all checks since `start` (hour-aligned), read
+    # from at most 24 rows per site per day of window.
+    window = _Window()
+    for row in _rollup_rows(db, website_ids, start, percentiles):
+        window.add(row, percentiles)
+    return window.result(percentiles)
+
+
+def window_stats_by_site(
+    db: Session, website_ids: Sequence[int], start: datetime, percentiles: bool = True
+) -> tuple[dict[int, dict], dict]:
+    # Same as window_stats, per site plus the combined figure, from one query.
+    per_site = {wid: _Window() for wid in website_ids}
+    overall = _Window()
+    for row in _rollup_rows(db, website_ids, start, percentiles):
+        per_site[row.website_id].add(row, percentiles)
+        overall.add(row, percentiles)
+    return (
+        {wid: w.result(percentiles) for wid, w in per_site.items()},
+        overall.result(percentiles),
+    )
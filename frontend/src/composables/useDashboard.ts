@@ -1,5 +1,5 @@
 // composables/useDashboard.ts
-import { ref, computed, onMounted } from "vue";
+import { ref, computed, onMounted, onUnmounted } from "vue";
 import api from "../composables/axios";
 import type { Website, Attack, SecurityMetrics, ChartData } from "../types/dashboard";
 
@@ -205,28 +205,81 @@ export function useDashboard() {
     }
   };
 
-  const fetchWebsitesFromDB = async () => {
-    try {
-      const res = await api.get("/websites/", { withCredentials: true });
-      websites.value = (Array.isArray(res.data) ? res.data : []).map(mapWebsite);
-
-   
-      await fetchAllAttackLogsForUser();
+  // ---- whole dashboard in one request ----
+  // /me/dashboard returns every site with its latest attacks, blocked counts
+  // and uptime, plus the global totals. The server sends an ETag, so the
+  // browser revalidates repeat loads and gets a bodyless 304 when nothing changed.
+  const applySnapshot = (data: any) => {
+    websites.value = (Array.isArray(data?.websites) ? data.websites : []).map((s: any) => {
+      const site = mapWebsite(s);
+      const logs: Attack[] = (Array.isArray(s.attacks) ? s.attacks : []).map(normalizeLog);
+      site.attacks = logs;
+      site.metrics.totalRequests = logs.length;
+      site.metrics.blockedAttacks = Number(s.blocked?.total ?? 0);
+      site.metrics.uptime = Math.round(s.uptime?.uptime_pct ?? 0);
+      site.metrics.responseTime = s.uptime?.p95_ms ?? s.uptime?.avg_ms ?? 0;
+      return site;
+    });
+    globalUptimePct.value = Math.round(data?.uptime?.uptime_pct ?? 0);
+    globalAvgMs.value = data?.uptime?.avg_ms ?? null;
+    totalBlockedCount.value = Number(data?.total_blocked ?? 0);
+  };
 
+  const fetchWebsitesFromDB = async (days = 7) => {
+    try {
+      const { data } = await api.get("/me/dashboard", {
+        params: { days },
+        withCredentials: true,
+      });
+      applySnapshot(data);
+    } catch (error) {
+      console.error("Failed to fetch dashboard:", error);
+    }
+  };
 
-      await refreshAllSitesBlockedCounts();
+  // ---- live feed ----
+  // /me/events/stream pushes each new attack as it is logged, so the page
+  // stays current without polling. "resync" means we fell behind and the
+  // server dropped our backlog: reload the snapshot instead.
+  let liveFeed: EventSource | null = null;
 
+  const applyLiveAttack = (ev: any) => {
+    const site = websites.value.find((w) => toNum(w.id) === toNum(ev.website_id));
+    if (!site) return;
+    const attack = normalizeLog(ev);
+    if (site.attacks.some((a) => a.id === attack.id && a.type === attack.type)) return;
+    site.attacks = [attack, ...site.attacks];
+    site.metrics.totalRequests += 1;
+    site.lastChecked = new Date();
+    if (attack.blocked) {
+      site.metrics.blockedAttacks += 1;
+      totalBlockedCount.value += 1;
+    }
+  };
 
-      await Promise.all(websites.value.map((w) => refreshSiteMetrics(toNum(w.id))));
-      await refreshGlobalUptimeSummary();
+  const openLiveFeed = () => {
+    if (liveFeed || typeof EventSource === "undefined") return;
+    liveFeed = new EventSource(`${api.defaults.baseURL}/me/events/stream`, { withCredentials: true });
+    liveFeed.addEventListener("attack", (e) => {
+      try {
+        applyLiveAttack(JSON.parse((e as MessageEvent).data));
+      } catch (err) {
+        console.error("Bad live feed event:", err);
+      }
+    });
+    liveFeed.addEventListener("resync", () => fetchWebsitesFromDB());
+  };
 
-      await refreshGlobalBlockedCount();
-    } catch (error) {
-      console.error("Failed to fetch websites:", error);
-    }
+  const closeLiveFeed = () => {
+    liveFeed?.close();
+    liveFeed = null;
   };
 
-  onMounted(fetchWebsitesFromDB);
+  onMounted(async () => {
+    await fetchWebsitesFromDB();
+    openLiveFeed();
+  });
+  onUnmounted(closeLiveFeed);
 
   // ---------- Metrics & Charts ----------
   const securityMetrics = computed<SecurityMetrics>(() => {
@@ -343,6 +396,9 @@ export function useDashboard() {
     try {
       // await api.post("/websites/", { name, url }, { withCredentials: true });
       await fetchWebsitesFromDB();
+      // the stream's site list is fixed at connect time; reconnect to include the new one
+      closeLiveFeed();
+      openLiveFeed();
       isAddModalOpen.value = false;
     } catch (e) {
       console.error("Failed to add website:", e);
@@ -399,13 +455,7 @@ export function useDashboard() {
     await refreshSiteBlockedCount(toNum(id)); 
   };
 
-  const refreshAllWebsites = async () => {
-    await fetchAllAttackLogsForUser();
-    await Promise.all(websites.value.map((w) => refreshSiteMetrics(toNum(w.id))));
-    await refreshAllSitesBlockedCounts();
-    await refreshGlobalUptimeSummary();
-    await refreshGlobalBlockedCount();
-  };
+  const refreshAllWebsites = () => fetchWebsitesFromDB();
 
   const loadWebsitesFromDB = fetchWebsitesFromDB;
 